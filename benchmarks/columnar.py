@@ -0,0 +1,159 @@
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import logging
+import tempfile
+import statistics
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import text
+
+from benchmarks.corpus import fill_corpus
+from benchmarks.run import sample_ids, same_answer
+from scripts.loader import stream_load_json_to_db
+from scripts.synthetic import write_json
+from src.database.db import get_async_db_session, close_db
+from src.utils.columnar import columnar_store, compile_query, evaluate
+from src.utils.intents import intent_matcher
+from src.utils.logging import setup_logging
+
+
+logger = logging.getLogger(__name__)
+
+# shapes beyond the corpus: filters, IN lists, creator subqueries, groups
+EXTRA_QUERIES = [
+    "SELECT COUNT(*) FROM videos WHERE views_count > 1000 AND likes_count <= 500;",
+    "SELECT MAX(video_created_at) FROM videos WHERE creator_id = '{creator_id}';",
+    "SELECT COUNT(DISTINCT video_id) FROM video_snapshots WHERE created_at >= NOW() - INTERVAL '6 hours';",
+    "SELECT SUM(delta_likes_count) FROM video_snapshots "
+    "WHERE video_id IN (SELECT id FROM videos WHERE creator_id = '{creator_id}') AND created_at >= CURRENT_DATE;",
+    "SELECT SUM(delta_views_count) FROM video_snapshots WHERE video_id = '{video_id}' "
+    "AND created_at >= NOW() - INTERVAL '1 day' AND created_at < NOW() - INTERVAL '2 hours';",
+    "SELECT creator_id, SUM(views_count) AS total FROM videos GROUP BY creator_id ORDER BY total DESC LIMIT 10;",
+    "SELECT v.creator_id, SUM(s.delta_views_count) FROM video_snapshots s JOIN videos v ON v.id = s.video_id "
+    "WHERE s.created_at >= NOW() - INTERVAL '1 day' GROUP BY v.creator_id ORDER BY 2 DESC LIMIT 5;",
+    "SELECT video_id, COUNT(*) FROM video_snapshots WHERE created_at >= NOW() - INTERVAL '3 hours' "
+    "GROUP BY video_id ORDER BY video_id LIMIT 20;",
+]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Compare the columnar store with SQL: same answers, latency, memory per million snapshots"
+    )
+    parser.add_argument("--load-videos", type=int, help="load this many synthetic videos first")
+    parser.add_argument("--snapshots-per-video", type=int, default=48)
+    parser.add_argument("--repeat", type=int, default=20, help="runs of every query per path")
+    parser.add_argument("--json", help="also write the report to this file")
+    return parser.parse_args()
+
+
+def same_rows(actual: list[tuple], expected: list[tuple]) -> bool:
+    # ties make the order of grouped rows arbitrary, compare them sorted
+    key = lambda row: tuple(str(v) for v in row)
+    return len(actual) == len(expected) and all(
+        all(same_answer(a, e) for a, e in zip(row_a, row_e))
+        for row_a, row_e in zip(sorted(actual, key=key), sorted(expected, key=key))
+    )
+
+
+async def run(args: argparse.Namespace) -> dict:
+    creator_id, video_id = await sample_ids()
+    queries = [(sql, {}) for _, sql in fill_corpus(creator_id, video_id)]
+    queries += [(sql.format(creator_id=creator_id, video_id=video_id), {}) for sql in EXTRA_QUERIES]
+    # the parameterized SQL of the intent fast path
+    for question, _ in fill_corpus(creator_id, video_id):
+        if intent := intent_matcher.match(question):
+            queries.append((intent.sql, intent.params))
+
+    started = time.perf_counter()
+    data = await asyncio.to_thread(columnar_store.refresh)
+    load_s = time.perf_counter() - started
+
+    results = []
+    async with get_async_db_session() as db:
+        for sql, params in queries:
+            sql_times = []
+            for _ in range(args.repeat):
+                t = time.perf_counter()
+                expected = [tuple(row) for row in (await db.execute(text(sql), params)).fetchall()]
+                sql_times.append(time.perf_counter() - t)
+            plan = compile_query(sql)
+            result = {"sql": sql, "params": params, "sql_ms": statistics.median(sql_times) * 1000, "columnar_ms": None}
+            if plan is not None:
+                columnar_times = []
+                for _ in range(args.repeat):
+                    t = time.perf_counter()
+                    actual = evaluate(plan, data, params)
+                    columnar_times.append(time.perf_counter() - t)
+                result["columnar_ms"] = statistics.median(columnar_times) * 1000
+                result["same"] = same_rows(actual, expected)
+                if not result["same"]:
+                    logger.error(f"Different answers for {sql} {params}: columnar {actual[:5]}, SQL {expected[:5]}")
+            results.append(result)
+
+    stats = columnar_store.stats()
+    return {
+        "videos": len(data.video_ids),
+        "snapshots": data.snapshots,
+        "load_s": load_s,
+        "bytes": stats["bytes"],
+        "bytes_per_million_snapshots": stats["bytes_per_million_snapshots"],
+        "queries": results,
+    }
+
+
+def print_report(report: dict) -> None:
+    print(f"\n{'SQL ms':>8}{'columnar ms':>13}{'speedup':>9}  {'same':<5} query")
+    for r in report["queries"]:
+        sql = " ".join(r["sql"].split())
+        sql = sql if len(sql) <= 90 else sql[:87] + "..."
+        if r["columnar_ms"] is None:
+            print(f"{r['sql_ms']:>8.2f}{'SQL only':>13}{'':>9}  {'':<5} {sql}")
+        else:
+            print(f"{r['sql_ms']:>8.2f}{r['columnar_ms']:>13.3f}{r['sql_ms'] / r['columnar_ms']:>8.0f}x  "
+                  f"{'yes' if r['same'] else 'NO':<5} {sql}")
+    answered = [r for r in report["queries"] if r["columnar_ms"] is not None]
+    wrong = sum(not r["same"] for r in answered)
+    print(f"answered in memory: {len(answered)}/{len(report['queries'])}, different answers: {wrong}")
+    print(f"{report['videos']} videos, {report['snapshots']} snapshots loaded in {report['load_s']:.2f}s; "
+          f"memory {report['bytes'] / 2**20:.1f} MiB, "
+          f"{report['bytes_per_million_snapshots'] / 2**20:.1f} MiB per million snapshots")
+
+
+def main():
+    setup_logging()
+    logging.getLogger("src").setLevel(logging.WARNING)
+    args = parse_args()
+
+    if args.load_videos:
+        with tempfile.NamedTemporaryFile(suffix=".json") as f:
+            write_json(
+                f.name,
+                n_videos=args.load_videos,
+                snapshots_per_video=args.snapshots_per_video,
+                seed=random.SystemRandom().getrandbits(32),
+            )
+            stream_load_json_to_db(f.name)
+
+    async def go() -> dict:
+        try:
+            return await run(args)
+        finally:
+            await close_db()
+
+    report = asyncio.run(go())
+    print_report(report)
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, ensure_ascii=False, indent=2, default=str), encoding="utf-8")
+    if any(r["columnar_ms"] is not None and not r["same"] for r in report["queries"]):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
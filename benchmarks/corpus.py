@@ -0,0 +1,48 @@
+"""Benchmark questions with their reference SQL.
+
+`{creator_id}` and `{video_id}` are filled with ids sampled from the database.
+"""
+
+CORPUS = [
+    # totals
+    ("Сколько всего видео?", "SELECT COUNT(*) FROM videos;"),
+    ("Сколько просмотров у всех видео?", "SELECT SUM(views_count) FROM videos;"),
+    ("Среднее количество лайков?", "SELECT AVG(likes_count) FROM videos;"),
+    ("Максимальное количество комментариев?", "SELECT MAX(comments_count) FROM videos;"),
+    ("Сколько всего жалоб?", "SELECT SUM(reports_count) FROM videos;"),
+    # creators
+    ("Сколько видео у креатора с id {creator_id}?", "SELECT COUNT(*) FROM videos WHERE creator_id = '{creator_id}';"),
+    ("Сколько просмотров у креатора {creator_id}?", "SELECT SUM(views_count) FROM videos WHERE creator_id = '{creator_id}';"),
+    ("Сколько комментариев у креатора с id {creator_id}?", "SELECT SUM(comments_count) FROM videos WHERE creator_id = '{creator_id}';"),
+    # videos
+    ("Сколько просмотров у видео с id {video_id}?", "SELECT views_count FROM videos WHERE id = '{video_id}';"),
+    ("Сколько лайков у видео {video_id}?", "SELECT likes_count FROM videos WHERE id = '{video_id}';"),
+    # dynamics
+    ("Какой прирост просмотров за последний час?",
+     "SELECT SUM(delta_views_count) FROM video_snapshots WHERE created_at >= NOW() - INTERVAL '1 hour';"),
+    ("Сколько новых лайков за сегодня?",
+     "SELECT SUM(delta_likes_count) FROM video_snapshots WHERE created_at >= CURRENT_DATE;"),
+    ("Прирост комментариев за последние 24 часа?",
+     "SELECT SUM(delta_comments_count) FROM video_snapshots WHERE created_at >= NOW() - INTERVAL '24 hours';"),
+    ("Прирост просмотров у креатора {creator_id} за неделю?",
+     "SELECT SUM(s.delta_views_count) FROM video_snapshots s JOIN videos v ON v.id = s.video_id "
+     "WHERE v.creator_id = '{creator_id}' AND s.created_at >= NOW() - INTERVAL '7 days';"),
+    # shapes only the LLM handles
+    ("Сколько видео набрали больше 1000 просмотров?", "SELECT COUNT(*) FROM videos WHERE views_count > 1000;"),
+    ("У скольких креаторов есть хотя бы одно видео?", "SELECT COUNT(DISTINCT creator_id) FROM videos;"),
+    ("Сколько видео опубликовано в этом месяце?",
+     "SELECT COUNT(*) FROM videos WHERE video_created_at >= date_trunc('month', NOW());"),
+    ("Какое среднее число просмотров на видео за последние 3 дня?",
+     "SELECT AVG(delta_views_count) FROM video_snapshots WHERE created_at >= NOW() - INTERVAL '3 days';"),
+    ("Сколько замеров было за вчера?",
+     "SELECT COUNT(*) FROM video_snapshots WHERE created_at >= CURRENT_DATE - INTERVAL '1 day' AND created_at < CURRENT_DATE;"),
+    ("Сколько лайков у видео, опубликованных за последнюю неделю?",
+     "SELECT SUM(likes_count) FROM videos WHERE video_created_at >= NOW() - INTERVAL '7 days';"),
+]
+
+
+def fill_corpus(creator_id: str, video_id: str) -> list[tuple[str, str]]:
+    return [
+        (question.format(creator_id=creator_id, video_id=video_id), sql.format(creator_id=creator_id, video_id=video_id))
+        for question, sql in CORPUS
+    ]
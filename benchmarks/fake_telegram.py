@@ -0,0 +1,253 @@
+import os
+import sys
+import json
+import time
+import signal
+import socket
+import asyncio
+import argparse
+import logging
+import secrets
+import statistics
+import subprocess
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import aiohttp
+from aiohttp import web
+from sqlalchemy import text
+
+from benchmarks.corpus import fill_corpus
+from benchmarks.run import sample_ids, percentile
+from src.database.db import get_async_db_session, close_db
+from src.utils.logging import setup_logging
+from src.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+ROOT = Path(__file__).parent.parent
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Offline webhook throughput test: fake Telegram Bot API and OpenAI, real bot and database"
+    )
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker counts to compare")
+    parser.add_argument("--updates", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=100, help="updates in flight at once")
+    parser.add_argument("--users", type=int, default=500, help="distinct senders, for the rate limiter")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="fake LLM latency, seconds")
+    parser.add_argument("--shared-state", default="postgres", choices=["memory", "postgres"])
+    parser.add_argument("--port", type=int, default=8081, help="webhook port")
+    parser.add_argument("--fake-port", type=int, default=8091, help="port of the fake Telegram/OpenAI server")
+    parser.add_argument("--timeout", type=float, default=120.0, help="give up waiting for replies after this")
+    parser.add_argument("--worker-log", help="write the workers' output to this file")
+    parser.add_argument("--json", help="also write the report to this file")
+    return parser.parse_args()
+
+
+class FakeServer:
+    """Answers Bot API calls and OpenAI chat completions.
+
+    Replies sent by the bot resolve the futures in `pending`, keyed by chat id;
+    every generated update gets its own chat.
+    """
+
+    def __init__(self, answers: dict[str, str], llm_latency: float):
+        self.answers = answers
+        self.llm_latency = llm_latency
+        self.pending: dict[int, asyncio.Future] = {}
+        self.llm_calls = 0
+        self.message_id = 0
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.bot_api)
+        app.router.add_post("/v1/chat/completions", self.chat_completions)
+        app.router.add_get("/v1/models", self.models)
+        return app
+
+    async def bot_api(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"].lower()
+        data = await request.post()
+        if method == "getme":
+            return web.json_response({"ok": True, "result": {"id": 1, "is_bot": True, "first_name": "Fake"}})
+        if method != "sendmessage":
+            return web.json_response({"ok": True, "result": True})
+
+        chat_id = int(data["chat_id"])
+        future = self.pending.get(chat_id)
+        if future is not None and not future.done():
+            future.set_result(time.perf_counter())
+        self.message_id += 1
+        return web.json_response({"ok": True, "result": {
+            "message_id": self.message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "text": data.get("text", ""),
+        }})
+
+    async def chat_completions(self, request: web.Request) -> web.Response:
+        self.llm_calls += 1
+        body = await request.json()
+        sql = self.answers.get(body["messages"][-1]["content"], "SELECT 0;")
+        await asyncio.sleep(self.llm_latency)
+        return web.json_response({
+            "id": f"chatcmpl-{self.llm_calls}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body["model"],
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": sql}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        })
+
+
+    async def models(self, request: web.Request) -> web.Response:
+        return web.json_response({"object": "list", "data": []})
+
+
+def make_update(update_id: int, user_id: int, question: str) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": update_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Load"},
+            "text": question,
+        },
+    }
+
+
+async def reset_shared_state() -> None:
+    async with get_async_db_session() as db:
+        await db.execute(text("TRUNCATE shared_cache, rate_limit_buckets"))
+
+
+async def wait_for_port(port: int, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Webhook did not start on port {port}")
+            await asyncio.sleep(0.2)
+
+
+def start_webhook(
+    args: argparse.Namespace, workers: int, secret: str, log, env: dict[str, str] | None = None
+) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "TELEGRAM_API_URL": f"http://127.0.0.1:{args.fake_port}",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{args.fake_port}/v1",
+        "SHARED_STATE_BACKEND": args.shared_state,
+        "WEBHOOK_SECRET": secret,
+        "WEBHOOK_URL": "",
+        "METRICS_ENABLED": "false",
+        **(env or {}),
+    }
+    return subprocess.Popen(
+        [sys.executable, str(ROOT / "webhook.py"), "--workers", str(workers), "--port", str(args.port)],
+        env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+
+
+async def send_updates(args: argparse.Namespace, server: FakeServer, questions: list[str], secret: str) -> dict:
+    loop = asyncio.get_running_loop()
+    url = f"http://127.0.0.1:{args.port}{settings.webhook_path}"
+    headers = {"X-Telegram-Bot-Api-Secret-Token": secret}
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies: list[float] = []
+
+    async def one(session: aiohttp.ClientSession, update_id: int, question: str) -> None:
+        async with semaphore:
+            future = server.pending[update_id] = loop.create_future()
+            sent = time.perf_counter()
+            async with session.post(url, json=make_update(update_id, 1 + update_id % args.users, question),
+                                    headers=headers) as response:
+                response.raise_for_status()
+            try:
+                latencies.append(await asyncio.wait_for(future, args.timeout) - sent)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                server.pending.pop(update_id, None)
+
+    started = time.perf_counter()
+    async with aiohttp.ClientSession() as session:
+        await asyncio.gather(*(one(session, i + 1, q) for i, q in enumerate(questions)))
+    elapsed = time.perf_counter() - started
+    return {
+        "updates": len(questions),
+        "replies": len(latencies),
+        "elapsed_s": elapsed,
+        "throughput_rps": len(latencies) / elapsed,
+        "latency_ms": {
+            "p50": percentile(latencies, 50) * 1000,
+            "p95": percentile(latencies, 95) * 1000,
+            "mean": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+        },
+    }
+
+
+async def run(args: argparse.Namespace) -> list[dict]:
+    creator_id, video_id = await sample_ids()
+    corpus = fill_corpus(creator_id, video_id)
+    questions = [corpus[i % len(corpus)][0] for i in range(args.updates)]
+    server = FakeServer(dict(corpus), args.llm_latency)
+
+    runner = web.AppRunner(server.app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", args.fake_port).start()
+    log = open(args.worker_log, "a") if args.worker_log else subprocess.DEVNULL
+    reports = []
+    try:
+        for workers in [int(n) for n in args.workers.split(",")]:
+            if args.shared_state == "postgres":
+                await reset_shared_state()
+            secret = secrets.token_hex(16)
+            process = start_webhook(args, workers, secret, log)
+            try:
+                await wait_for_port(args.port)
+                llm_calls = server.llm_calls
+                report = await send_updates(args, server, questions, secret)
+                report.update(workers=workers, llm_calls=server.llm_calls - llm_calls)
+                reports.append(report)
+                logger.info(f"{workers} workers: {report['throughput_rps']:.1f} replies/s")
+            finally:
+                process.send_signal(signal.SIGTERM)
+                await asyncio.to_thread(process.wait, settings.webhook_drain_timeout + 10)
+    finally:
+        await runner.cleanup()
+        await close_db()
+        if log is not subprocess.DEVNULL:
+            log.close()
+    return reports
+
+
+def print_report(reports: list[dict]) -> None:
+    print(f"\n{'workers':>8}{'replies':>10}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'LLM calls':>11}{'speedup':>9}")
+    base = reports[0]["throughput_rps"] if reports else 0
+    for r in reports:
+        speedup = r["throughput_rps"] / base if base else 0.0
+        print(f"{r['workers']:>8}{r['replies']:>6}/{r['updates']:<4}{r['throughput_rps']:>9.1f}"
+              f"{r['latency_ms']['p50']:>10.1f}{r['latency_ms']['p95']:>10.1f}{r['llm_calls']:>11}{speedup:>8.2f}x")
+    print(f"CPU cores: {os.cpu_count()}")
+
+
+def main():
+    setup_logging()
+    args = parse_args()
+    reports = asyncio.run(run(args))
+    print_report(reports)
+    if args.json:
+        Path(args.json).write_text(json.dumps(reports, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import os
+import sys
+import json
+import random
+import argparse
+import logging
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from scripts.parallel_loader import parallel_load_json_to_db, projected_speedups
+from scripts.synthetic import write_json
+from src.utils.logging import setup_logging
+
+
+logger = logging.getLogger(__name__)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Measure how the parallel loader scales with the number of worker processes"
+    )
+    parser.add_argument("json_path", nargs="?", help="export to load (default: generate a synthetic one)")
+    parser.add_argument("--videos", type=int, default=5000)
+    parser.add_argument("--snapshots-per-video", type=int, default=48)
+    parser.add_argument("--workers", default="1,2,4,8", help="comma-separated worker counts")
+    parser.add_argument("--merge", action="store_true",
+                        help="also merge the last run into the real tables (by default only parse + COPY is timed)")
+    parser.add_argument("--json", help="also write the report to this file")
+    return parser.parse_args()
+
+
+def run(json_path: str, worker_counts: list[int], merge: bool) -> list[dict]:
+    reports = []
+    for i, workers in enumerate(worker_counts):
+        last = i == len(worker_counts) - 1
+        reports.append(parallel_load_json_to_db(json_path, workers=workers, merge=merge and last))
+    return reports
+
+
+def print_report(reports: list[dict], merged: bool) -> None:
+    base = reports[0]["parallel_s"]
+    print(f"\n{'workers':>8}{'parse+COPY s':>14}{'rows/s':>10}{'speedup':>9}")
+    for r in reports:
+        print(f"{r['workers']:>8}{r['parallel_s']:>14.2f}{r['rows'] / r['parallel_s']:>10.0f}"
+              f"{base / r['parallel_s']:>8.2f}x")
+    print(f"CPU cores: {os.cpu_count()}")
+    if merged:
+        # one-worker busy time is the parallelizable work, the merge is serial
+        projected = projected_speedups(reports[0]["worker_busy_s"], reports[-1]["merge_s"])
+        print(f"merge: {reports[-1]['merge_s']:.2f}s; projected end-to-end speedup (Amdahl): "
+              + ", ".join(f"{n}: {s:.2f}x" for n, s in projected.items()))
+
+
+def main():
+    setup_logging()
+    args = parse_args()
+    worker_counts = [int(n) for n in args.workers.split(",")]
+
+    if args.json_path:
+        reports = run(args.json_path, worker_counts, args.merge)
+    else:
+        with tempfile.NamedTemporaryFile(suffix=".json") as f:
+            write_json(
+                f.name,
+                n_videos=args.videos,
+                snapshots_per_video=args.snapshots_per_video,
+                seed=random.SystemRandom().getrandbits(32),
+            )
+            reports = run(f.name, worker_counts, args.merge)
+
+    print_report(reports, args.merge)
+    if args.json:
+        Path(args.json).write_text(json.dumps(reports, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
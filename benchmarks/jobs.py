@@ -0,0 +1,150 @@
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import logging
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import text
+
+from benchmarks.corpus import fill_corpus
+from benchmarks.run import percentile, sample_ids
+from benchmarks.stub_llm import StubLLMClient
+from src.config import settings
+from src.database.db import get_async_db_session, close_db
+from src.utils.jobs import Job, JobQueue
+from src.utils.llm_gateway import llm_gateway
+from src.utils.logging import setup_logging
+from src.utils.query_executor import answer_query, DeferredToJob
+from src.utils.result_cache import result_cache
+from src.utils.sql_cache import sql_cache
+
+
+logger = logging.getLogger(__name__)
+
+# a self-join over all snapshots: a few hundred ms and a planner cost far above the corpus queries
+HEAVY_SQL = (
+    "SELECT COUNT(*) FROM video_snapshots a JOIN video_snapshots b "
+    "ON a.video_id = b.video_id AND a.created_at < b.created_at WHERE a.views_count >= {n};"
+)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Latency of interactive questions while heavy reports run inline or as background jobs"
+    )
+    parser.add_argument("--requests", type=int, default=300, help="interactive questions")
+    parser.add_argument("--reports", type=int, default=30, help="heavy report questions mixed in")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="stub LLM latency, seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the report to this file")
+    return parser.parse_args()
+
+
+async def heavy_cost() -> float:
+    async with get_async_db_session() as db:
+        plan = (await db.execute(text(f"EXPLAIN (FORMAT JSON) {HEAVY_SQL.format(n=0)}"))).scalar()
+    return float(plan[0]["Plan"]["Total Cost"])
+
+
+async def run_mode(messages: list[tuple[str, bool]], concurrency: int, use_jobs: bool) -> dict:
+    queue = JobQueue(workers=settings.job_workers if use_jobs else 0, max_size=len(messages))
+    submitted: dict[str, float] = {}
+    answered: list[float] = []
+
+    async def deliver(job: Job) -> None:
+        answered.append(time.perf_counter() - submitted[job.id])
+
+    if use_jobs:
+        queue.start(deliver)
+    semaphore = asyncio.Semaphore(concurrency)
+    interactive, reports, errors = [], [], 0
+
+    async def ask(i: int, question: str, heavy: bool) -> None:
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await answer_query(question)
+            except DeferredToJob as e:
+                job = queue.submit(e, chat_id=i, message_id=i)
+                submitted.setdefault(job.id, started)
+            except Exception:
+                errors += 1
+            (reports if heavy else interactive).append(time.perf_counter() - started)
+            if heavy and not use_jobs:
+                answered.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(ask(i, question, heavy) for i, (question, heavy) in enumerate(messages)))
+    await queue.queue.join()
+    await queue.stop(0)
+    return {
+        "elapsed_s": time.perf_counter() - started,
+        "interactive_ms": {
+            "p50": percentile(interactive, 50) * 1000,
+            "p95": percentile(interactive, 95) * 1000,
+            "max": max(interactive) * 1000,
+        },
+        "report_reply_ms": percentile(reports, 50) * 1000,
+        "report_answer_ms": percentile(answered, 50) * 1000 if answered else 0.0,
+        "reports_answered": len(answered),
+        "errors": errors,
+    }
+
+
+async def run(args: argparse.Namespace) -> dict:
+    try:
+        creator_id, video_id = await sample_ids()
+        corpus = fill_corpus(creator_id, video_id)
+        reports = [(f"Отчет по парам снапшотов номер {n}", HEAVY_SQL.format(n=n)) for n in range(args.reports)]
+        llm_gateway.set_client(StubLLMClient(dict(corpus + reports), latency=args.llm_latency, jitter=0))
+        sql_cache.max_size = result_cache.max_size = 0
+        sql_cache.store = None
+
+        rng = random.Random(args.seed)
+        messages = [(rng.choice(corpus)[0], False) for _ in range(args.requests)]
+        for question, _ in reports:
+            messages.insert(rng.randrange(len(messages) + 1), (question, True))
+
+        cost = await heavy_cost()
+        # inline: no cost limit, reports hold the interactive DB slots while they run
+        settings.sql_max_cost, workers = 0, settings.job_workers
+        settings.job_workers = 0
+        inline = await run_mode(messages, args.concurrency, use_jobs=False)
+        # jobs: reports go over SQL_MAX_COST and wait for the job workers
+        settings.sql_max_cost, settings.job_workers = cost / 2, workers or 2
+        background = await run_mode(messages, args.concurrency, use_jobs=True)
+        return {"report_cost": cost, "job_workers": settings.job_workers, "inline": inline, "jobs": background}
+    finally:
+        await close_db()
+
+
+def print_report(report: dict) -> None:
+    print(f"\nreport cost {report['report_cost']:.0f}, {report['job_workers']} job workers")
+    print(f"{'mode':<8}{'p50 ms':>9}{'p95 ms':>9}{'max ms':>9}{'report reply ms':>17}"
+          f"{'report answer ms':>18}{'answered':>10}{'errors':>8}")
+    for mode in ("inline", "jobs"):
+        r = report[mode]
+        i = r["interactive_ms"]
+        print(f"{mode:<8}{i['p50']:>9.1f}{i['p95']:>9.1f}{i['max']:>9.1f}{r['report_reply_ms']:>17.1f}"
+              f"{r['report_answer_ms']:>18.1f}{r['reports_answered']:>10}{r['errors']:>8}")
+
+
+def main():
+    setup_logging()
+    logging.getLogger("src").setLevel(logging.WARNING)
+    args = parse_args()
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import sys
+import json
+import time
+import asyncio
+import argparse
+import logging
+import statistics
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import text
+
+from benchmarks.corpus import fill_corpus
+from benchmarks.run import same_answer
+from src.database.db import get_async_db_session, close_db
+from src.utils.logging import setup_logging
+from src.utils.sql_params import parameterize
+
+
+logger = logging.getLogger(__name__)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Run the corpus SQL for many ids with inline literals and with bind parameters"
+    )
+    parser.add_argument("--ids", type=int, default=50, help="creator/video pairs to run every query shape for")
+    parser.add_argument("--json", help="also write the report to this file")
+    return parser.parse_args()
+
+
+async def sample_pairs(n: int) -> list[tuple[str, str]]:
+    async with get_async_db_session() as db:
+        rows = (await db.execute(
+            text("SELECT creator_id, id FROM videos ORDER BY md5(id) LIMIT :n"), {"n": n}
+        )).fetchall()
+    if not rows:
+        raise RuntimeError("The database is empty, load data first")
+    return [(row[0], row[1]) for row in rows]
+
+
+async def run_mode(queries: list[tuple[str, dict]]) -> tuple[list[float], list, int]:
+    """Run queries on one connection, return latencies, answers and statements they prepared on it."""
+    times, answers = [], []
+    count_sql = text("SELECT COUNT(*) FROM pg_prepared_statements")
+    async with get_async_db_session() as db:
+        before = (await db.execute(count_sql)).scalar()
+        for sql, params in queries:
+            started = time.perf_counter()
+            answers.append((await db.execute(text(sql), params)).scalar())
+            times.append(time.perf_counter() - started)
+        prepared = (await db.execute(count_sql)).scalar() - before
+    return times, answers, prepared
+
+
+async def run(args: argparse.Namespace) -> dict:
+    literal, lifted = [], []
+    for creator_id, video_id in await sample_pairs(args.ids):
+        for _, sql in fill_corpus(creator_id, video_id):
+            template, params = parameterize(sql)
+            if params:
+                literal.append((sql, {}))
+                lifted.append((template, params))
+
+    literal_times, literal_answers, literal_prepared = await run_mode(literal)
+    lifted_times, lifted_answers, lifted_prepared = await run_mode(lifted)
+    wrong = sum(not same_answer(a, e) for a, e in zip(lifted_answers, literal_answers))
+    return {
+        "queries": len(literal),
+        "shapes": len({sql for sql, _ in lifted}),
+        "literal": {
+            "median_ms": statistics.median(literal_times) * 1000,
+            "total_s": sum(literal_times),
+            "prepared_statements": literal_prepared,
+        },
+        "parameterized": {
+            "median_ms": statistics.median(lifted_times) * 1000,
+            "total_s": sum(lifted_times),
+            "prepared_statements": lifted_prepared,
+        },
+        "different_answers": wrong,
+    }
+
+
+def print_report(report: dict) -> None:
+    print(f"\n{report['queries']} queries of {report['shapes']} shapes")
+    print(f"{'mode':<15}{'median ms':>10}{'total s':>9}{'prepared':>10}")
+    for mode in ("literal", "parameterized"):
+        r = report[mode]
+        print(f"{mode:<15}{r['median_ms']:>10.2f}{r['total_s']:>9.2f}{r['prepared_statements']:>10}")
+    print(f"different answers: {report['different_answers']}")
+
+
+def main():
+    setup_logging()
+    logging.getLogger("src").setLevel(logging.WARNING)
+    args = parse_args()
+
+    async def go() -> dict:
+        try:
+            return await run(args)
+        finally:
+            await close_db()
+
+    report = asyncio.run(go())
+    print_report(report)
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    if report["different_answers"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import logging
+import tempfile
+import statistics
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import text
+
+from benchmarks.corpus import fill_corpus
+from benchmarks.stub_llm import StubLLMClient
+from scripts.loader import stream_load_json_to_db
+from scripts.synthetic import write_json
+from src.database.db import get_async_db_session, get_async_read_session, close_db
+from src.utils.intents import intent_matcher
+from src.utils.llm_gateway import llm_gateway
+from src.utils.logging import setup_logging
+from src.utils.query_executor import execute_natural_language_query, answer_query, to_scalar
+from src.utils.batch import answer_batch
+from src.utils.result_cache import result_cache
+from src.utils.sql_cache import sql_cache
+from src.utils.timing import collect_stages
+from src.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark of execute_natural_language_query")
+    parser.add_argument("--load-videos", type=int, default=0,
+                        help="load this many synthetic videos first (default: use the data already in the DB)")
+    parser.add_argument("--snapshots-per-video", type=int, default=48)
+    parser.add_argument("--creators", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--llm-latency", type=float, default=0.8, help="stub LLM latency, seconds")
+    parser.add_argument("--llm-jitter", type=float, default=0.2, help="stub LLM latency noise, seconds")
+    parser.add_argument("--no-intents", action="store_true", help="disable the rule-based fast path")
+    parser.add_argument("--no-cache", action="store_true", help="disable the SQL and result caches")
+    parser.add_argument("--no-coalesce", action="store_true",
+                        help="do not share in-flight computations of identical questions")
+    parser.add_argument("--batch", type=int, default=1,
+                        help="questions per message; more than one goes through answer_batch")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the report to this file")
+    return parser.parse_args()
+
+
+def percentile(values: list[float], p: int) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method="inclusive")[p - 1]
+
+
+def same_answer(actual, expected) -> bool:
+    if actual is None or expected is None:
+        return actual is expected
+    try:
+        return abs(float(actual) - float(expected)) <= 1e-6 * max(1.0, abs(float(expected)))
+    except (TypeError, ValueError):
+        return actual == expected
+
+
+async def sample_ids() -> tuple[str, str]:
+    async with get_async_db_session() as db:
+        row = (await db.execute(text("SELECT creator_id, id FROM videos ORDER BY id LIMIT 1"))).fetchone()
+    if row is None:
+        raise RuntimeError("The database is empty, run with --load-videos N")
+    return row[0], row[1]
+
+
+async def reference_answers(corpus: list[tuple[str, str]]) -> dict[str, object]:
+    answers = {}
+    async with get_async_db_session() as db:
+        for question, sql in corpus:
+            answers[question] = to_scalar((await db.execute(text(sql))).fetchone())
+    return answers
+
+
+async def run_request(questions: list[str], semaphore: asyncio.Semaphore, coalesce: bool) -> dict:
+    async with semaphore:
+        started = time.perf_counter()
+        values, errors = [None] * len(questions), [None] * len(questions)
+        with collect_stages() as stages:
+            try:
+                if len(questions) > 1:
+                    values = await answer_batch(questions)
+                    errors = [type(v).__name__ if isinstance(v, Exception) else None for v in values]
+                elif coalesce:
+                    values = [await answer_query(questions[0])]
+                else:
+                    async with get_async_read_session() as db:
+                        values = [await execute_natural_language_query(db, questions[0])]
+            except Exception as e:
+                errors = [type(e).__name__] * len(questions)
+        return {
+            "questions": questions,
+            "latency": time.perf_counter() - started,
+            "stages": dict(stages),
+            "values": values,
+            "errors": errors,
+        }
+
+
+def build_report(results: list[dict], elapsed: float, expected: dict, args: argparse.Namespace, client: StubLLMClient) -> dict:
+    latencies = [r["latency"] for r in results]
+    stage_names = sorted({name for r in results for name in r["stages"]})
+    return {
+        "requests": len(results),
+        "questions_per_request": args.batch,
+        "concurrency": args.concurrency,
+        "llm_latency": args.llm_latency,
+        "elapsed_s": elapsed,
+        "throughput_rps": len(results) / elapsed,
+        "latency_ms": {
+            "p50": percentile(latencies, 50) * 1000,
+            "p95": percentile(latencies, 95) * 1000,
+            "p99": percentile(latencies, 99) * 1000,
+            "max": max(latencies) * 1000,
+        },
+        "stages_ms": {
+            name: {
+                "calls": len(durations),
+                "mean": statistics.fmean(durations) * 1000,
+                "p95": percentile(durations, 95) * 1000,
+            }
+            for name in stage_names
+            for durations in [[r["stages"][name] for r in results if name in r["stages"]]]
+        },
+        "llm_calls": client.calls,
+        "llm_prompt_tokens_mean": client.prompt_tokens / client.calls if client.calls else 0.0,
+        "errors": sum(error is not None for r in results for error in r["errors"]),
+        "wrong_answers": sum(
+            error is None and not same_answer(value, expected[question])
+            for r in results
+            for question, value, error in zip(r["questions"], r["values"], r["errors"])
+        ),
+        "intents": intent_matcher.stats(),
+        "sql_cache": sql_cache.stats(),
+        "result_cache": result_cache.stats(),
+    }
+
+
+def print_report(report: dict) -> None:
+    latency = report["latency_ms"]
+    print(f"\nrequests: {report['requests']} of {report['questions_per_request']} questions, "
+          f"concurrency: {report['concurrency']}, "
+          f"stub LLM latency: {report['llm_latency']}s")
+    print(f"throughput: {report['throughput_rps']:.1f} req/s in {report['elapsed_s']:.2f}s")
+    print(f"latency ms: p50 {latency['p50']:.1f}  p95 {latency['p95']:.1f}  "
+          f"p99 {latency['p99']:.1f}  max {latency['max']:.1f}")
+    print(f"{'stage':<12}{'calls':>8}{'mean ms':>12}{'p95 ms':>12}")
+    for name, s in report["stages_ms"].items():
+        print(f"{name:<12}{s['calls']:>8}{s['mean']:>12.2f}{s['p95']:>12.2f}")
+    print(f"LLM calls: {report['llm_calls']}, prompt tokens per call: {report['llm_prompt_tokens_mean']:.0f}, "
+          f"errors: {report['errors']}, wrong answers: {report['wrong_answers']}")
+    print(f"intent coverage: {report['intents']['coverage']:.0%}, "
+          f"SQL cache hit ratio: {report['sql_cache']['hit_ratio']:.0%}, "
+          f"result cache hit ratio: {report['result_cache']['hit_ratio']:.0%}")
+
+
+async def run(args: argparse.Namespace) -> dict:
+    try:
+        creator_id, video_id = await sample_ids()
+        corpus = fill_corpus(creator_id, video_id)
+        expected = await reference_answers(corpus)
+
+        client = StubLLMClient(dict(corpus), latency=args.llm_latency, jitter=args.llm_jitter, seed=args.seed)
+        llm_gateway.set_client(client)
+        settings.intent_fast_path = not args.no_intents
+        if args.no_cache:
+            sql_cache.max_size = result_cache.max_size = 0
+            sql_cache.store = None
+        sql_cache.clear()
+        result_cache.clear()
+
+        rng = random.Random(args.seed)
+        messages = [[rng.choice(corpus)[0] for _ in range(args.batch)] for _ in range(args.requests)]
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(run_request(m, semaphore, not args.no_coalesce) for m in messages))
+        elapsed = time.perf_counter() - started
+        return build_report(results, elapsed, expected, args, client)
+    finally:
+        await close_db()
+
+
+def main():
+    setup_logging()
+    # per-request INFO lines would dominate the run time
+    logging.getLogger("src").setLevel(logging.WARNING)
+    args = parse_args()
+
+    if args.load_videos:
+        with tempfile.NamedTemporaryFile(suffix=".json") as f:
+            write_json(
+                f.name,
+                n_videos=args.load_videos,
+                snapshots_per_video=args.snapshots_per_video,
+                n_creators=args.creators,
+                seed=random.SystemRandom().getrandbits(32),
+            )
+            stream_load_json_to_db(f.name)
+
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+import sys
+import json
+import time
+import signal
+import asyncio
+import argparse
+import logging
+import secrets
+import statistics
+import subprocess
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import aiohttp
+from aiohttp import web
+
+from benchmarks.corpus import fill_corpus
+from benchmarks.fake_telegram import FakeServer, make_update, start_webhook
+from benchmarks.run import sample_ids, percentile
+from src.database.db import close_db
+from src.utils.logging import setup_logging
+from src.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+# the first replies of a process, compared with the ones after them
+FIRST_REPLIES = 5
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Restart the webhook bot with and without warm-up: time to ready and to the first answers"
+    )
+    parser.add_argument("--runs", type=int, default=3, help="restarts per mode")
+    parser.add_argument("--questions", type=int, default=30, help="distinct questions sent one by one after start")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="fake LLM latency, seconds")
+    parser.add_argument("--shared-state", default="memory", choices=["memory", "postgres"])
+    parser.add_argument("--port", type=int, default=8082, help="webhook port")
+    parser.add_argument("--metrics-port", type=int, default=9190)
+    parser.add_argument("--fake-port", type=int, default=8092, help="port of the fake Telegram/OpenAI server")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--worker-log", help="write the bot's output to this file")
+    parser.add_argument("--json", help="also write the report to this file")
+    return parser.parse_args()
+
+
+async def wait_ready(session: aiohttp.ClientSession, port: int, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            async with session.get(f"http://127.0.0.1:{port}/ready") as response:
+                if response.status == 200:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.05)
+    raise RuntimeError(f"The bot was not ready within {timeout}s")
+
+
+async def startup_phases(session: aiohttp.ClientSession, port: int) -> dict[str, float]:
+    async with session.get(f"http://127.0.0.1:{port}/metrics") as response:
+        body = await response.text()
+    phases = {}
+    for line in body.splitlines():
+        if line.startswith("bot_startup_seconds{"):
+            labels, value = line.rsplit(" ", 1)
+            phases[labels.split('"')[1]] = float(value)
+    return phases
+
+
+async def one_start(
+    args: argparse.Namespace, server: FakeServer, questions: list[str], warm_up: bool, log
+) -> dict:
+    loop = asyncio.get_running_loop()
+    secret = secrets.token_hex(16)
+    url = f"http://127.0.0.1:{args.port}{settings.webhook_path}"
+    env = {
+        "STARTUP_WARMUP": str(warm_up).lower(),
+        "METRICS_ENABLED": "true",
+        "METRICS_PORT": str(args.metrics_port),
+        "SQL_CACHE_PATH": "",
+    }
+    started = time.perf_counter()
+    process = start_webhook(args, 1, secret, log, env)
+    latencies = []
+    try:
+        async with aiohttp.ClientSession() as session:
+            await wait_ready(session, args.metrics_port, args.timeout)
+            ready = time.perf_counter() - started
+            for update_id, question in enumerate(questions, start=1):
+                future = server.pending[update_id] = loop.create_future()
+                sent = time.perf_counter()
+                async with session.post(url, json=make_update(update_id, update_id, question),
+                                        headers={"X-Telegram-Bot-Api-Secret-Token": secret}) as response:
+                    response.raise_for_status()
+                try:
+                    latencies.append(await asyncio.wait_for(future, args.timeout) - sent)
+                finally:
+                    server.pending.pop(update_id, None)
+            phases = await startup_phases(session, args.metrics_port)
+    finally:
+        process.send_signal(signal.SIGTERM)
+        await asyncio.to_thread(process.wait, settings.webhook_drain_timeout + 10)
+    first, rest = latencies[:FIRST_REPLIES], latencies[FIRST_REPLIES:]
+    return {
+        "ready_s": ready,
+        "first_answer_s": ready + latencies[0],
+        "first_reply_ms": latencies[0] * 1000,
+        "first_replies_ms": statistics.fmean(first) * 1000,
+        "later_replies_ms": statistics.fmean(rest) * 1000 if rest else 0.0,
+        "phases": phases,
+    }
+
+
+def summarize(runs: list[dict]) -> dict:
+    keys = ["ready_s", "first_answer_s", "first_reply_ms", "first_replies_ms", "later_replies_ms"]
+    summary = {key: percentile([run[key] for run in runs], 50) for key in keys}
+    phases = {name for run in runs for name in run["phases"]}
+    summary["phases"] = {name: percentile([run["phases"].get(name, 0.0) for run in runs], 50) for name in phases}
+    return summary
+
+
+async def run(args: argparse.Namespace) -> dict:
+    creator_id, video_id = await sample_ids()
+    await close_db()
+    corpus = fill_corpus(creator_id, video_id)
+    questions = [corpus[i % len(corpus)][0] for i in range(args.questions)]
+    server = FakeServer(dict(corpus), args.llm_latency)
+
+    runner = web.AppRunner(server.app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", args.fake_port).start()
+    log = open(args.worker_log, "a") if args.worker_log else subprocess.DEVNULL
+    report = {}
+    try:
+        for mode, warm_up in (("cold", False), ("warm", True)):
+            runs = [await one_start(args, server, questions, warm_up, log) for _ in range(args.runs)]
+            report[mode] = summarize(runs)
+            logger.info(f"{mode}: first answer {report[mode]['first_answer_s']:.2f}s after start")
+    finally:
+        await runner.cleanup()
+        if log is not subprocess.DEVNULL:
+            log.close()
+    return report
+
+
+def print_report(report: dict) -> None:
+    print(f"\nmedians; first replies = first {FIRST_REPLIES} questions after ready")
+    print(f"{'mode':<6}{'import s':>10}{'warm-up s':>11}{'ready s':>9}{'1st answer s':>14}"
+          f"{'1st reply ms':>14}{'first ms':>10}{'later ms':>10}")
+    for mode, r in report.items():
+        print(f"{mode:<6}{r['phases'].get('import', 0):>10.2f}{r['phases'].get('warm_up', 0):>11.2f}"
+              f"{r['ready_s']:>9.2f}{r['first_answer_s']:>14.2f}{r['first_reply_ms']:>14.1f}"
+              f"{r['first_replies_ms']:>10.1f}{r['later_replies_ms']:>10.1f}")
+
+
+def main():
+    setup_logging()
+    logging.getLogger("src").setLevel(logging.WARNING)
+    args = parse_args()
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
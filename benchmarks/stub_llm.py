@@ -0,0 +1,46 @@
+import re
+import json
+import random
+import asyncio
+from types import SimpleNamespace
+
+
+class StubLLMClient:
+    """Offline stand-in for AsyncOpenAI that answers with the reference SQL.
+
+    Each completion sleeps for `latency` seconds with up to `jitter` seconds
+    of uniform noise, so LLM-bound behaviour can be measured without network.
+    """
+
+    def __init__(self, answers: dict[str, str], latency: float = 0.8, jitter: float = 0.2, seed: int = 0):
+        self.answers = answers
+        self.latency = latency
+        self.jitter = jitter
+        self.rng = random.Random(seed)
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.chat = SimpleNamespace(completions=self)
+
+    async def create(self, model: str, messages: list[dict], **kwargs) -> SimpleNamespace:
+        self.calls += 1
+        question = messages[-1]["content"]
+        await asyncio.sleep(max(self.latency + self.rng.uniform(-self.jitter, self.jitter), 0))
+        if kwargs.get("response_format"):
+            # a batch: numbered questions in, {"queries": [{"n", "sql"}]} out
+            numbered = re.findall(r"^(\d+)\. (.+)$", question, re.MULTILINE)
+            sql = json.dumps({"queries": [
+                {"n": int(n), "sql": self.answers.get(q, "SELECT 0;")} for n, q in numbered
+            ]}, ensure_ascii=False)
+        else:
+            sql = self.answers.get(question, "SELECT 0;")
+        prompt_tokens = sum(len(message["content"]) for message in messages) // 4
+        self.prompt_tokens += prompt_tokens
+        return SimpleNamespace(
+            model=model,
+            choices=[SimpleNamespace(message=SimpleNamespace(content=sql))],
+            usage=SimpleNamespace(
+                prompt_tokens=prompt_tokens,
+                completion_tokens=len(sql) // 4,
+                total_tokens=prompt_tokens + len(sql) // 4,
+            ),
+        )
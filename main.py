@@ -1,21 +1,48 @@
+import time
+
+# before the imports: their time is the first startup phase when the bot runs from here
+STARTED = time.perf_counter()
+
 import asyncio
 import logging
 import sys
 
 from aiogram import Bot, Dispatcher, html
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.enums import ParseMode
-from aiogram.filters import CommandStart, Command
-from aiogram.types import Message
+from aiogram.filters import CommandStart, Command, CommandObject
+from aiogram.types import Message, FSInputFile, ReplyParameters
 
 from src.config import settings
-from src.database.db import get_db_session
+from src.database.db import close_db
+from src.database.partitions import partition_maintenance_loop
 from src.utils.logging import setup_logging
-from src.utils.query_executor import execute_natural_language_query
+from src.utils.metrics import REQUEST_SECONDS, start_metrics_server
+from src.utils.timing import stage
+from src.utils.query_executor import answer_query, DeferredToJob
+from src.utils.batch import split_questions, answer_batch
+from src.utils.jobs import Job, job_queue
+from src.utils.sql_governor import QueryTooExpensive, QueryTimedOut
+from src.utils.tables import TableResult, render_table
+from src.utils.concurrency import ThrottlingMiddleware, UpdateTracker
+from src.utils.shared_state import shared_state
+from src.utils.llm_gateway import llm_gateway
+from src.utils.startup import startup, warm_up
 
 #set up bot
-bot = Bot(token=settings.bot_token, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+session = AiohttpSession(api=TelegramAPIServer.from_base(settings.telegram_api_url)) if settings.telegram_api_url else None
+bot = Bot(token=settings.bot_token, session=session, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
 dp = Dispatcher()
+update_tracker = UpdateTracker()
+dp.update.outer_middleware(update_tracker)
+dp.message.middleware(ThrottlingMiddleware(
+    rate_per_minute=settings.rate_limit_per_minute,
+    burst=settings.rate_limit_burst,
+    max_wait=settings.rate_limit_max_wait,
+    state=shared_state,
+))
 
 #set up logging
 setup_logging()
@@ -51,11 +78,103 @@ async def command_help_handler(message: Message) -> None:
         "📈 Динамика:\n"
         "• Какой прирост просмотров за последний час?\n"
         "• Сколько новых лайков за сегодня?\n\n"
+        "Можно прислать несколько вопросов в одном сообщении, по одному на строку.\n\n"
+        "Тяжелые запросы я считаю в фоне и присылаю ответ отдельным сообщением, "
+        "статус можно узнать командой /job с номером задачи.\n\n"
         "Просто напиши свой вопрос, и я найду ответ!"
     )
     await message.answer(help_text)
 
 
+JOB_STATUS = {
+    "running": "выполняется",
+    "done": "готова, ответ отправлен",
+    "failed": "завершилась ошибкой",
+}
+
+
+@dp.message(Command("job"))
+async def command_job_handler(message: Message, command: CommandObject) -> None:
+    """Обработчик команды /job: статус фоновой задачи"""
+    job = job_queue.get((command.args or "").strip())
+    if job is None:
+        await message.answer("Задача не найдена. Номер задачи приходит в ответ на тяжелый запрос: /job номер")
+        return
+    if job.status == "queued":
+        status = f"в очереди, перед ней задач: {job_queue.position(job)}"
+    else:
+        status = JOB_STATUS[job.status]
+    await message.answer(f"Задача {job.id}: {status}.")
+
+
+# long questions are shortened in the reply to stay within one Telegram message
+MAX_ECHOED_QUESTION = 200
+
+
+def format_batch_answer(questions: list[str], results: list) -> str:
+    lines = []
+    for i, (question, result) in enumerate(zip(questions, results), 1):
+        if len(question) > MAX_ECHOED_QUESTION:
+            question = question[:MAX_ECHOED_QUESTION - 1] + "…"
+        if isinstance(result, (QueryTooExpensive, QueryTimedOut)) and settings.job_workers:
+            answer = "тяжелый запрос, задай его отдельным сообщением"
+        elif isinstance(result, Exception):
+            answer = "не удалось получить ответ"
+        elif isinstance(result, TableResult):
+            answer = f"таблица из {result.row_count} строк, задай этот вопрос отдельным сообщением"
+        else:
+            answer = html.bold(str(result))
+        lines.append(f"{i}. {html.quote(question)}\n{answer}")
+    if len(questions) > len(results):
+        lines.append(
+            f"Ответил на первые {len(results)} вопросов из {len(questions)}, остальные пришли отдельным сообщением."
+        )
+    return "\n\n".join(lines)
+
+
+async def send_table(chat_id: int, table: TableResult, reply: ReplyParameters | None = None) -> None:
+    note = " (обрезано по лимиту)" if table.truncated else ""
+    if table.path is None:
+        for text in render_table(table):
+            await bot.send_message(chat_id, text, reply_parameters=reply)
+        if note:
+            await bot.send_message(chat_id, f"Показаны первые {table.row_count} строк{note}.")
+        return
+    # aiogram reads the file in chunks while uploading
+    await bot.send_document(
+        chat_id,
+        FSInputFile(table.path, filename="answer.csv"),
+        caption=f"Строк: {table.row_count}{note}",
+        reply_parameters=reply,
+    )
+
+
+async def deliver_job(job: Job) -> None:
+    """Send the answer of a finished background job as a reply to every question it answers."""
+    for chat_id, message_id in job.subscribers:
+        reply = ReplyParameters(message_id=message_id, allow_sending_without_reply=True)
+        if job.error is not None:
+            text = f"Задача {job.id}: не удалось получить ответ, спроси еще раз."
+            await bot.send_message(chat_id, text, reply_parameters=reply)
+        elif isinstance(job.result, TableResult):
+            await send_table(chat_id, job.result, reply)
+        else:
+            await bot.send_message(chat_id, f"Задача {job.id}: {html.quote(str(job.result))}", reply_parameters=reply)
+
+
+async def defer(message: Message, deferred: DeferredToJob) -> None:
+    try:
+        job = job_queue.submit(deferred, message.chat.id, message.message_id)
+    except asyncio.QueueFull:
+        logger.warning("Job queue is full")
+        await message.answer("Сейчас считается слишком много тяжелых запросов, попробуй позже.")
+        return
+    await message.answer(
+        f"Запрос тяжелый, считаю его в фоне (задача {job.id}). "
+        f"Пришлю ответ отдельным сообщением, статус: /job {job.id}"
+    )
+
+
 @dp.message()
 async def query_handler(message: Message) -> None:
     user_query = message.text.strip()
@@ -64,23 +183,76 @@ async def query_handler(message: Message) -> None:
         await message.answer("Пожалуйста, задай вопрос на русском языке.")
         return
     
-    await bot.send_chat_action(chat_id=message.chat.id, action="typing")
+    started = time.perf_counter()
+    outcome = "error"
+    with stage("typing"):
+        await bot.send_chat_action(chat_id=message.chat.id, action="typing")
     
+    questions = split_questions(user_query) if settings.batch_max_questions > 1 else []
     try:
-        with get_db_session() as db:
-            result = execute_natural_language_query(db, user_query)
-        
-        await message.answer(str(result))
-        
+        if len(questions) > 1:
+            with stage("execute"):
+                results = await answer_batch(questions[:settings.batch_max_questions])
+            for result in results:
+                if isinstance(result, Exception):
+                    logger.error(f"Error executing query: {result}")
+            with stage("answer"):
+                await message.answer(format_batch_answer(questions, results))
+        else:
+            with stage("execute"):
+                result = await answer_query(user_query)
+
+            with stage("answer"):
+                if isinstance(result, TableResult):
+                    await send_table(message.chat.id, result)
+                else:
+                    await message.answer(str(result))
+        outcome = "ok"
+        startup.answered()
+
+    except DeferredToJob as e:
+        with stage("answer"):
+            await defer(message, e)
+        outcome = "deferred"
     except ValueError as e:
         logger.error(f"Error executing query: {e}")
     except Exception as e:
         logger.exception(f"Unexpected error: {e}")
+    finally:
+        REQUEST_SECONDS.labels(outcome).observe(time.perf_counter() - started)
 
 
 async def main() -> None:    
+    startup.begin(STARTED)
     logger.info("Starting bot...")
-    await dp.start_polling(bot)
+    with startup.phase("init"):
+        metrics_runner = await start_metrics_server(ready=startup.is_ready) if settings.metrics_enabled else None
+        maintenance = (
+            asyncio.create_task(partition_maintenance_loop(settings.partition_maintenance_interval))
+            if settings.partition_maintenance_interval else None
+        )
+        if settings.columnar_cache:
+            from src.utils.columnar import columnar_store
+
+            # loads in the background, questions go to SQL until it is ready
+            columnar_store.schedule_refresh()
+        if settings.job_workers:
+            job_queue.start(deliver_job)
+    if settings.startup_warmup:
+        with startup.phase("warm_up"):
+            await warm_up(bot)
+    # polling starts only now, so no update waits for the warm-up
+    startup.set_ready()
+    try:
+        await dp.start_polling(bot)
+    finally:
+        await job_queue.stop(settings.job_drain_timeout)
+        if maintenance is not None:
+            maintenance.cancel()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        await llm_gateway.close()
+        await close_db()
 
 
 if __name__ == "__main__":
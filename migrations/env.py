@@ -13,7 +13,7 @@ from src.config import settings
 config = context.config
 
 # Set the database URL from our settings
-config.set_main_option("sqlalchemy.url", settings.db_url)
+config.set_main_option("sqlalchemy.url", settings.primary_db_url)
 
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
@@ -26,6 +26,13 @@ from src.database.models import Base
 target_metadata = Base.metadata
 # target_metadata = None
 
+from src.database.partitions import PARTITIONED_TABLE
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    # partitions of video_snapshots are managed by src/database/partitions.py
+    return not (type_ == "table" and reflected and compare_to is None and name.startswith(f"{PARTITIONED_TABLE}_"))
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -71,7 +78,7 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata, include_object=include_object
         )
 
         with context.begin_transaction():
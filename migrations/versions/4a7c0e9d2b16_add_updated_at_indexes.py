@@ -0,0 +1,30 @@
+"""add updated_at indexes
+
+Revision ID: 4a7c0e9d2b16
+Revises: f3b8d61c2a95
+Create Date: 2026-01-19 14:22:07.845113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4a7c0e9d2b16'
+down_revision: Union[str, Sequence[str], None] = 'f3b8d61c2a95'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_videos_updated_at', 'videos', ['updated_at'], unique=False)
+    op.create_index('ix_video_snapshots_updated_at', 'video_snapshots', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_video_snapshots_updated_at', table_name='video_snapshots')
+    op.drop_index('ix_videos_updated_at', table_name='videos')
@@ -0,0 +1,61 @@
+"""add snapshot rollups
+
+Revision ID: 7d2f5a9c1b83
+Revises: e61b0f4d8a27
+Create Date: 2025-12-22 11:47:05.331962
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d2f5a9c1b83'
+down_revision: Union[str, Sequence[str], None] = 'e61b0f4d8a27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+DELTA_COLUMNS = ['delta_views_count', 'delta_likes_count', 'delta_comments_count', 'delta_reports_count']
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('video_snapshots_hourly',
+    sa.Column('bucket', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('creator_id', sa.String(), nullable=False),
+    *[sa.Column(name, sa.BigInteger(), nullable=False) for name in DELTA_COLUMNS],
+    sa.Column('snapshots_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('bucket', 'creator_id')
+    )
+    op.create_table('video_snapshots_daily',
+    sa.Column('bucket', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('video_id', sa.String(), nullable=False),
+    sa.Column('creator_id', sa.String(), nullable=False),
+    *[sa.Column(name, sa.BigInteger(), nullable=False) for name in DELTA_COLUMNS],
+    sa.Column('snapshots_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('bucket', 'video_id')
+    )
+    op.create_index('ix_video_snapshots_daily_creator_id_bucket', 'video_snapshots_daily', ['creator_id', 'bucket'], unique=False)
+
+    sums = ', '.join(f'SUM(s.{name})' for name in DELTA_COLUMNS)
+    columns = ', '.join(DELTA_COLUMNS)
+    op.execute(
+        f"INSERT INTO video_snapshots_hourly (bucket, creator_id, {columns}, snapshots_count) "
+        f"SELECT date_trunc('hour', s.created_at, 'UTC'), v.creator_id, {sums}, COUNT(*) "
+        f"FROM video_snapshots s JOIN videos v ON v.id = s.video_id GROUP BY 1, 2"
+    )
+    op.execute(
+        f"INSERT INTO video_snapshots_daily (bucket, video_id, creator_id, {columns}, snapshots_count) "
+        f"SELECT date_trunc('day', s.created_at, 'UTC'), s.video_id, v.creator_id, {sums}, COUNT(*) "
+        f"FROM video_snapshots s JOIN videos v ON v.id = s.video_id GROUP BY 1, 2, 3"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_video_snapshots_daily_creator_id_bucket', table_name='video_snapshots_daily')
+    op.drop_table('video_snapshots_daily')
+    op.drop_table('video_snapshots_hourly')
@@ -0,0 +1,35 @@
+"""add data version
+
+Revision ID: a3c91d2e7f40
+Revises: 5359f3989eab
+Create Date: 2025-12-20 12:10:41.518203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3c91d2e7f40'
+down_revision: Union[str, Sequence[str], None] = '5359f3989eab'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('data_version',
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute("INSERT INTO data_version (id, version, created_at, updated_at) VALUES ('global', 0, NOW(), NOW())")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('data_version')
@@ -0,0 +1,35 @@
+"""add ingestion watermark
+
+Revision ID: c9a4e71f3b06
+Revises: b5e8c2a7d913
+Create Date: 2025-12-24 09:31:18.274630
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c9a4e71f3b06'
+down_revision: Union[str, Sequence[str], None] = 'b5e8c2a7d913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('ingestion_watermark',
+    sa.Column('last_snapshot_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('rows_loaded', sa.BigInteger(), nullable=False),
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('ingestion_watermark')
@@ -0,0 +1,43 @@
+"""add query indexes
+
+Revision ID: e61b0f4d8a27
+Revises: a3c91d2e7f40
+Create Date: 2025-12-21 15:02:17.904416
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e61b0f4d8a27'
+down_revision: Union[str, Sequence[str], None] = 'a3c91d2e7f40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # creator filters, alone or with a publication date range
+    op.create_index('ix_videos_creator_id_video_created_at', 'videos', ['creator_id', 'video_created_at'], unique=False)
+    op.create_index('ix_videos_video_created_at', 'videos', ['video_created_at'], unique=False)
+    # joins on video_id and per-video dynamics
+    op.create_index('ix_video_snapshots_video_id_created_at', 'video_snapshots', ['video_id', 'created_at'], unique=False)
+    # SUM(delta_*) over a time window is answered by an index-only scan
+    op.create_index(
+        'ix_video_snapshots_created_at',
+        'video_snapshots',
+        ['created_at'],
+        unique=False,
+        postgresql_include=['delta_views_count', 'delta_likes_count', 'delta_comments_count', 'delta_reports_count'],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_video_snapshots_created_at', table_name='video_snapshots')
+    op.drop_index('ix_video_snapshots_video_id_created_at', table_name='video_snapshots')
+    op.drop_index('ix_videos_video_created_at', table_name='videos')
+    op.drop_index('ix_videos_creator_id_video_created_at', table_name='videos')
@@ -0,0 +1,90 @@
+"""partition video snapshots
+
+Revision ID: f3b8d61c2a95
+Revises: c9a4e71f3b06
+Create Date: 2026-01-12 10:04:51.602318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b8d61c2a95'
+down_revision: Union[str, Sequence[str], None] = 'c9a4e71f3b06'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# days of partitions created ahead of today; later ones come from partition maintenance
+AHEAD_DAYS = 7
+
+CREATE_DAILY_PARTITIONS = f"""
+DO $$
+DECLARE
+    day date;
+BEGIN
+    FOR day IN
+        SELECT generate_series(
+            LEAST(
+                (SELECT min(created_at AT TIME ZONE 'UTC')::date FROM video_snapshots_old),
+                (now() AT TIME ZONE 'UTC')::date
+            ),
+            (now() AT TIME ZONE 'UTC')::date + {AHEAD_DAYS},
+            interval '1 day'
+        )::date
+    LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF video_snapshots FOR VALUES FROM (%L) TO (%L)',
+            'video_snapshots_p' || to_char(day, 'YYYYMMDD'),
+            day::timestamp AT TIME ZONE 'UTC',
+            (day + 1)::timestamp AT TIME ZONE 'UTC'
+        );
+    END LOOP;
+END
+$$;
+"""
+
+
+def create_indexes() -> None:
+    op.create_index('ix_video_snapshots_video_id_created_at', 'video_snapshots', ['video_id', 'created_at'], unique=False)
+    op.create_index('ix_video_snapshots_created_at', 'video_snapshots', ['created_at'], unique=False, postgresql_include=['delta_views_count', 'delta_likes_count', 'delta_comments_count', 'delta_reports_count'])
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.rename_table('video_snapshots', 'video_snapshots_old')
+    op.execute('ALTER TABLE video_snapshots_old RENAME CONSTRAINT video_snapshots_pkey TO video_snapshots_old_pkey')
+    op.drop_index('ix_video_snapshots_video_id_created_at', table_name='video_snapshots_old')
+    op.drop_index('ix_video_snapshots_created_at', table_name='video_snapshots_old')
+
+    # the partition key has to be part of the primary key
+    op.execute(
+        'CREATE TABLE video_snapshots (LIKE video_snapshots_old INCLUDING DEFAULTS, '
+        'PRIMARY KEY (id, created_at), CONSTRAINT video_snapshots_video_id_fkey FOREIGN KEY (video_id) REFERENCES videos (id)) '
+        'PARTITION BY RANGE (created_at)'
+    )
+    op.execute(CREATE_DAILY_PARTITIONS)
+    op.execute('CREATE TABLE video_snapshots_default PARTITION OF video_snapshots DEFAULT')
+    op.execute('INSERT INTO video_snapshots SELECT * FROM video_snapshots_old')
+    op.drop_table('video_snapshots_old')
+    create_indexes()
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.rename_table('video_snapshots', 'video_snapshots_old')
+    op.execute('ALTER TABLE video_snapshots_old RENAME CONSTRAINT video_snapshots_pkey TO video_snapshots_old_pkey')
+    op.drop_index('ix_video_snapshots_video_id_created_at', table_name='video_snapshots_old')
+    op.drop_index('ix_video_snapshots_created_at', table_name='video_snapshots_old')
+
+    op.execute(
+        'CREATE TABLE video_snapshots (LIKE video_snapshots_old INCLUDING DEFAULTS, '
+        'PRIMARY KEY (id), CONSTRAINT video_snapshots_video_id_fkey FOREIGN KEY (video_id) REFERENCES videos (id))'
+    )
+    op.execute('INSERT INTO video_snapshots SELECT * FROM video_snapshots_old')
+    # drops the partitions too
+    op.drop_table('video_snapshots_old')
+    create_indexes()
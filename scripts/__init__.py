@@ -1,4 +1,11 @@
-from scripts.loader import load_json_to_db
+from scripts.loader import load_json_to_db, stream_load_json_to_db, incremental_load_json_to_db
+from scripts.parallel_loader import parallel_load_json_to_db
 from scripts.load_data import main
 
-__all__ = ["load_json_to_db", "main"]
\ No newline at end of file
+__all__ = [
+    "load_json_to_db",
+    "stream_load_json_to_db",
+    "incremental_load_json_to_db",
+    "parallel_load_json_to_db",
+    "main",
+]
@@ -0,0 +1,94 @@
+import sys
+import json
+import sqlite3
+import argparse
+import logging
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import text
+
+from benchmarks.corpus import fill_corpus
+from src.config import settings
+from src.database.db import get_db_session
+from src.utils.few_shot import FewShotIndex
+from src.utils.llm import validate_sql_query
+from src.utils.logging import setup_logging
+
+
+logger = logging.getLogger(__name__)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Build the few-shot example index from verified question -> SQL pairs",
+        epilog="Example: python scripts/build_few_shot.py data/few_shot.jsonl --log data/verified.jsonl",
+    )
+    parser.add_argument("output", help="JSONL file to write, point FEW_SHOT_PATH at it")
+    parser.add_argument("--log", action="append", default=[],
+                        help="JSONL of pairs logged by the bot (FEW_SHOT_LOG_PATH), can be repeated")
+    parser.add_argument("--sql-cache", default=settings.sql_cache_path,
+                        help="SQLite store of the SQL cache (keys are normalized questions)")
+    parser.add_argument("--no-corpus", action="store_true", help="leave out the benchmark corpus")
+    parser.add_argument("--no-check", action="store_true", help="do not EXPLAIN the SQL against the database")
+    return parser.parse_args()
+
+
+def read_log(path: str) -> list[tuple[str, str]]:
+    pairs = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                item = json.loads(line)
+                pairs.append((item["question"], item["sql"]))
+    return pairs
+
+
+def read_sql_cache(path: str) -> list[tuple[str, str]]:
+    connection = sqlite3.connect(path)
+    try:
+        return connection.execute("SELECT key, sql FROM sql_cache ORDER BY created_at DESC").fetchall()
+    finally:
+        connection.close()
+
+
+def plannable(pairs: list[tuple[str, str]]) -> list[tuple[str, str]]:
+    """Pairs whose SQL passes validation and the planner."""
+    kept = []
+    with get_db_session() as db:
+        for question, sql in pairs:
+            if not validate_sql_query(sql):
+                continue
+            try:
+                with db.begin_nested():
+                    db.execute(text(f"EXPLAIN {sql}"))
+            except Exception as e:
+                logger.warning(f"Dropped {question!r}: {e.__class__.__name__}")
+                continue
+            kept.append((question, sql))
+    return kept
+
+
+def main():
+    setup_logging()
+    args = parse_args()
+
+    # real questions first: the first pair of a question shape is kept
+    pairs = [pair for path in args.log for pair in read_log(path)]
+    if args.sql_cache and Path(args.sql_cache).exists():
+        pairs += read_sql_cache(args.sql_cache)
+    if not args.no_corpus:
+        pairs += fill_corpus("abc123", "xyz")
+    if not args.no_check:
+        pairs = plannable(pairs)
+
+    index = FewShotIndex(pairs)
+    with open(args.output, "w", encoding="utf-8") as f:
+        for question, sql in index.examples:
+            f.write(json.dumps({"question": question, "sql": sql}, ensure_ascii=False) + "\n")
+    print(f"{len(index)} examples from {len(pairs)} pairs written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
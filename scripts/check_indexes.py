@@ -0,0 +1,133 @@
+import re
+import sys
+import random
+import json
+import argparse
+import logging
+from pathlib import Path
+from datetime import datetime, timezone
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from scripts.loader import copy_rows, _video_row, _snapshot_row, VIDEO_COLUMNS, SNAPSHOT_COLUMNS
+from scripts.synthetic import generate_videos
+from src.database.db import engine
+from src.utils.llm import SYSTEM_PROMPT
+from src.utils.logging import setup_logging
+
+
+logger = logging.getLogger(__name__)
+
+EXAMPLE_RE = re.compile(r'^- "(?P<question>[^"]+)" -> (?P<sql>SELECT .+)$', re.MULTILINE)
+CREATOR_LITERAL_RE = re.compile(r"creator_id = '[^']*'")
+VIDEO_LITERAL_RE = re.compile(r"\b(video_)?id = '[^']*'")
+# share of a relation's rows above which a sequential scan beats an index
+SEQ_SCAN_SHARE = 0.5
+
+# Shapes the prompt rules lead to but that have no example of their own
+EXTRA_QUERIES = [
+    ("Сколько видео опубликовано за последние сутки?",
+     "SELECT COUNT(*) FROM videos WHERE video_created_at >= NOW() - INTERVAL '1 day';"),
+    ("Сколько видео у креатора за последний месяц?",
+     "SELECT COUNT(*) FROM videos WHERE creator_id = 'abc123' AND video_created_at >= NOW() - INTERVAL '30 days';"),
+    ("Прирост просмотров у видео xyz за сутки?",
+     "SELECT SUM(delta_views_count) FROM video_snapshots WHERE video_id = 'xyz' AND created_at >= NOW() - INTERVAL '1 day';"),
+    ("Прирост лайков у креатора abc123 за сегодня?",
+     "SELECT SUM(s.delta_likes_count) FROM video_snapshots s JOIN videos v ON v.id = s.video_id "
+     "WHERE v.creator_id = 'abc123' AND s.created_at >= CURRENT_DATE;"),
+]
+
+
+def plan_nodes(plan: dict):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+def load_sample(cursor, n_videos: int, snapshots_per_video: int, seed: int, batch_size: int = 50_000) -> tuple[str, str]:
+    now = datetime.now(timezone.utc)
+    videos, snapshots = [], []
+    creator_id = video_id = None
+    for video_data in generate_videos(
+        n_videos=n_videos, snapshots_per_video=snapshots_per_video, n_creators=max(n_videos // 50, 1), seed=seed
+    ):
+        creator_id, video_id = video_data["creator_id"], video_data["id"]
+        videos.append(_video_row(video_data, now))
+        snapshots.extend(_snapshot_row(video_id, s, now) for s in video_data["snapshots"])
+        if len(videos) + len(snapshots) >= batch_size:
+            copy_rows(cursor, "videos", VIDEO_COLUMNS, videos)
+            copy_rows(cursor, "video_snapshots", SNAPSHOT_COLUMNS, snapshots)
+            videos.clear()
+            snapshots.clear()
+    copy_rows(cursor, "videos", VIDEO_COLUMNS, videos)
+    copy_rows(cursor, "video_snapshots", SNAPSHOT_COLUMNS, snapshots)
+    cursor.execute("ANALYZE videos")
+    cursor.execute("ANALYZE video_snapshots")
+    return creator_id, video_id
+
+
+def wasteful_seq_scan(cursor, node: dict) -> bool:
+    """A sequential scan is fine on an empty relation (a future partition)
+    or when most of it is selected anyway (a partition inside the time window)."""
+    if node["Node Type"] != "Seq Scan":
+        return False
+    cursor.execute("SELECT reltuples FROM pg_class WHERE oid = %s::regclass", (node["Relation Name"],))
+    rows = cursor.fetchone()[0]
+    return rows > 0 and node["Plan Rows"] < rows * SEQ_SCAN_SHARE
+
+
+def check_query(cursor, sql: str) -> tuple[bool, list[str], list[str]]:
+    """A filtered query passes when no table is read with a wasteful sequential scan."""
+    cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}")
+    explain = cursor.fetchone()[0]
+    if isinstance(explain, str):
+        explain = json.loads(explain)
+    nodes = list(plan_nodes(explain[0]["Plan"]))
+    indexes = sorted({node["Index Name"] for node in nodes if "Index Name" in node})
+    seq_scans = sorted({node["Relation Name"] for node in nodes if wasteful_seq_scan(cursor, node)})
+    filtered = " WHERE " in sql.upper()
+    return (not filtered or not seq_scans), indexes, seq_scans
+
+
+def main():
+    setup_logging()
+    parser = argparse.ArgumentParser(
+        description="Check with EXPLAIN that the prompt's query shapes use indexes. "
+                    "The sample data is inserted in a transaction that is rolled back."
+    )
+    parser.add_argument("--videos", type=int, default=5000)
+    parser.add_argument("--snapshots-per-video", type=int, default=48)
+    # a fresh seed by default, so the sample never collides with loaded ids
+    parser.add_argument("--seed", type=int, default=random.SystemRandom().getrandbits(32))
+    args = parser.parse_args()
+
+    queries = [(m["question"], m["sql"]) for m in EXAMPLE_RE.finditer(SYSTEM_PROMPT)] + EXTRA_QUERIES
+
+    connection = engine.raw_connection()
+    failed = 0
+    try:
+        cursor = connection.cursor()
+        logger.info(f"Generating {args.videos} videos x {args.snapshots_per_video} snapshots...")
+        creator_id, video_id = load_sample(cursor, args.videos, args.snapshots_per_video, args.seed)
+
+        for question, sql in queries:
+            sql = CREATOR_LITERAL_RE.sub(f"creator_id = '{creator_id}'", sql)
+            sql = VIDEO_LITERAL_RE.sub(lambda m: f"{m.group(1) or ''}id = '{video_id}'", sql)
+            ok, indexes, seq_scans = check_query(cursor, sql)
+            failed += not ok
+            logger.info(
+                f"[{'OK' if ok else 'FAIL'}] {question}\n    {sql}\n"
+                f"    indexes: {', '.join(indexes) or '-'}; seq scans: {', '.join(seq_scans) or '-'}"
+            )
+    finally:
+        connection.rollback()
+        connection.close()
+
+    if failed:
+        logger.error(f"{failed} of {len(queries)} filtered queries use a sequential scan")
+        sys.exit(1)
+    logger.info(f"All {len(queries)} queries use indexes where they filter")
+
+
+if __name__ == "__main__":
+    main()
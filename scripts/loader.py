@@ -0,0 +1,487 @@
+import io
+import re
+import csv
+import json
+import time
+import logging
+import resource
+from pathlib import Path
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Iterator
+
+from sqlalchemy import func
+
+from src.database.models import Video, VideoSnapshot, IngestionWatermark
+from src.database.db import engine, get_db_session, bump_data_version, BUMP_DATA_VERSION_SQL
+from src.database.rollups import apply_rollups, rebuild_rollups
+
+logger = logging.getLogger(__name__)
+
+
+VIDEO_COLUMNS = [
+    "id", "creator_id", "video_created_at",
+    "views_count", "likes_count", "comments_count", "reports_count",
+    "created_at", "updated_at",
+]
+
+SNAPSHOT_COLUMNS = [
+    "id", "video_id",
+    "views_count", "likes_count", "comments_count", "reports_count",
+    "delta_views_count", "delta_likes_count", "delta_comments_count", "delta_reports_count",
+    "created_at", "updated_at",
+]
+
+STAGING_TABLE = "snapshot_batch"
+VIDEO_STAGING_TABLE = "video_batch"
+
+# video columns that come from the export and are refreshed by incremental loads
+VIDEO_UPDATE_COLUMNS = [
+    "creator_id", "video_created_at",
+    "views_count", "likes_count", "comments_count", "reports_count",
+]
+TOTAL_COLUMNS = ["views_count", "likes_count", "comments_count", "reports_count"]
+
+# held for the whole incremental load, so two loaders never interleave
+INGESTION_LOCK_SQL = "SELECT pg_try_advisory_lock(hashtext('ingestion'))"
+INGESTION_UNLOCK_SQL = "SELECT pg_advisory_unlock(hashtext('ingestion'))"
+
+VIDEOS_KEY_RE = re.compile(r'"videos"\s*:\s*\[')
+WHITESPACE_RE = re.compile(r'[\s,]*')
+
+
+def parse_datetime(dt_str: str) -> datetime:
+    formats = [
+        "%Y-%m-%dT%H:%M:%S+00:00",
+        "%Y-%m-%dT%H:%M:%S.%f+00:00",
+        "%Y-%m-%dT%H:%M:%S.%fZ",
+    ]
+    for fmt in formats:
+        try:
+            dt = datetime.strptime(dt_str, fmt)
+            if dt_str.endswith('Z'):
+                dt = dt.replace(tzinfo=timezone.utc)
+            return dt
+        except ValueError:
+            continue
+    raise ValueError(f"Unable to parse date: {dt_str}")
+
+
+def release_ingestion_lock(connection) -> None:
+    """Release INGESTION_LOCK_SQL before a raw pooled connection goes back to the pool.
+
+    The lock belongs to the session, which the pool keeps open. If the unlock
+    fails, the connection is discarded instead: ending the session releases it.
+    """
+    try:
+        connection.rollback()
+        cursor = connection.cursor()
+        cursor.execute(INGESTION_UNLOCK_SQL)
+        cursor.close()
+        connection.commit()
+    except Exception as e:
+        logger.warning(f"Could not release the ingestion lock, dropping the connection: {e}")
+        connection.invalidate()
+
+
+@contextmanager
+def ingestion_lock(connection):
+    """Hold INGESTION_LOCK_SQL on a raw pooled connection for a whole load.
+
+    Every loader runs under it, so their transactions never overlap: each
+    one starts after all earlier ones committed and gets a later `now()`.
+    That is what makes updated_at a safe watermark for the columnar store.
+    """
+    cursor = connection.cursor()
+    cursor.execute(INGESTION_LOCK_SQL)
+    locked = cursor.fetchone()[0]
+    cursor.close()
+    if not locked:
+        raise RuntimeError("Another load is running")
+    try:
+        yield
+    finally:
+        release_ingestion_lock(connection)
+
+
+def load_json_to_db(json_path: str | Path) -> None:
+    json_path = Path(json_path)
+
+    if not json_path.exists():
+        raise FileNotFoundError(f"File not found: {json_path}")
+
+    with open(json_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    if not isinstance(data['videos'], list):
+        raise ValueError("JSON must contain an array of video objects")
+
+    connection = engine.raw_connection()
+    try:
+        with ingestion_lock(connection), get_db_session() as db:
+            for video_data in data['videos']:
+                logger.info(f"Loading video: {video_data['id']}")
+                video = Video(
+                    id=video_data["id"],
+                    creator_id=video_data["creator_id"],
+                    video_created_at=parse_datetime(video_data["video_created_at"]),
+                    views_count=video_data.get("views_count", 0),
+                    likes_count=video_data.get("likes_count", 0),
+                    comments_count=video_data.get("comments_count", 0),
+                    reports_count=video_data.get("reports_count", 0),
+                    updated_at=func.now(),
+                )
+                db.add(video)
+
+                snapshots = video_data['snapshots']
+                for snapshot_data in snapshots:
+                    snapshot = VideoSnapshot(
+                        id=snapshot_data["id"],
+                        video_id=video.id,
+                        views_count=snapshot_data.get("views_count", 0),
+                        likes_count=snapshot_data.get("likes_count", 0),
+                        comments_count=snapshot_data.get("comments_count", 0),
+                        reports_count=snapshot_data.get("reports_count", 0),
+                        delta_views_count=snapshot_data.get("delta_views_count", 0),
+                        delta_likes_count=snapshot_data.get("delta_likes_count", 0),
+                        delta_comments_count=snapshot_data.get("delta_comments_count", 0),
+                        delta_reports_count=snapshot_data.get("delta_reports_count", 0),
+                        created_at=parse_datetime(snapshot_data["created_at"]),
+                        updated_at=func.now(),
+                    )
+                    db.add(snapshot)
+
+            db.flush()
+            rebuild_rollups(db)
+            bump_data_version(db)
+            logger.info(f"Loaded {len(data)} videos to database")
+    finally:
+        connection.close()
+
+
+def iter_videos(json_path: str | Path, chunk_size: int = 1 << 20) -> Iterator[dict]:
+    """Yield video objects from the `videos` array one by one.
+
+    Only the current video (with its snapshots) and one read chunk are kept
+    in memory, so the file size does not affect peak memory.
+    """
+    for video_data, _ in iter_video_spans(json_path, chunk_size):
+        yield video_data
+
+
+def iter_video_spans(json_path: str | Path, chunk_size: int = 1 << 20) -> Iterator[tuple[dict, str]]:
+    """Like `iter_videos`, but also yield the JSON text of every video."""
+    with open(json_path, "r", encoding="utf-8") as f:
+        buffer = ""
+        while True:
+            match = VIDEOS_KEY_RE.search(buffer)
+            if match:
+                buffer = buffer[match.end():]
+                break
+            chunk = f.read(chunk_size)
+            if not chunk:
+                raise ValueError("JSON must contain an array of video objects")
+            # keep the tail in case the key is split between chunks
+            buffer = buffer[-16:] + chunk
+
+        decoder = json.JSONDecoder()
+        eof = False
+        while True:
+            pos = WHITESPACE_RE.match(buffer).end()
+            if pos < len(buffer) and buffer[pos] == "]":
+                return
+            try:
+                video_data, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer = buffer[pos:] + chunk
+                continue
+            text = buffer[pos:end]
+            buffer = buffer[end:]
+            yield video_data, text
+
+
+def _video_row(video_data: dict, now: datetime) -> list:
+    return [
+        video_data["id"],
+        video_data["creator_id"],
+        parse_datetime(video_data["video_created_at"]).isoformat(),
+        video_data.get("views_count", 0),
+        video_data.get("likes_count", 0),
+        video_data.get("comments_count", 0),
+        video_data.get("reports_count", 0),
+        now.isoformat(),
+        now.isoformat(),
+    ]
+
+
+def _snapshot_row(video_id: str, snapshot_data: dict, now: datetime) -> list:
+    return [
+        snapshot_data["id"],
+        video_id,
+        snapshot_data.get("views_count", 0),
+        snapshot_data.get("likes_count", 0),
+        snapshot_data.get("comments_count", 0),
+        snapshot_data.get("reports_count", 0),
+        snapshot_data.get("delta_views_count", 0),
+        snapshot_data.get("delta_likes_count", 0),
+        snapshot_data.get("delta_comments_count", 0),
+        snapshot_data.get("delta_reports_count", 0),
+        parse_datetime(snapshot_data["created_at"]).isoformat(),
+        now.isoformat(),
+    ]
+
+
+def copy_rows(cursor, table: str, columns: list[str], rows: list[list]) -> None:
+    buf = io.StringIO()
+    csv.writer(buf).writerows(rows)
+    buf.seek(0)
+    cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buf)
+
+
+def stamped(columns: list[str]) -> str:
+    """Select list of `columns` with updated_at set by the database.
+
+    `now()` is the start of the inserting transaction, not its commit. It
+    still grows in commit order because loads hold `ingestion_lock`, so no
+    two loading transactions overlap; the columnar store relies on that to
+    read only what changed since its last refresh.
+    """
+    return ", ".join("now()" if c == "updated_at" else c for c in columns)
+
+
+def insert_snapshots_sql(source: str) -> str:
+    return (
+        f"INSERT INTO {VideoSnapshot.__tablename__} ({', '.join(SNAPSHOT_COLUMNS)}) "
+        f"SELECT {stamped(SNAPSHOT_COLUMNS)} FROM {source}"
+    )
+
+
+def create_staging_table(cursor, table: str = STAGING_TABLE, like: str = VideoSnapshot.__tablename__) -> None:
+    """Temp table that holds one batch of rows until it is committed."""
+    cursor.execute(
+        f"CREATE TEMP TABLE IF NOT EXISTS {table} "
+        f"(LIKE {like} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+    )
+
+
+def stream_load_json_to_db(json_path: str | Path, batch_size: int = 50_000) -> int:
+    """Load a JSON export through COPY in batches of at most `batch_size` rows.
+
+    Each batch is committed on its own, together with its rollup updates.
+    Returns the number of loaded rows.
+    """
+    json_path = Path(json_path)
+
+    if not json_path.exists():
+        raise FileNotFoundError(f"File not found: {json_path}")
+
+    now = datetime.now(timezone.utc)
+    videos: list[list] = []
+    snapshots: list[list] = []
+    total_rows = 0
+    started = time.perf_counter()
+
+    connection = engine.raw_connection()
+    try:
+        with ingestion_lock(connection):
+            cursor = connection.cursor()
+            create_staging_table(cursor)
+            create_staging_table(cursor, VIDEO_STAGING_TABLE, Video.__tablename__)
+
+            def flush() -> None:
+                nonlocal total_rows
+                copy_rows(cursor, VIDEO_STAGING_TABLE, VIDEO_COLUMNS, videos)
+                copy_rows(cursor, STAGING_TABLE, SNAPSHOT_COLUMNS, snapshots)
+                # videos go first because snapshots reference them
+                cursor.execute(
+                    f"INSERT INTO {Video.__tablename__} ({', '.join(VIDEO_COLUMNS)}) "
+                    f"SELECT {stamped(VIDEO_COLUMNS)} FROM {VIDEO_STAGING_TABLE}"
+                )
+                cursor.execute(insert_snapshots_sql(STAGING_TABLE))
+                apply_rollups(cursor, STAGING_TABLE)
+                cursor.execute(BUMP_DATA_VERSION_SQL)
+                connection.commit()
+                total_rows += len(videos) + len(snapshots)
+                elapsed = time.perf_counter() - started
+                logger.info(f"Loaded {total_rows} rows, {total_rows / elapsed:.0f} rows/s")
+                videos.clear()
+                snapshots.clear()
+
+            for video_data in iter_videos(json_path):
+                videos.append(_video_row(video_data, now))
+                for snapshot_data in video_data.get("snapshots", []):
+                    snapshots.append(_snapshot_row(video_data["id"], snapshot_data, now))
+                if len(videos) + len(snapshots) >= batch_size:
+                    flush()
+
+            if videos or snapshots:
+                flush()
+            cursor.close()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+    elapsed = time.perf_counter() - started
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    logger.info(
+        f"Loaded {total_rows} rows in {elapsed:.1f}s "
+        f"({total_rows / max(elapsed, 1e-9):.0f} rows/s), peak memory {peak_mb:.0f} MB"
+    )
+    return total_rows
+
+
+def upsert_videos_sql(source: str) -> str:
+    """Insert new videos and refresh changed ones; unchanged rows are not rewritten."""
+    columns = ", ".join(VIDEO_COLUMNS)
+    updates = ", ".join(f"{c} = EXCLUDED.{c}" for c in [*VIDEO_UPDATE_COLUMNS, "updated_at"])
+    current = ", ".join(f"videos.{c}" for c in VIDEO_UPDATE_COLUMNS)
+    incoming = ", ".join(f"EXCLUDED.{c}" for c in VIDEO_UPDATE_COLUMNS)
+    return (
+        f"INSERT INTO videos ({columns}) SELECT {stamped(VIDEO_COLUMNS)} FROM {source} "
+        f"ON CONFLICT (id) DO UPDATE SET {updates} "
+        f"WHERE ({current}) IS DISTINCT FROM ({incoming})"
+    )
+
+
+def sync_video_totals_sql(source: str) -> str:
+    """Copy the counters of the newest snapshot in `source` to its video.
+
+    A snapshot only wins if no newer one is already stored for the video.
+    """
+    totals = ", ".join(TOTAL_COLUMNS)
+    updates = ", ".join(f"{c} = l.{c}" for c in TOTAL_COLUMNS)
+    current = ", ".join(f"v.{c}" for c in TOTAL_COLUMNS)
+    latest = ", ".join(f"l.{c}" for c in TOTAL_COLUMNS)
+    return (
+        f"UPDATE videos v SET {updates}, updated_at = now() "
+        f"FROM (SELECT DISTINCT ON (video_id) video_id, created_at, {totals} FROM {source} "
+        f"ORDER BY video_id, created_at DESC) l "
+        f"WHERE v.id = l.video_id "
+        f"AND NOT EXISTS (SELECT 1 FROM video_snapshots s WHERE s.video_id = l.video_id AND s.created_at > l.created_at) "
+        f"AND ({current}) IS DISTINCT FROM ({latest})"
+    )
+
+
+def advance_watermark_sql(source: str) -> str:
+    table = IngestionWatermark.__tablename__
+    return (
+        f"INSERT INTO {table} (id, last_snapshot_at, rows_loaded, created_at, updated_at) "
+        f"SELECT %s, MAX(created_at), COUNT(*), now(), now() FROM {source} "
+        f"ON CONFLICT (id) DO UPDATE SET "
+        f"last_snapshot_at = GREATEST({table}.last_snapshot_at, EXCLUDED.last_snapshot_at), "
+        f"rows_loaded = {table}.rows_loaded + EXCLUDED.rows_loaded, updated_at = now()"
+    )
+
+
+def _as_utc(dt: datetime) -> datetime:
+    # "+00:00" timestamps are parsed as naive datetimes
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def get_watermark(cursor, source: str) -> datetime | None:
+    cursor.execute(f"SELECT last_snapshot_at FROM {IngestionWatermark.__tablename__} WHERE id = %s", (source,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def incremental_load_json_to_db(json_path: str | Path, batch_size: int = 50_000, source: str = "default") -> int:
+    """Merge a newer export into the database without reloading it.
+
+    Videos are upserted, only snapshots with unseen ids are inserted and
+    counted in the rollups, and video totals follow the newest snapshot.
+    Snapshots of already known videos that are older than the watermark of
+    `source` are dropped before they reach the database; a new video keeps
+    its whole history. Batches are committed one by one, and readers see the
+    previous state until each commit.
+    Returns the number of new snapshots.
+    """
+    json_path = Path(json_path)
+
+    if not json_path.exists():
+        raise FileNotFoundError(f"File not found: {json_path}")
+
+    now = datetime.now(timezone.utc)
+    batch: list[dict] = []
+    batch_rows = 0
+    new_snapshots = 0
+    changed_videos = 0
+    skipped = 0
+    started = time.perf_counter()
+
+    connection = engine.raw_connection()
+    try:
+        with ingestion_lock(connection):
+            cursor = connection.cursor()
+            create_staging_table(cursor)
+            create_staging_table(cursor, VIDEO_STAGING_TABLE, Video.__tablename__)
+            watermark = get_watermark(cursor, source)
+            connection.commit()
+            logger.info(f"Watermark of '{source}': {watermark}")
+
+            def flush() -> None:
+                nonlocal new_snapshots, changed_videos, skipped
+                known = set()
+                if watermark is not None:
+                    cursor.execute("SELECT id FROM videos WHERE id = ANY(%s)", ([v["id"] for v in batch],))
+                    known = {row[0] for row in cursor.fetchall()}
+
+                videos, snapshots = [], []
+                for video_data in batch:
+                    videos.append(_video_row(video_data, now))
+                    for snapshot_data in video_data.get("snapshots", []):
+                        if video_data["id"] in known and _as_utc(parse_datetime(snapshot_data["created_at"])) < watermark:
+                            skipped += 1
+                            continue
+                        snapshots.append(_snapshot_row(video_data["id"], snapshot_data, now))
+
+                copy_rows(cursor, VIDEO_STAGING_TABLE, VIDEO_COLUMNS, videos)
+                copy_rows(cursor, STAGING_TABLE, SNAPSHOT_COLUMNS, snapshots)
+                cursor.execute(upsert_videos_sql(VIDEO_STAGING_TABLE))
+                changed = cursor.rowcount
+                # what is left in the staging table is new, and only that reaches the rollups
+                cursor.execute(
+                    f"DELETE FROM {STAGING_TABLE} b USING video_snapshots s "
+                    f"WHERE s.id = b.id AND s.created_at = b.created_at"
+                )
+                cursor.execute(insert_snapshots_sql(STAGING_TABLE))
+                inserted = cursor.rowcount
+                if inserted:
+                    apply_rollups(cursor, STAGING_TABLE)
+                    cursor.execute(sync_video_totals_sql(STAGING_TABLE))
+                    changed += cursor.rowcount
+                    cursor.execute(advance_watermark_sql(STAGING_TABLE), (source,))
+                if changed or inserted:
+                    cursor.execute(BUMP_DATA_VERSION_SQL)
+                connection.commit()
+                new_snapshots += inserted
+                changed_videos += changed
+                batch.clear()
+
+            for video_data in iter_videos(json_path):
+                batch.append(video_data)
+                batch_rows += 1 + len(video_data.get("snapshots", []))
+                if batch_rows >= batch_size:
+                    flush()
+                    batch_rows = 0
+
+            if batch:
+                flush()
+            cursor.close()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+    elapsed = time.perf_counter() - started
+    logger.info(
+        f"Incremental load in {elapsed:.1f}s: {new_snapshots} new snapshots, "
+        f"{skipped} skipped below the watermark, {changed_videos} videos inserted or updated"
+    )
+    return new_snapshots
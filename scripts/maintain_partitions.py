@@ -0,0 +1,41 @@
+import sys
+import argparse
+import logging
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.config import settings
+from src.database.db import get_db_session
+from src.database.partitions import maintain_partitions
+from src.utils.logging import setup_logging
+
+
+logger = logging.getLogger(__name__)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Create upcoming video_snapshots partitions and apply retention",
+        epilog="Example (cron): python scripts/maintain_partitions.py --retention-days 90 --mode drop",
+    )
+    parser.add_argument("--ahead-days", type=int, default=settings.snapshot_partition_ahead_days)
+    parser.add_argument("--retention-days", type=int, default=settings.snapshot_retention_days,
+                        help="remove partitions older than this many days (0 = keep everything)")
+    parser.add_argument("--mode", choices=["detach", "drop"], default=settings.snapshot_retention_mode,
+                        help="detach old partitions (kept as standalone tables) or drop them")
+    return parser.parse_args()
+
+
+def main():
+    setup_logging()
+    args = parse_args()
+    with get_db_session() as db:
+        stats = maintain_partitions(db, args.ahead_days, args.retention_days, args.mode)
+    print(f"created: {', '.join(stats['created']) or '-'}")
+    print(f"moved from default: {stats['moved_rows']}")
+    print(f"{args.mode}: {', '.join(stats['removed']) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+import os
+import json
+import time
+import uuid
+import logging
+from pathlib import Path
+from datetime import datetime, timezone
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import psycopg2
+
+from src.config import settings
+from src.database.db import engine, BUMP_DATA_VERSION_SQL
+from src.database.models import Video, VideoSnapshot
+from src.database.rollups import apply_rollups
+from scripts.loader import (
+    VIDEO_COLUMNS,
+    SNAPSHOT_COLUMNS,
+    ingestion_lock,
+    iter_video_spans,
+    copy_rows,
+    upsert_videos_sql,
+    insert_snapshots_sql,
+    sync_video_totals_sql,
+    advance_watermark_sql,
+)
+
+logger = logging.getLogger(__name__)
+
+
+# connection of a pool worker, opened once per process
+_connection = None
+
+
+def _init_worker(db_url: str) -> None:
+    global _connection
+    _connection = psycopg2.connect(db_url)
+
+
+def _video_row(video_data: dict, now: str) -> list:
+    # timestamps go to COPY as they are: Postgres parses ISO 8601 itself
+    return [
+        video_data["id"],
+        video_data["creator_id"],
+        video_data["video_created_at"],
+        video_data.get("views_count", 0),
+        video_data.get("likes_count", 0),
+        video_data.get("comments_count", 0),
+        video_data.get("reports_count", 0),
+        now,
+        now,
+    ]
+
+
+def _snapshot_row(video_id: str, snapshot_data: dict, now: str) -> list:
+    return [
+        snapshot_data["id"],
+        video_id,
+        snapshot_data.get("views_count", 0),
+        snapshot_data.get("likes_count", 0),
+        snapshot_data.get("comments_count", 0),
+        snapshot_data.get("reports_count", 0),
+        snapshot_data.get("delta_views_count", 0),
+        snapshot_data.get("delta_likes_count", 0),
+        snapshot_data.get("delta_comments_count", 0),
+        snapshot_data.get("delta_reports_count", 0),
+        snapshot_data["created_at"],
+        now,
+    ]
+
+
+def load_shard(texts: list[str], video_table: str, snapshot_table: str, now: str) -> tuple[int, float]:
+    """Parse a shard of videos and COPY it into the staging tables.
+
+    Runs in a pool worker. Returns the number of rows and the busy time.
+    """
+    started = time.perf_counter()
+    videos, snapshots = [], []
+    for text in texts:
+        video_data = json.loads(text)
+        videos.append(_video_row(video_data, now))
+        for snapshot_data in video_data.get("snapshots", []):
+            snapshots.append(_snapshot_row(video_data["id"], snapshot_data, now))
+
+    with _connection.cursor() as cursor:
+        copy_rows(cursor, video_table, VIDEO_COLUMNS, videos)
+        copy_rows(cursor, snapshot_table, SNAPSHOT_COLUMNS, snapshots)
+    _connection.commit()
+    return len(videos) + len(snapshots), time.perf_counter() - started
+
+
+def iter_shards(json_path: str | Path, shard_rows: int):
+    shard, rows = [], 0
+    for video_data, text in iter_video_spans(json_path):
+        shard.append(text)
+        rows += 1 + len(video_data.get("snapshots", []))
+        if rows >= shard_rows:
+            yield shard
+            shard, rows = [], 0
+    if shard:
+        yield shard
+
+
+def merge_staging(cursor, video_table: str, snapshot_table: str, source: str) -> int:
+    """Move staged rows into the real tables; the caller commits.
+
+    Same rules as the incremental loader: videos are upserted, snapshots
+    with known ids are dropped, rollups get only the new rows.
+    """
+    cursor.execute(f"ANALYZE {video_table}")
+    cursor.execute(f"ANALYZE {snapshot_table}")
+    cursor.execute(upsert_videos_sql(video_table))
+    # created_at lets each lookup go to one partition
+    cursor.execute(
+        f"DELETE FROM {snapshot_table} b USING video_snapshots s "
+        f"WHERE s.id = b.id AND s.created_at = b.created_at"
+    )
+    cursor.execute(insert_snapshots_sql(snapshot_table))
+    inserted = cursor.rowcount
+    apply_rollups(cursor, snapshot_table)
+    cursor.execute(sync_video_totals_sql(snapshot_table))
+    cursor.execute(advance_watermark_sql(snapshot_table), (source,))
+    cursor.execute(BUMP_DATA_VERSION_SQL)
+    return inserted
+
+
+def projected_speedups(busy: float, serial: float, cores=(1, 2, 4, 8, 16)) -> dict[int, float]:
+    """Amdahl's law for the measured parallel (parse + COPY) and serial (merge) work."""
+    return {n: (busy + serial) / (busy / n + serial) for n in cores}
+
+
+def parallel_load_json_to_db(
+    json_path: str | Path,
+    workers: int | None = None,
+    shard_rows: int = 50_000,
+    source: str = "default",
+    merge: bool = True,
+) -> dict:
+    """Load an export with a pool of processes, all or nothing.
+
+    Workers parse shards of videos and COPY them over their own connections
+    into UNLOGGED staging tables. One final transaction merges the staging
+    tables into videos/video_snapshots, updates rollups, totals, the
+    watermark and the data version. If anything fails, that transaction is
+    rolled back and the staging tables are dropped.
+    With `merge=False` only the parallel part runs (for benchmarks).
+    Returns timing stats.
+    """
+    json_path = Path(json_path)
+
+    if not json_path.exists():
+        raise FileNotFoundError(f"File not found: {json_path}")
+
+    workers = workers or os.cpu_count() or 1
+    run = uuid.uuid4().hex[:8]
+    video_table, snapshot_table = f"video_load_{run}", f"snapshot_load_{run}"
+    now = datetime.now(timezone.utc).isoformat()
+    total_rows = 0
+    busy = 0.0
+    started = time.perf_counter()
+
+    connection = engine.raw_connection()
+    try:
+        with ingestion_lock(connection):
+            cursor = connection.cursor()
+            cursor.execute(f"CREATE UNLOGGED TABLE {video_table} (LIKE {Video.__tablename__} INCLUDING DEFAULTS)")
+            cursor.execute(
+                f"CREATE UNLOGGED TABLE {snapshot_table} (LIKE {VideoSnapshot.__tablename__} INCLUDING DEFAULTS)"
+            )
+            connection.commit()
+
+            try:
+                pool = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(settings.primary_db_url,))
+                try:
+                    pending = set()
+                    for shard in iter_shards(json_path, shard_rows):
+                        # keep a bounded number of shards in memory
+                        if len(pending) >= workers * 2:
+                            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                            for future in done:
+                                rows, seconds = future.result()
+                                total_rows += rows
+                                busy += seconds
+                        pending.add(pool.submit(load_shard, shard, video_table, snapshot_table, now))
+                    for future in pending:
+                        rows, seconds = future.result()
+                        total_rows += rows
+                        busy += seconds
+                except BaseException:
+                    # do not wait for shards that have not started
+                    pool.shutdown(cancel_futures=True)
+                    raise
+                pool.shutdown()
+                parallel_done = time.perf_counter()
+                logger.info(f"Staged {total_rows} rows with {workers} workers in {parallel_done - started:.1f}s")
+
+                inserted = merge_staging(cursor, video_table, snapshot_table, source) if merge else 0
+                connection.commit()
+            except BaseException:
+                connection.rollback()
+                raise
+            finally:
+                cursor.execute(f"DROP TABLE IF EXISTS {video_table}, {snapshot_table}")
+                connection.commit()
+            cursor.close()
+    finally:
+        connection.close()
+
+    finished = time.perf_counter()
+    parallel = parallel_done - started
+    serial = finished - parallel_done
+    stats = {
+        "rows": total_rows,
+        "new_snapshots": inserted,
+        "workers": workers,
+        "cores": os.cpu_count(),
+        "parallel_s": parallel,
+        "worker_busy_s": busy,
+        "merge_s": serial,
+        "total_s": finished - started,
+        "rows_per_s": total_rows / (finished - started),
+        # average number of shards in work at once
+        "parallelism": busy / parallel if parallel else 0.0,
+        "projected_speedup": projected_speedups(busy, serial),
+    }
+    logger.info(
+        f"Loaded {total_rows} rows ({inserted} new snapshots) in {stats['total_s']:.1f}s, "
+        f"{stats['rows_per_s']:.0f} rows/s: parse+COPY {parallel:.1f}s "
+        f"(workers busy {busy:.1f}s, parallelism {stats['parallelism']:.2f} with {workers} workers, "
+        f"{stats['cores']} cores), merge {serial:.1f}s"
+    )
+    logger.info("Projected speedup by cores: " + ", ".join(
+        f"{n}: {s:.2f}x" for n, s in stats["projected_speedup"].items()
+    ))
+    return stats
@@ -0,0 +1,107 @@
+import sys
+import json
+import random
+import argparse
+import logging
+from pathlib import Path
+from datetime import datetime, timedelta, timezone
+from typing import Iterator
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.utils.logging import setup_logging
+
+
+logger = logging.getLogger(__name__)
+
+DATETIME_FORMAT = "%Y-%m-%dT%H:%M:%S+00:00"
+
+
+def _random_id(rng: random.Random) -> str:
+    return "%032x" % rng.getrandbits(128)
+
+
+def generate_videos(
+    n_videos: int = 1000,
+    snapshots_per_video: int = 24,
+    n_creators: int = 100,
+    seed: int = 0,
+    end: datetime | None = None,
+) -> Iterator[dict]:
+    """Yield videos in the same shape as the JSON export.
+
+    Snapshots are hourly and the newest one of every video is taken in the
+    hour before `end` (now by default), so "за последний час" style filters
+    select a realistic fraction of rows.
+    """
+    rng = random.Random(seed)
+    end = (end or datetime.now(timezone.utc)).replace(minute=0, second=0, microsecond=0)
+    creators = [_random_id(rng) for _ in range(n_creators)]
+
+    for _ in range(n_videos):
+        video_id = _random_id(rng)
+        first_snapshot_at = end - timedelta(hours=snapshots_per_video)
+        video_created_at = first_snapshot_at - timedelta(hours=rng.randint(0, 24 * 30))
+
+        totals = {"views_count": 0, "likes_count": 0, "comments_count": 0, "reports_count": 0}
+        snapshots = []
+        for hour in range(snapshots_per_video):
+            deltas = {
+                "views_count": rng.randint(0, 500),
+                "likes_count": rng.randint(0, 50),
+                "comments_count": rng.randint(0, 10),
+                "reports_count": rng.randint(0, 1),
+            }
+            for name, delta in deltas.items():
+                totals[name] += delta
+            snapshots.append({
+                "id": _random_id(rng),
+                "video_id": video_id,
+                **totals,
+                **{f"delta_{name}": delta for name, delta in deltas.items()},
+                "created_at": (first_snapshot_at + timedelta(hours=hour, minutes=rng.randint(0, 59))).strftime(DATETIME_FORMAT),
+            })
+
+        yield {
+            "id": video_id,
+            "creator_id": rng.choice(creators),
+            "video_created_at": video_created_at.strftime(DATETIME_FORMAT),
+            **totals,
+            "snapshots": snapshots,
+        }
+
+
+def write_json(path: str | Path, **kwargs) -> None:
+    """Write generated videos as a JSON export without holding them in memory."""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{"videos": [')
+        for i, video in enumerate(generate_videos(**kwargs)):
+            if i:
+                f.write(",")
+            f.write("\n")
+            json.dump(video, f, ensure_ascii=False)
+        f.write("\n]}\n")
+
+
+def main():
+    setup_logging()
+    parser = argparse.ArgumentParser(description="Generate a synthetic videos/snapshots JSON export")
+    parser.add_argument("json_path", help="output file")
+    parser.add_argument("--videos", type=int, default=1000)
+    parser.add_argument("--snapshots-per-video", type=int, default=24)
+    parser.add_argument("--creators", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    write_json(
+        args.json_path,
+        n_videos=args.videos,
+        snapshots_per_video=args.snapshots_per_video,
+        n_creators=args.creators,
+        seed=args.seed,
+    )
+    logger.info(f"Wrote {args.videos} videos with {args.snapshots_per_video} snapshots each to {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,18 +5,127 @@ from pydantic_settings import SettingsConfigDict, BaseSettings
 class Settings(BaseSettings):
 	bot_token: str = Field(..., alias="BOT_TOKEN")
 	openai_api_key: str = Field(..., alias="OPENAI_API_KEY")
+	# LLM gateway settings
+	llm_model: str = Field("gpt-4o", alias="LLM_MODEL")
+	llm_fallback_model: str = Field("gpt-4o-mini", alias="LLM_FALLBACK_MODEL")
+	llm_hedge_after: float = Field(4.0, alias="LLM_HEDGE_AFTER")
+	llm_timeout: float = Field(20.0, alias="LLM_TIMEOUT")
+	llm_temperature: float = Field(0.0, alias="LLM_TEMPERATURE")
 	# PostgreSQL settings
 	db_host: str = Field("localhost", alias="DB_HOST")
 	db_port: int = Field(5432, alias="DB_PORT")
 	db_name: str = Field("rlt_test_bot", alias="DB_NAME")
 	db_user: str = Field("postgres", alias="DB_USER")
 	db_password: str = Field("", alias="DB_PASSWORD")
+	# Connection pool of every engine: size, extra connections under load, seconds to wait for one,
+	# check a connection before use, replace connections older than DB_POOL_RECYCLE seconds (-1 never)
+	db_pool_size: int = Field(10, alias="DB_POOL_SIZE")
+	db_max_overflow: int = Field(10, alias="DB_MAX_OVERFLOW")
+	db_pool_timeout: float = Field(30.0, alias="DB_POOL_TIMEOUT")
+	db_pool_pre_ping: bool = Field(True, alias="DB_POOL_PRE_PING")
+	db_pool_recycle: int = Field(1800, alias="DB_POOL_RECYCLE")
+	# DB_HOST is pgbouncer in transaction pooling mode: no server-side prepared statements or startup settings
+	db_pgbouncer: bool = Field(False, alias="DB_PGBOUNCER")
+	# Direct postgresql:// DSN of the primary for loads and maintenance, past pgbouncer (empty: DB_HOST)
+	db_primary_url: str = Field("", alias="DB_PRIMARY_URL")
+	# Read replicas for analytics queries, comma-separated postgresql:// DSNs (empty: everything on the primary)
+	db_replica_urls: str = Field("", alias="DB_REPLICA_URLS")
+	# Few-shot prompt: the K most similar verified examples and only the tables they need (0 sends the full
+	# static prompt), the example index built by scripts/build_few_shot.py, where to log verified pairs
+	few_shot_k: int = Field(4, alias="FEW_SHOT_K")
+	few_shot_path: str | None = Field(None, alias="FEW_SHOT_PATH")
+	few_shot_log_path: str | None = Field(None, alias="FEW_SHOT_LOG_PATH")
+	# Generated SQL cache settings
+	sql_cache_size: int = Field(1024, alias="SQL_CACHE_SIZE")
+	sql_cache_ttl: int = Field(86400, alias="SQL_CACHE_TTL")
+	sql_cache_path: str | None = Field(None, alias="SQL_CACHE_PATH")
+	# Query result cache settings
+	result_cache_size: int = Field(1024, alias="RESULT_CACHE_SIZE")
+	result_cache_now_bucket: int = Field(60, alias="RESULT_CACHE_NOW_BUCKET")
+	# Route SUM(delta_*) queries to the hourly/daily rollup tables
+	rollup_routing: bool = Field(True, alias="ROLLUP_ROUTING")
+	# Answer common questions with the rule-based matcher before calling the LLM
+	intent_fast_path: bool = Field(True, alias="INTENT_FAST_PATH")
+	# Prometheus metrics endpoint
+	metrics_enabled: bool = Field(True, alias="METRICS_ENABLED")
+	metrics_host: str = Field("0.0.0.0", alias="METRICS_HOST")
+	metrics_port: int = Field(9100, alias="METRICS_PORT")
+	# Concurrency limits and per-user rate limiting
+	max_concurrent_llm: int = Field(8, alias="MAX_CONCURRENT_LLM")
+	max_concurrent_db: int = Field(10, alias="MAX_CONCURRENT_DB")
+	rate_limit_per_minute: float = Field(20, alias="RATE_LIMIT_PER_MINUTE")
+	rate_limit_burst: int = Field(5, alias="RATE_LIMIT_BURST")
+	rate_limit_max_wait: float = Field(3.0, alias="RATE_LIMIT_MAX_WAIT")
+	# Generated SQL guard: per-query timeout and planner cost budget (0 disables the check)
+	sql_statement_timeout_ms: int = Field(5000, alias="SQL_STATEMENT_TIMEOUT_MS")
+	sql_max_cost: float = Field(50_000, alias="SQL_MAX_COST")
+	sql_reprompt_on_cost: bool = Field(True, alias="SQL_REPROMPT_ON_COST")
+	# Background jobs: a question over SQL_MAX_COST or SQL_STATEMENT_TIMEOUT_MS runs on JOB_WORKERS worker tasks
+	# per process (0 disables jobs) under these limits and is answered with a follow-up message; at most
+	# JOB_QUEUE_SIZE jobs wait, running ones get JOB_DRAIN_TIMEOUT seconds to finish on shutdown
+	job_workers: int = Field(2, alias="JOB_WORKERS")
+	job_queue_size: int = Field(100, alias="JOB_QUEUE_SIZE")
+	job_max_cost: float = Field(5_000_000, alias="JOB_MAX_COST")
+	job_statement_timeout_ms: int = Field(300_000, alias="JOB_STATEMENT_TIMEOUT_MS")
+	job_drain_timeout: float = Field(30.0, alias="JOB_DRAIN_TIMEOUT")
+	# Bind parameters instead of literals in generated SQL; prepared statements kept per connection
+	sql_parameterize: bool = Field(True, alias="SQL_PARAMETERIZE")
+	db_prepared_statement_cache_size: int = Field(256, alias="DB_PREPARED_STATEMENT_CACHE_SIZE")
+	db_plan_cache_mode: str = Field("auto", alias="DB_PLAN_CACHE_MODE")
+	# Tables in answers: rows per server-side cursor fetch, tables up to RESULT_INLINE_ROWS rows go as messages,
+	# larger ones as a CSV file; reading stops at RESULT_MAX_ROWS rows or RESULT_MAX_BYTES of CSV
+	result_chunk_rows: int = Field(1000, alias="RESULT_CHUNK_ROWS")
+	result_inline_rows: int = Field(30, alias="RESULT_INLINE_ROWS")
+	result_max_rows: int = Field(100_000, alias="RESULT_MAX_ROWS")
+	result_max_bytes: int = Field(20 * 2**20, alias="RESULT_MAX_BYTES")
+	# Answer a message with several questions (one per line) in one LLM call and one query; 1 disables
+	batch_max_questions: int = Field(10, alias="BATCH_MAX_QUESTIONS")
+	# Where caches and rate limits shared by worker processes live: memory or postgres
+	shared_state_backend: str = Field("memory", alias="SHARED_STATE_BACKEND")
+	# Warm up before taking updates: DB pools, common statements, caches, LLM and Bot API connections;
+	# gives up after STARTUP_WARMUP_TIMEOUT seconds and starts anyway
+	startup_warmup: bool = Field(True, alias="STARTUP_WARMUP")
+	startup_warmup_timeout: float = Field(30.0, alias="STARTUP_WARMUP_TIMEOUT")
+	# Webhook mode (webhook.py)
+	webhook_url: str | None = Field(None, alias="WEBHOOK_URL")
+	webhook_path: str = Field("/webhook", alias="WEBHOOK_PATH")
+	webhook_secret: str | None = Field(None, alias="WEBHOOK_SECRET")
+	webhook_host: str = Field("0.0.0.0", alias="WEBHOOK_HOST")
+	webhook_port: int = Field(8080, alias="WEBHOOK_PORT")
+	webhook_workers: int = Field(1, alias="WEBHOOK_WORKERS")
+	webhook_drain_timeout: float = Field(30.0, alias="WEBHOOK_DRAIN_TIMEOUT")
+	# Alternative API endpoints (local Bot API server, OpenAI-compatible proxy or a fake for load tests)
+	telegram_api_url: str | None = Field(None, alias="TELEGRAM_API_URL")
+	openai_base_url: str | None = Field(None, alias="OPENAI_BASE_URL")
+	# video_snapshots partitions: days created ahead, retention (0 keeps everything), detach or drop old ones,
+	# how often the bot runs maintenance, seconds (0 leaves it to scripts/maintain_partitions.py)
+	snapshot_partition_ahead_days: int = Field(7, alias="SNAPSHOT_PARTITION_AHEAD_DAYS")
+	snapshot_retention_days: int = Field(0, alias="SNAPSHOT_RETENTION_DAYS")
+	snapshot_retention_mode: str = Field("detach", alias="SNAPSHOT_RETENTION_MODE")
+	partition_maintenance_interval: float = Field(3600, alias="PARTITION_MAINTENANCE_INTERVAL")
+	# Answer aggregate questions from an in-memory column copy of the tables (needs RAM, see README)
+	columnar_cache: bool = Field(False, alias="COLUMNAR_CACHE")
 	
 
 	@property
 	def db_url(self) -> str:
 		return f"postgresql://{self.db_user}:{self.db_password}@{self.db_host}:{self.db_port}/{self.db_name}"
 
+	@property
+	def primary_db_url(self) -> str:
+		return self.db_primary_url or self.db_url
+
+	@property
+	def async_db_url(self) -> str:
+		return f"postgresql+asyncpg://{self.db_user}:{self.db_password}@{self.db_host}:{self.db_port}/{self.db_name}"
+
+	@property
+	def async_replica_urls(self) -> list[str]:
+		return [
+			url.strip().replace("postgresql://", "postgresql+asyncpg://", 1)
+			for url in self.db_replica_urls.split(",") if url.strip()
+		]
+
 	model_config = SettingsConfigDict(
 		case_sensitive = False,
 		env_file = ".env",
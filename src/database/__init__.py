@@ -1,5 +1,29 @@
-from src.database.models import Base, Video, VideoSnapshot
-from src.database.db import init_db, get_db, get_db_session
-
-__all__ = ["Base", "Video", "VideoSnapshot", "init_db", "get_db", "get_db_session"]
+from src.database.models import Base, Video, VideoSnapshot, DataVersion, IngestionWatermark
+from src.database.db import (
+    init_db,
+    get_db,
+    get_db_session,
+    get_async_db_session,
+    get_async_read_session,
+    close_db,
+    bump_data_version,
+    get_data_version,
+)
+from src.database.partitions import maintain_partitions
 
+__all__ = [
+    "Base",
+    "Video",
+    "VideoSnapshot",
+    "DataVersion",
+    "IngestionWatermark",
+    "init_db",
+    "get_db",
+    "get_db_session",
+    "get_async_db_session",
+    "get_async_read_session",
+    "close_db",
+    "bump_data_version",
+    "get_data_version",
+    "maintain_partitions",
+]
@@ -1,18 +1,120 @@
-from sqlalchemy import create_engine
+import uuid
+import itertools
+import logging
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession, AsyncEngine
 from sqlalchemy.orm import sessionmaker, Session
-from contextlib import contextmanager
-from typing import Generator
+from contextlib import contextmanager, asynccontextmanager
+from typing import AsyncGenerator, Generator
 
 from src.config import settings
-from src.database.models import Base
+from src.database.models import Base, DataVersion
+
+logger = logging.getLogger(__name__)
+
+
+POOL_OPTIONS = {
+    "pool_size": settings.db_pool_size,
+    "max_overflow": settings.db_max_overflow,
+    "pool_timeout": settings.db_pool_timeout,
+    "pool_pre_ping": settings.db_pool_pre_ping,
+    "pool_recycle": settings.db_pool_recycle,
+}
+
 
+def _async_connect_args() -> dict:
+    if settings.db_pgbouncer:
+        # transaction pooling gives every transaction its own server connection: a statement prepared
+        # on one is missing on the next, and startup parameters like plan_cache_mode are rejected
+        return {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+        }
+    # asyncpg prepares every statement; the prepared ones are kept per connection by SQL text
+    return {
+        "prepared_statement_cache_size": settings.db_prepared_statement_cache_size,
+        "server_settings": {"plan_cache_mode": settings.db_plan_cache_mode},
+    }
 
-engine = create_engine(settings.db_url, echo=False)
+
+def _create_async_engine(url: str) -> AsyncEngine:
+    return create_async_engine(url, echo=False, connect_args=_async_connect_args(), **POOL_OPTIONS)
+
+
+# the primary, straight past pgbouncer: schema, loads and partitions
+engine = create_engine(settings.primary_db_url, echo=False, **POOL_OPTIONS)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# the primary through DB_HOST: data version and shared state
+async_engine = _create_async_engine(settings.async_db_url)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+# analytics reads take the replicas in turn, the primary when there are none
+read_engines = [_create_async_engine(url) for url in settings.async_replica_urls] or [async_engine]
+_next_read_engine = itertools.cycle(read_engines).__next__
+
+
+class ReadSession(Session):
+    """Session on a replica that moves to the primary if the replica cannot be reached.
+
+    The check is the session's own first connect, so a healthy replica costs
+    no extra round trip. Once moved, every later statement stays on the primary.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fallback = None
+
+    def get_bind(self, *args, **kwargs):
+        return self.fallback or super().get_bind(*args, **kwargs)
+
+    def _connection_for_bind(self, engine, execution_options=None, **kw):
+        try:
+            return super()._connection_for_bind(engine, execution_options, **kw)
+        except (OSError, DBAPIError) as e:
+            # only reached on connect: a connected bind is reused without connecting again
+            primary = async_engine.sync_engine
+            if engine is primary:
+                raise
+            logger.warning(f"Replica {engine.url.host}:{engine.url.port} is unavailable, reading from the primary: {e}")
+            self.fallback = primary
+            return super()._connection_for_bind(primary, execution_options, **kw)
+
+
+ReadSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False, sync_session_class=ReadSession)
+
+
+DATA_VERSION_ID = "global"
+
+BUMP_DATA_VERSION_SQL = (
+    f"INSERT INTO {DataVersion.__tablename__} (id, version, created_at, updated_at) "
+    f"VALUES ('{DATA_VERSION_ID}', 1, NOW(), NOW()) "
+    f"ON CONFLICT (id) DO UPDATE SET version = {DataVersion.__tablename__}.version + 1, updated_at = NOW()"
+)
+
 
 def init_db():
+    from src.database.partitions import create_default_partition, maintain_partitions
+
     Base.metadata.create_all(bind=engine)
+    with get_db_session() as db:
+        create_default_partition(db)
+        maintain_partitions(db)
+
+
+def bump_data_version(db: Session) -> None:
+    """Mark the data as changed. Must run in the same transaction as the load."""
+    db.execute(text(BUMP_DATA_VERSION_SQL))
+
+
+async def get_data_version(db: AsyncSession) -> int:
+    result = await db.execute(
+        text(f"SELECT version FROM {DataVersion.__tablename__} WHERE id = :id"), {"id": DATA_VERSION_ID}
+    )
+    return result.scalar() or 0
 
 
 def get_db() -> Generator[Session, None, None]:
@@ -35,3 +137,35 @@ def get_db_session():
     finally:
         db.close()
 
+
+@asynccontextmanager
+async def _async_session(bind: AsyncEngine, factory=AsyncSessionLocal) -> AsyncGenerator[AsyncSession, None]:
+    db = factory(bind=bind)
+    try:
+        yield db
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    finally:
+        await db.close()
+
+
+def get_async_db_session():
+    """Session on the primary."""
+    return _async_session(async_engine)
+
+
+def get_async_read_session():
+    """Session for read-only queries on the next replica.
+
+    If the replica cannot be reached, the session falls back to the primary.
+    """
+    return _async_session(_next_read_engine(), ReadSessionLocal)
+
+
+async def close_db() -> None:
+    for read_engine in read_engines:
+        if read_engine is not async_engine:
+            await read_engine.dispose()
+    await async_engine.dispose()
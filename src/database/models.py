@@ -1,6 +1,6 @@
 from datetime import datetime, timezone
 
-from sqlalchemy import Integer, String, ForeignKey, DateTime
+from sqlalchemy import Integer, BigInteger, Float, String, Text, ForeignKey, DateTime, Index, Table, Column, PrimaryKeyConstraint
 from sqlalchemy.orm import Mapped, mapped_column, relationship, DeclarativeBase
 
 class Base(DeclarativeBase):
@@ -10,6 +10,12 @@ class Base(DeclarativeBase):
 
 class Video(Base):
     __tablename__ = "videos"
+    __table_args__ = (
+        Index("ix_videos_creator_id_video_created_at", "creator_id", "video_created_at"),
+        Index("ix_videos_video_created_at", "video_created_at"),
+        # incremental refresh of the columnar store
+        Index("ix_videos_updated_at", "updated_at"),
+    )
 
     creator_id: Mapped[str] = mapped_column(String)
     video_created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
@@ -22,7 +28,22 @@ class Video(Base):
 
 
 class VideoSnapshot(Base):
+    """Range-partitioned by day of created_at, see src/database/partitions.py."""
     __tablename__ = "video_snapshots"
+    __table_args__ = (
+        Index("ix_video_snapshots_video_id_created_at", "video_id", "created_at"),
+        Index(
+            "ix_video_snapshots_created_at",
+            "created_at",
+            postgresql_include=["delta_views_count", "delta_likes_count", "delta_comments_count", "delta_reports_count"],
+        ),
+        Index("ix_video_snapshots_updated_at", "updated_at"),
+        PrimaryKeyConstraint("id", "created_at"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
+    # the partition key has to be part of the primary key
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), primary_key=True)
 
     video_id: Mapped[str] = mapped_column(String, ForeignKey("videos.id"), nullable=False)
     views_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
@@ -34,4 +55,64 @@ class VideoSnapshot(Base):
     delta_comments_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
     delta_reports_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
 
-    video: Mapped["Video"] = relationship(back_populates="snapshots")
\ No newline at end of file
+    video: Mapped["Video"] = relationship(back_populates="snapshots")
+
+class DataVersion(Base):
+    __tablename__ = "data_version"
+
+    version: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+
+class IngestionWatermark(Base):
+    """How far incremental loads of one source have got; `id` is the source name."""
+    __tablename__ = "ingestion_watermark"
+
+    last_snapshot_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    rows_loaded: Mapped[int] = mapped_column(BigInteger, default=0, nullable=False)
+
+
+DELTA_COLUMNS = ["delta_views_count", "delta_likes_count", "delta_comments_count", "delta_reports_count"]
+
+# Rollups are plain tables: they have no id/created_at of their own,
+# so they do not inherit from Base.
+video_snapshots_hourly = Table(
+    "video_snapshots_hourly",
+    Base.metadata,
+    Column("bucket", DateTime(timezone=True), nullable=False),
+    Column("creator_id", String, nullable=False),
+    *[Column(name, BigInteger, nullable=False, default=0) for name in DELTA_COLUMNS],
+    Column("snapshots_count", Integer, nullable=False, default=0),
+    PrimaryKeyConstraint("bucket", "creator_id"),
+)
+
+video_snapshots_daily = Table(
+    "video_snapshots_daily",
+    Base.metadata,
+    Column("bucket", DateTime(timezone=True), nullable=False),
+    Column("video_id", String, nullable=False),
+    Column("creator_id", String, nullable=False),
+    *[Column(name, BigInteger, nullable=False, default=0) for name in DELTA_COLUMNS],
+    Column("snapshots_count", Integer, nullable=False, default=0),
+    PrimaryKeyConstraint("bucket", "video_id"),
+    Index("ix_video_snapshots_daily_creator_id_bucket", "creator_id", "bucket"),
+)
+
+# Cross-process state for webhook workers (SHARED_STATE_BACKEND=postgres).
+# UNLOGGED: losing it on a crash only costs cache misses.
+shared_cache = Table(
+    "shared_cache",
+    Base.metadata,
+    Column("key", String, primary_key=True),
+    Column("value", Text, nullable=False),
+    Column("expires_at", DateTime(timezone=True), nullable=False),
+    prefixes=["UNLOGGED"],
+)
+
+rate_limit_buckets = Table(
+    "rate_limit_buckets",
+    Base.metadata,
+    Column("key", String, primary_key=True),
+    Column("tokens", Float, nullable=False),
+    Column("updated_at", DateTime(timezone=True), nullable=False),
+    prefixes=["UNLOGGED"],
+)
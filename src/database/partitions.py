@@ -0,0 +1,179 @@
+import time
+import asyncio
+import logging
+from datetime import date, datetime, time as dtime, timedelta, timezone
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from src.config import settings
+from src.database.db import get_db_session, bump_data_version
+from src.database.models import VideoSnapshot
+from src.database.rollups import delete_rollups
+
+logger = logging.getLogger(__name__)
+
+
+# video_snapshots is range-partitioned by created_at, one partition per UTC day.
+# Rows outside the existing partitions land in the default partition until
+# maintenance creates their day and moves them there.
+PARTITIONED_TABLE = VideoSnapshot.__tablename__
+PARTITION_PREFIX = f"{PARTITIONED_TABLE}_p"
+DEFAULT_PARTITION = f"{PARTITIONED_TABLE}_default"
+
+# DDL waits at most this long for locks instead of queueing readers behind it
+LOCK_TIMEOUT = "5s"
+MAINTENANCE_LOCK_SQL = "SELECT pg_try_advisory_xact_lock(hashtext('partitions'))"
+
+
+def partition_name(day: date) -> str:
+    return f"{PARTITION_PREFIX}{day:%Y%m%d}"
+
+
+def partition_day(name: str) -> date | None:
+    if not name.startswith(PARTITION_PREFIX):
+        return None
+    return datetime.strptime(name[len(PARTITION_PREFIX):], "%Y%m%d").date()
+
+
+def day_bounds(day: date) -> tuple[datetime, datetime]:
+    start = datetime.combine(day, dtime.min, tzinfo=timezone.utc)
+    return start, start + timedelta(days=1)
+
+
+def list_partitions(db: Session) -> list[str]:
+    return list(db.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        f"WHERE i.inhparent = '{PARTITIONED_TABLE}'::regclass ORDER BY c.relname"
+    )).scalars())
+
+
+def create_default_partition(db: Session) -> None:
+    db.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {PARTITIONED_TABLE} DEFAULT"))
+
+
+def create_partition(db: Session, day: date) -> int:
+    """Create the partition of `day`, moving its rows out of the default partition.
+
+    The table is built separately and attached, which does not block readers
+    of video_snapshots the way CREATE TABLE ... PARTITION OF does.
+    Returns the number of moved rows.
+    """
+    name = partition_name(day)
+    start, end = day_bounds(day)
+    bounds = {"start": start, "end": end}
+    db.execute(text(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'"))
+    db.execute(text(f"CREATE TABLE {name} (LIKE {PARTITIONED_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    moved = db.execute(text(
+        f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE created_at >= :start AND created_at < :end RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved"
+    ), bounds).rowcount
+    # literal bounds: DDL does not take bind parameters
+    db.execute(text(
+        f"ALTER TABLE {PARTITIONED_TABLE} ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    ))
+    return moved
+
+
+def drop_partition(db: Session, name: str, mode: str) -> None:
+    """Detach a partition and, with mode "drop", delete it, together with its rollup buckets."""
+    db.execute(text(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'"))
+    db.execute(text(f"ALTER TABLE {PARTITIONED_TABLE} DETACH PARTITION {name}"))
+    if mode == "drop":
+        db.execute(text(f"DROP TABLE {name}"))
+    # buckets are whole UTC hours and days, so they lie entirely inside the partition's day
+    start, end = day_bounds(partition_day(name))
+    delete_rollups(db, end, start)
+    # its rows are gone from video_snapshots: cached answers are stale
+    bump_data_version(db)
+
+
+def _relock(db: Session) -> bool:
+    """Take the maintenance lock again after a commit released it.
+
+    Another run may have taken it in between: it then does the rest.
+    """
+    if db.execute(text(MAINTENANCE_LOCK_SQL)).scalar():
+        return True
+    logger.info("Partition maintenance was taken over by another run")
+    return False
+
+
+def maintain_partitions(
+    db: Session,
+    ahead_days: int | None = None,
+    retention_days: int | None = None,
+    retention_mode: str | None = None,
+) -> dict:
+    """Create upcoming partitions, empty the default one and apply retention.
+
+    Every change is committed on its own to keep locks short. The advisory
+    lock is transactional, so it is taken again after every commit. Concurrent
+    runs (several bot workers, cron) skip while another one is active.
+    """
+    ahead_days = settings.snapshot_partition_ahead_days if ahead_days is None else ahead_days
+    retention_days = settings.snapshot_retention_days if retention_days is None else retention_days
+    retention_mode = retention_mode or settings.snapshot_retention_mode
+    stats = {"created": [], "moved_rows": 0, "removed": []}
+
+    if not db.execute(text(MAINTENANCE_LOCK_SQL)).scalar():
+        logger.info("Partition maintenance is already running elsewhere")
+        return stats
+
+    existing = {partition_day(name) for name in list_partitions(db)} - {None}
+    today = datetime.now(timezone.utc).date()
+    wanted = {today + timedelta(days=i) for i in range(ahead_days + 1)}
+    # days that only exist in the default partition
+    wanted |= set(db.execute(text(
+        f"SELECT DISTINCT (created_at AT TIME ZONE 'UTC')::date FROM {DEFAULT_PARTITION}"
+    )).scalars())
+
+    cutoff = today - timedelta(days=retention_days) if retention_days else None
+    for day in sorted(wanted - existing):
+        if cutoff and day < cutoff:
+            continue
+        stats["moved_rows"] += create_partition(db, day)
+        db.commit()
+        stats["created"].append(partition_name(day))
+        if not _relock(db):
+            return stats
+
+    if cutoff:
+        for day in sorted(existing):
+            if day < cutoff:
+                drop_partition(db, partition_name(day), retention_mode)
+                db.commit()
+                stats["removed"].append(partition_name(day))
+                if not _relock(db):
+                    return stats
+        deleted = db.execute(
+            text(f"DELETE FROM {DEFAULT_PARTITION} WHERE created_at < :cutoff"), {"cutoff": day_bounds(cutoff)[0]}
+        ).rowcount
+        deleted += delete_rollups(db, day_bounds(cutoff)[0])
+        if deleted:
+            # like drop_partition: cached answers still count the deleted rows
+            bump_data_version(db)
+    db.commit()
+
+    logger.info(
+        f"Partitions: created {len(stats['created'])}, moved {stats['moved_rows']} rows from the default, "
+        f"removed ({retention_mode}) {len(stats['removed'])}"
+    )
+    return stats
+
+
+def run_partition_maintenance() -> dict:
+    with get_db_session() as db:
+        return maintain_partitions(db)
+
+
+async def partition_maintenance_loop(interval: float) -> None:
+    """Run maintenance every `interval` seconds in a thread, for the bot process."""
+    while True:
+        started = time.perf_counter()
+        try:
+            await asyncio.to_thread(run_partition_maintenance)
+        except Exception as e:
+            logger.error(f"Partition maintenance failed: {e}")
+        await asyncio.sleep(max(interval - (time.perf_counter() - started), 0))
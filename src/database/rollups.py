@@ -0,0 +1,65 @@
+from datetime import datetime
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from src.database.models import DELTA_COLUMNS, video_snapshots_hourly, video_snapshots_daily
+
+
+# Buckets are truncated in UTC, so they do not depend on the session time zone.
+ROLLUP_TIME_ZONE = "UTC"
+
+ROLLUPS = {
+    # table -> (granularity, grouping columns)
+    video_snapshots_hourly.name: ("hour", ["creator_id"]),
+    video_snapshots_daily.name: ("day", ["video_id", "creator_id"]),
+}
+
+ROLLUP_KEYS = {
+    video_snapshots_hourly.name: ["bucket", "creator_id"],
+    video_snapshots_daily.name: ["bucket", "video_id"],
+}
+
+
+def apply_rollups_sql(table: str, source: str) -> str:
+    """Add the snapshots of `source` to a rollup table.
+
+    `source` is a table or subquery with the columns of video_snapshots that
+    holds only rows not yet counted, e.g. the staging table of one load batch.
+    """
+    granularity, group_columns = ROLLUPS[table]
+    select_groups = ", ".join("v.creator_id" if c == "creator_id" else f"s.{c}" for c in group_columns)
+    columns = ", ".join(["bucket", *group_columns, *DELTA_COLUMNS, "snapshots_count"])
+    sums = ", ".join(f"SUM(s.{c})" for c in DELTA_COLUMNS)
+    updates = ", ".join(
+        f"{c} = {table}.{c} + EXCLUDED.{c}" for c in [*DELTA_COLUMNS, "snapshots_count"]
+    )
+    return (
+        f"INSERT INTO {table} ({columns}) "
+        f"SELECT date_trunc('{granularity}', s.created_at, '{ROLLUP_TIME_ZONE}'), {select_groups}, {sums}, COUNT(*) "
+        f"FROM {source} s JOIN videos v ON v.id = s.video_id "
+        f"GROUP BY 1, {', '.join(str(i + 2) for i in range(len(group_columns)))} "
+        f"ON CONFLICT ({', '.join(ROLLUP_KEYS[table])}) DO UPDATE SET {updates}"
+    )
+
+
+def apply_rollups(cursor, source: str) -> None:
+    """Incrementally update all rollups from new snapshot rows (raw DBAPI cursor)."""
+    for table in ROLLUPS:
+        cursor.execute(apply_rollups_sql(table, source))
+
+
+def rebuild_rollups(db: Session) -> None:
+    """Recompute all rollups from video_snapshots."""
+    for table in ROLLUPS:
+        db.execute(text(f"TRUNCATE {table}"))
+        db.execute(text(apply_rollups_sql(table, "video_snapshots")))
+
+
+def delete_rollups(db: Session, end: datetime, start: datetime | None = None) -> int:
+    """Delete the buckets of [start, end), e.g. of snapshots removed by retention; returns their number."""
+    condition = "bucket < :end" if start is None else "bucket >= :start AND bucket < :end"
+    deleted = 0
+    for table in ROLLUPS:
+        deleted += db.execute(text(f"DELETE FROM {table} WHERE {condition}"), {"start": start, "end": end}).rowcount
+    return deleted
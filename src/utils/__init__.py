@@ -1,5 +1,18 @@
-from src.utils.llm import generate_sql_query, validate_sql_query
-from src.utils.query_executor import execute_natural_language_query
+# re-exports resolve on first use: importing src.utils.logging from a script
+# must not pull in the LLM client and the query stack
+_EXPORTS = {
+    "generate_sql_query": "src.utils.llm",
+    "validate_sql_query": "src.utils.llm",
+    "execute_natural_language_query": "src.utils.query_executor",
+    "answer_query": "src.utils.query_executor",
+}
 
-__all__ = ["generate_sql_query", "validate_sql_query", "execute_natural_language_query"]
+__all__ = ["generate_sql_query", "validate_sql_query", "execute_natural_language_query", "answer_query"]
 
+
+def __getattr__(name: str):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    import importlib
+
+    return getattr(importlib.import_module(_EXPORTS[name]), name)
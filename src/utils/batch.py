@@ -0,0 +1,159 @@
+import re
+import logging
+from typing import Any
+
+from src.config import settings
+from src.database.db import get_async_read_session, get_data_version
+from src.utils.concurrency import llm_slots, db_slots
+from src.utils.intents import intent_matcher
+from src.utils.llm import generate_sql_batch
+from src.utils.metrics import DB_ROWS_RETURNED
+from src.utils.query_executor import (
+    prepare_sql, lookup_result, store_result, lookup_sql, remember_sql, to_scalar, to_value,
+)
+from src.utils.result_cache import MISSING
+from src.utils.sql_governor import execute_combined, fetch_governed
+from src.utils.timing import stage
+
+logger = logging.getLogger(__name__)
+
+
+# "1.", "2)", "-", "•" at the start of a line
+MARKER_RE = re.compile(r"^(?:\d{1,2}\s*[.)]\s*|[-*—]\s+|•\s*)")
+
+
+def split_questions(message: str) -> list[str]:
+    """Split a message into questions: list items, or lines that each end with "?".
+
+    Anything else continues the question before it, so a clarification like
+    "Ответь числом." stays with its question. Text before the first list item
+    that is not a question itself applies to every item and is prepended to
+    each. A message that does not split is one question.
+    """
+    lines = [line.strip() for line in message.splitlines() if line.strip()]
+    listed = any(MARKER_RE.match(line) for line in lines)
+    preamble: list[str] = []
+    questions: list[str] = []
+    for line in lines:
+        marker = MARKER_RE.match(line)
+        text = line[marker.end():].strip() if marker else line
+        if not text:
+            continue
+        if listed:
+            starts = marker is not None
+        else:
+            starts = text.endswith("?") and (not questions or questions[-1].endswith("?"))
+        if starts:
+            questions.append(text)
+        elif questions:
+            questions[-1] += f" {text}"
+        else:
+            preamble.append(text)
+
+    if not questions:
+        return [" ".join(preamble)] if preamble else []
+    if preamble:
+        if listed and not preamble[-1].endswith("?"):
+            prefix = " ".join(preamble)
+            return [f"{prefix} {question}" for question in questions]
+        questions[0] = " ".join([*preamble, questions[0]])
+    return questions
+
+
+async def _resolve_sql(questions: list[str], results: list[Any]) -> tuple[list[tuple[str, dict] | None], list[int]]:
+    """SQL for every question: intents and cached SQL first, the rest from one LLM completion."""
+    queries: list[tuple[str, dict] | None] = [None] * len(questions)
+    generate = []
+    for i, question in enumerate(questions):
+        with stage("intent"):
+            intent = intent_matcher.match(question) if settings.intent_fast_path else None
+        if intent is not None:
+            queries[i] = (intent.sql, intent.params)
+        elif (sql_query := await lookup_sql(question)) is not None:
+            queries[i] = (sql_query, {})
+        else:
+            generate.append(i)
+
+    if generate:
+        try:
+            async with llm_slots:
+                with stage("llm"):
+                    generated = await generate_sql_batch([questions[i] for i in generate])
+            logger.info(f"Generated SQL for {len(generate)} questions in one completion")
+        except Exception as e:
+            generated = [e] * len(generate)
+        for i, sql_query in zip(generate, generated):
+            if isinstance(sql_query, Exception):
+                results[i] = sql_query
+            elif sql_query is None:
+                results[i] = ValueError("LLM returned no SQL for the question")
+            else:
+                queries[i] = (sql_query, {})
+    return queries, generate
+
+
+async def answer_batch(questions: list[str]) -> list[Any]:
+    """Answer several questions with at most one LLM call and one analytics query.
+
+    Every item of the result is the answer (a `TableResult` for a table)
+    or the exception that question failed with. Tables and, if the combined
+    query fails, all questions run one by one, so one bad question does not
+    take the others down.
+    """
+    results: list[Any] = [None] * len(questions)
+    queries, generated = await _resolve_sql(questions, results)
+
+    prepared = {}
+    with stage("validate"):
+        for i, query in enumerate(queries):
+            if query is None:
+                continue
+            try:
+                prepared[i] = prepare_sql(*query)
+            except ValueError as e:
+                results[i] = e
+
+    async with get_async_read_session() as db:
+        async with db_slots:
+            with stage("db"):
+                data_version = await get_data_version(db)
+                pending = []
+                for i, (final_sql, columnar_sql, params) in prepared.items():
+                    value = await lookup_result(final_sql, columnar_sql, params, data_version)
+                    if value is MISSING:
+                        pending.append(i)
+                    else:
+                        results[i] = value
+
+                values: dict[int, Any] = {}
+                if len(pending) > 1:
+                    try:
+                        async with db.begin_nested():
+                            heads = await execute_combined(
+                                db, [(prepared[i][0], prepared[i][2]) for i in pending], data_version
+                            )
+                        for i, rows in zip(pending, heads):
+                            # more than one row or column is a table, read in full below
+                            if len(rows) <= 1 and all(len(row) == 1 for row in rows):
+                                DB_ROWS_RETURNED.inc(len(rows))
+                                values[i] = to_scalar(rows[0] if rows else None)
+                    except Exception as e:
+                        logger.warning(f"Combined query failed, running {len(pending)} queries one by one: {e}")
+
+                for i in pending:
+                    if i in values:
+                        continue
+                    try:
+                        async with db.begin_nested():
+                            values[i] = to_value(await fetch_governed(db, prepared[i][0], prepared[i][2], data_version))
+                    except Exception as e:
+                        results[i] = e
+
+                for i, value in values.items():
+                    results[i] = value
+                    await store_result(prepared[i][0], prepared[i][2], data_version, value)
+
+    for i in generated:
+        if not isinstance(results[i], Exception):
+            await remember_sql(questions[i], queries[i][0])
+    return results
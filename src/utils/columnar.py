@@ -0,0 +1,871 @@
+import re
+import time
+import asyncio
+import logging
+import calendar
+from decimal import Decimal
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Any
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from src.database.db import engine, DATA_VERSION_ID
+from src.database.models import DataVersion
+
+logger = logging.getLogger(__name__)
+
+
+# Columns held in memory; queries touching anything else go to SQL
+VIDEO_METRICS = ["views_count", "likes_count", "comments_count", "reports_count"]
+SNAPSHOT_METRICS = ["delta_views_count", "delta_likes_count", "delta_comments_count", "delta_reports_count"]
+ID_COLUMNS = {"id", "video_id", "creator_id"}
+TIME_COLUMNS = {"video_created_at", "created_at"}
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MICROS = "(extract(epoch FROM {}) * 1000000)::bigint"
+
+VIDEOS_SQL = (
+    f"SELECT id, creator_id, {MICROS.format('video_created_at')}, {', '.join(VIDEO_METRICS)}, "
+    f"{MICROS.format('updated_at')} FROM videos"
+)
+SNAPSHOTS_SQL = (
+    f"SELECT video_id, {MICROS.format('created_at')}, {', '.join(SNAPSHOT_METRICS)}, "
+    f"{MICROS.format('updated_at')} FROM video_snapshots"
+)
+
+
+def _to_datetime(micros: int) -> datetime:
+    return EPOCH + timedelta(microseconds=int(micros))
+
+
+@dataclass(frozen=True)
+class ColumnarData:
+    """An immutable copy of videos and video_snapshots as column arrays.
+
+    Ids are dictionary-encoded: `video_ids[code]` is the id of a video code,
+    creator code -1 is a NULL creator. Snapshots are sorted by created_at,
+    `by_video[video_offsets[c]:video_offsets[c + 1]]` are the rows of video c.
+    """
+    version: int
+    time_zone: str
+    video_ids: list[str]
+    video_codes: dict[str, int]
+    creator_ids: list[str]
+    creator_codes: dict[str, int]
+    video_creator: np.ndarray
+    video_created_at: np.ndarray
+    video_metrics: dict[str, np.ndarray]
+    videos_since: int
+    snapshot_video: np.ndarray
+    snapshot_created_at: np.ndarray
+    snapshot_metrics: dict[str, np.ndarray]
+    snapshots_since: int
+    by_video: np.ndarray
+    video_offsets: np.ndarray
+
+    @property
+    def snapshots(self) -> int:
+        return len(self.snapshot_video)
+
+    def snapshot_bytes(self) -> int:
+        arrays = [self.snapshot_video, self.snapshot_created_at, self.by_video, *self.snapshot_metrics.values()]
+        return sum(a.nbytes for a in arrays)
+
+    def video_bytes(self) -> int:
+        arrays = [self.video_creator, self.video_created_at, self.video_offsets, *self.video_metrics.values()]
+        return sum(a.nbytes for a in arrays)
+
+
+# ---------------------------------------------------------------- loading
+
+def _read(cursor, sql: str, since: int | None, chunk_size: int):
+    """Yield chunks of rows updated after `since` (microseconds), all rows if None.
+
+    Loaders stamp updated_at with the `now()` of each batch transaction and
+    hold the ingestion lock, so loading transactions never overlap: one that
+    commits after the last refresh also started after everything it read,
+    and is newer than `since`.
+    """
+    params = ()
+    if since is not None:
+        sql += " WHERE updated_at > %s"
+        params = (_to_datetime(since),)
+    cursor.execute(sql, params)
+    while rows := cursor.fetchmany(chunk_size):
+        yield rows
+
+
+def _index_by_video(snapshot_video: np.ndarray, n_videos: int) -> tuple[np.ndarray, np.ndarray]:
+    by_video = np.argsort(snapshot_video, kind="stable").astype(np.int32 if len(snapshot_video) < 2**31 else np.int64)
+    offsets = np.zeros(n_videos + 1, dtype=np.int64)
+    np.cumsum(np.bincount(snapshot_video, minlength=n_videos), out=offsets[1:])
+    return by_video, offsets
+
+
+def load_columnar(connection, old: ColumnarData | None = None, chunk_size: int = 100_000) -> ColumnarData:
+    """Read the tables into a new ColumnarData, only what changed since `old` if given.
+
+    Runs in one read-only REPEATABLE READ transaction, so the arrays match
+    the data version read with them.
+    """
+    cursor = connection.cursor(name="columnar_load")
+    cursor.itersize = chunk_size
+    plain = connection.cursor()
+    try:
+        plain.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+        plain.execute(f"SELECT version FROM {DataVersion.__tablename__} WHERE id = %s", (DATA_VERSION_ID,))
+        row = plain.fetchone()
+        version = row[0] if row else 0
+        if old is not None and old.version == version:
+            return old
+        plain.execute("SHOW TimeZone")
+        time_zone = plain.fetchone()[0]
+
+        # videos: changed rows are overwritten in copies of the arrays, new ones appended
+        video_ids = list(old.video_ids) if old else []
+        video_codes = dict(old.video_codes) if old else {}
+        creator_ids = list(old.creator_ids) if old else []
+        creator_codes = dict(old.creator_codes) if old else {}
+        updates: dict[int, tuple] = {}
+        videos_since = old.videos_since if old else 0
+        for rows in _read(plain, VIDEOS_SQL, old.videos_since if old else None, chunk_size):
+            for video_id, creator_id, created_at, *metrics, updated_at in rows:
+                code = video_codes.setdefault(video_id, len(video_codes))
+                if code == len(video_ids):
+                    video_ids.append(video_id)
+                if creator_id is None:
+                    creator = -1
+                else:
+                    creator = creator_codes.setdefault(creator_id, len(creator_codes))
+                    if creator == len(creator_ids):
+                        creator_ids.append(creator_id)
+                updates[code] = (creator, created_at, *metrics)
+                videos_since = max(videos_since, updated_at)
+
+        n_videos = len(video_ids)
+
+        def grown(array: np.ndarray | None, dtype) -> np.ndarray:
+            result = np.zeros(n_videos, dtype=dtype)
+            if array is not None:
+                result[:len(array)] = array
+            return result
+
+        video_creator = grown(old.video_creator if old else None, np.int32)
+        video_created_at = grown(old.video_created_at if old else None, "datetime64[us]")
+        video_metrics = {name: grown(old.video_metrics[name] if old else None, np.int32) for name in VIDEO_METRICS}
+        if updates:
+            codes = np.fromiter(updates.keys(), dtype=np.int64, count=len(updates))
+            values = np.array(list(updates.values()), dtype=np.int64)
+            video_creator[codes] = values[:, 0]
+            video_created_at[codes] = values[:, 1].astype("datetime64[us]")
+            for i, name in enumerate(VIDEO_METRICS):
+                video_metrics[name][codes] = values[:, 2 + i]
+
+        # snapshots are never updated, only added (or dropped with old partitions)
+        # each chunk goes straight to compact columns, so loading needs little more memory than the result
+        chunks = []
+        snapshots_since = old.snapshots_since if old else 0
+        for rows in _read(cursor, SNAPSHOTS_SQL, old.snapshots_since if old else None, chunk_size):
+            values = np.array([r[1:] for r in rows], dtype=np.int64)
+            chunks.append((
+                np.fromiter((video_codes[r[0]] for r in rows), dtype=np.int32, count=len(rows)),
+                values[:, 0].astype("datetime64[us]"),
+                *(values[:, 1 + i].astype(np.int32) for i in range(len(SNAPSHOT_METRICS))),
+            ))
+            snapshots_since = max(snapshots_since, int(values[:, -1].max()))
+
+        snapshot_video = old.snapshot_video if old else np.empty(0, dtype=np.int32)
+        snapshot_created_at = old.snapshot_created_at if old else np.empty(0, dtype="datetime64[us]")
+        snapshot_metrics = dict(old.snapshot_metrics) if old else {
+            name: np.empty(0, dtype=np.int32) for name in SNAPSHOT_METRICS
+        }
+
+        if old is not None:
+            # partitions removed by retention: drop what is older than the oldest stored row
+            plain.execute("SELECT min(created_at) FROM video_snapshots")
+            oldest = plain.fetchone()[0]
+            keep = (
+                np.searchsorted(snapshot_created_at, np.datetime64(oldest.astimezone(timezone.utc).replace(tzinfo=None), "us"))
+                if oldest is not None else len(snapshot_created_at)
+            )
+            if keep:
+                snapshot_video = snapshot_video[keep:]
+                snapshot_created_at = snapshot_created_at[keep:]
+                snapshot_metrics = {name: array[keep:] for name, array in snapshot_metrics.items()}
+
+        if chunks:
+            new = [np.concatenate(column) for column in zip(*chunks)]
+            chunks.clear()
+            order = np.argsort(new[1], kind="stable")
+            new = [column[order] for column in new]
+            # usually new snapshots are newer than everything held, then appending keeps the order
+            in_order = not len(snapshot_created_at) or new[1][0] >= snapshot_created_at[-1]
+            snapshot_video = np.concatenate([snapshot_video, new[0]])
+            snapshot_created_at = np.concatenate([snapshot_created_at, new[1]])
+            snapshot_metrics = {
+                name: np.concatenate([snapshot_metrics[name], new[2 + i]]) for i, name in enumerate(SNAPSHOT_METRICS)
+            }
+            if not in_order:
+                order = np.argsort(snapshot_created_at, kind="stable")
+                snapshot_video = snapshot_video[order]
+                snapshot_created_at = snapshot_created_at[order]
+                snapshot_metrics = {name: array[order] for name, array in snapshot_metrics.items()}
+
+        if old is not None and snapshot_video is old.snapshot_video and n_videos == len(old.video_ids):
+            by_video, video_offsets = old.by_video, old.video_offsets
+        else:
+            by_video, video_offsets = _index_by_video(snapshot_video, n_videos)
+    finally:
+        cursor.close()
+        plain.close()
+        connection.rollback()
+
+    return ColumnarData(
+        version=version,
+        time_zone=time_zone,
+        video_ids=video_ids,
+        video_codes=video_codes,
+        creator_ids=creator_ids,
+        creator_codes=creator_codes,
+        video_creator=video_creator,
+        video_created_at=video_created_at,
+        video_metrics=video_metrics,
+        videos_since=videos_since,
+        snapshot_video=snapshot_video,
+        snapshot_created_at=snapshot_created_at,
+        snapshot_metrics=snapshot_metrics,
+        snapshots_since=snapshots_since,
+        by_video=by_video,
+        video_offsets=video_offsets,
+    )
+
+
+# ---------------------------------------------------------------- parsing
+
+QUERY_RE = re.compile(
+    r"^\s*SELECT\s+(?P<select>.+?)"
+    r"\s+FROM\s+(?P<table>videos|video_snapshots)(?:\s+(?:AS\s+)?(?P<alias>(?!JOIN\b|INNER\b|WHERE\b|GROUP\b|ORDER\b|LIMIT\b)\w+))?"
+    r"(?:\s+(?:INNER\s+)?JOIN\s+videos(?:\s+(?:AS\s+)?(?P<v_alias>(?!ON\b)\w+))?"
+    r"\s+ON\s+(?P<on_left>[\w.]+)\s*=\s*(?P<on_right>[\w.]+))?"
+    r"(?:\s+WHERE\s+(?P<where>.+?))?"
+    r"(?:\s+GROUP\s+BY\s+(?P<group>[\w.]+))?"
+    r"(?:\s+ORDER\s+BY\s+(?P<order>.+?)(?:\s+(?P<direction>ASC|DESC))?)?"
+    r"(?:\s+LIMIT\s+(?P<limit>\d+))?\s*;?\s*$",
+    re.IGNORECASE | re.DOTALL,
+)
+AGG_RE = re.compile(
+    r"^(?P<func>COUNT|SUM|AVG|MIN|MAX)\s*\(\s*(?P<distinct>DISTINCT\s+)?(?P<arg>\*|[\w.]+)\s*\)(?:\s+AS\s+(?P<name>\w+))?$",
+    re.IGNORECASE,
+)
+COLUMN_RE = re.compile(r"^(?P<arg>[\w.]+)(?:\s+AS\s+(?P<name>\w+))?$", re.IGNORECASE)
+VALUE = r"(?P<value>'[^']*'|:\w+|-?\d+)"
+COMPARE_RE = re.compile(rf"^(?P<column>[\w.]+)\s*(?P<op>=|<>|!=|>=|<=|>|<)\s*(?P<rhs>.+)$", re.DOTALL)
+IN_LIST_RE = re.compile(r"^(?P<column>[\w.]+)\s+IN\s*\((?P<values>\s*(?:'[^']*'|:\w+)(?:\s*,\s*(?:'[^']*'|:\w+))*\s*)\)$", re.IGNORECASE)
+CREATOR_SUBQUERY_RE = re.compile(
+    rf"^(?P<column>[\w.]+)\s+IN\s*\(\s*SELECT\s+id\s+FROM\s+videos\s+WHERE\s+creator_id\s*=\s*{VALUE}\s*\)$",
+    re.IGNORECASE,
+)
+SCALAR_RE = re.compile(rf"^{VALUE}$")
+TIME_BASE_RE = re.compile(
+    r"^(?:(?P<now>NOW\s*\(\s*\)|CURRENT_TIMESTAMP)|(?P<today>CURRENT_DATE)"
+    r"|(?:(?P<kind>TIMESTAMPTZ|TIMESTAMP|DATE)\s+)?'(?P<literal>[^']+)'(?:\s*::\s*(?P<cast>timestamptz|timestamp|date))?"
+    r"|(?P<param>:\w+))",
+    re.IGNORECASE,
+)
+INTERVAL_RE = re.compile(r"^\s*(?P<sign>[+-])\s*INTERVAL\s+'(?P<n>\d+)\s*(?P<unit>[a-z]+)'", re.IGNORECASE)
+UNSUPPORTED_RE = re.compile(r"\b(OR|BETWEEN|NOT|CASE|LIKE|ILIKE|IS|EXISTS|UNION|HAVING|OFFSET)\b|\(\s*SELECT", re.IGNORECASE)
+
+INTERVAL_UNITS = {
+    "minute": "minutes", "minutes": "minutes", "min": "minutes", "mins": "minutes",
+    "hour": "hours", "hours": "hours",
+    "day": "days", "days": "days",
+    "week": "weeks", "weeks": "weeks",
+    "month": "months", "months": "months", "mon": "months", "mons": "months",
+    "year": "years", "years": "years",
+}
+OPERATORS = {
+    "=": np.equal, "<>": np.not_equal, "!=": np.not_equal,
+    ">": np.greater, ">=": np.greater_equal, "<": np.less, "<=": np.less_equal,
+}
+
+VIDEO_COLUMNS = {"id", "creator_id", "video_created_at", *VIDEO_METRICS}
+SNAPSHOT_COLUMNS = {"video_id", "created_at", *SNAPSHOT_METRICS}
+# columns both tables have, ambiguous without an alias once they are joined
+SHARED_COLUMNS = {"id", "created_at", "updated_at", *VIDEO_METRICS}
+
+
+@dataclass(frozen=True)
+class Plan:
+    table: str
+    # (column, kind, payload): kind is "compare" (op, rhs), "in" (values) or "creator_in" (value)
+    conditions: tuple
+    # (func, column, distinct) for aggregates, (None, column, False) for plain columns
+    select: tuple
+    group: str | None = None
+    order: tuple | None = None
+    limit: int | None = None
+    # output column names, as Postgres would name them
+    columns: tuple = ()
+
+
+class Unsupported(Exception):
+    pass
+
+
+def _split_top_level(text: str, separator: str = ",") -> list[str]:
+    parts, depth, current = [], 0, []
+    for char in text:
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        if char == separator and depth == 0:
+            parts.append("".join(current).strip())
+            current = []
+        else:
+            current.append(char)
+    parts.append("".join(current).strip())
+    return parts
+
+
+@lru_cache(maxsize=1024)
+def compile_query(sql: str) -> Plan | None:
+    """Turn a supported SELECT into a Plan, or None if it has to go to SQL."""
+    match = QUERY_RE.match(sql)
+    if not match or sql.count(";") > 1:
+        return None
+    try:
+        return _compile(match)
+    except Unsupported:
+        return None
+
+
+def _compile(match: re.Match) -> Plan:
+    table = match["table"].lower()
+    joined = bool(match["on_left"])
+    if joined and table != "video_snapshots":
+        raise Unsupported
+    alias = (match["alias"] or table).lower()
+    v_alias = (match["v_alias"] or "videos").lower()
+    main_aliases = {alias, table}
+    video_aliases = {v_alias, "videos"} if joined else set()
+
+    def resolve(name: str) -> str:
+        """Column name as stored: snapshot columns as is, video columns as `videos.<column>`."""
+        qualifier, _, column = name.lower().rpartition(".")
+        if table == "videos":
+            if (qualifier and qualifier not in main_aliases) or column not in VIDEO_COLUMNS:
+                raise Unsupported
+            return column
+        if qualifier in video_aliases or (not qualifier and joined and column in VIDEO_COLUMNS - SHARED_COLUMNS):
+            if column not in VIDEO_COLUMNS:
+                raise Unsupported
+            return f"videos.{column}"
+        if qualifier and qualifier not in main_aliases:
+            raise Unsupported
+        if not qualifier and joined and column in SHARED_COLUMNS:
+            raise Unsupported
+        if column not in SNAPSHOT_COLUMNS:
+            raise Unsupported
+        return column
+
+    if joined:
+        sides = {resolve(match["on_left"]), resolve(match["on_right"])}
+        if sides != {"videos.id", "video_id"}:
+            raise Unsupported
+
+    conditions = []
+    if match["where"]:
+        for condition in re.split(r"\s+AND\s+", match["where"].strip(), flags=re.IGNORECASE):
+            condition = condition.strip()
+            if m := CREATOR_SUBQUERY_RE.match(condition):
+                if resolve(m["column"]) != "video_id":
+                    raise Unsupported
+                conditions.append(("videos.creator_id", "in", (m["value"],)))
+                continue
+            if UNSUPPORTED_RE.search(condition):
+                raise Unsupported
+            if m := IN_LIST_RE.match(condition):
+                column = resolve(m["column"])
+                if column.rpartition(".")[2] not in ID_COLUMNS:
+                    raise Unsupported
+                conditions.append((column, "in", tuple(v.strip() for v in m["values"].split(","))))
+            elif m := COMPARE_RE.match(condition):
+                column, op, rhs = resolve(m["column"]), m["op"], m["rhs"].strip()
+                bare = column.rpartition(".")[2]
+                value = SCALAR_RE.match(rhs)
+                if bare in TIME_COLUMNS:
+                    _parse_time(rhs)
+                elif bare in ID_COLUMNS:
+                    if op not in ("=", "<>", "!=") or not value or value["value"][0] not in "':":
+                        raise Unsupported
+                elif not value or value["value"].startswith("'"):
+                    raise Unsupported
+                conditions.append((column, "compare", (op, rhs)))
+            else:
+                raise Unsupported
+
+    items = _split_top_level(match["select"])
+    select, names, columns = [], [], []
+    for item in items:
+        if m := AGG_RE.match(item):
+            func, arg = m["func"].upper(), m["arg"]
+            column = None if arg == "*" else resolve(arg)
+            if column is None and (func != "COUNT" or m["distinct"]):
+                raise Unsupported
+            if column and func in ("SUM", "AVG") and column.rpartition(".")[2] not in (*VIDEO_METRICS, *SNAPSHOT_METRICS):
+                raise Unsupported
+            if column and func in ("MIN", "MAX") and column.rpartition(".")[2] in ID_COLUMNS:
+                raise Unsupported
+            select.append((func, column, bool(m["distinct"])))
+            default_name = func.lower()
+        elif m := COLUMN_RE.match(item):
+            select.append((None, resolve(m["arg"]), False))
+            default_name = m["arg"].rpartition(".")[2].lower()
+        else:
+            raise Unsupported
+        names.append(((m["name"] or "").lower(), _expression(item)))
+        columns.append((m["name"] or default_name).lower())
+
+    group = resolve(match["group"]) if match["group"] else None
+    aggregates = [s for s in select if s[0]]
+    plain = [s for s in select if not s[0]]
+    if group:
+        if group.rpartition(".")[2] not in ("id", "video_id", "creator_id") or len(aggregates) != 1:
+            raise Unsupported
+        if any(column != group for _, column, _ in plain) or any(distinct for _, _, distinct in aggregates):
+            raise Unsupported
+    elif plain:
+        # plain columns only for one video looked up by id
+        if aggregates or table != "videos" or not any(
+            c[0] == "id" and c[1] == "compare" and c[2][0] == "=" for c in conditions
+        ):
+            raise Unsupported
+    elif len(aggregates) != 1:
+        raise Unsupported
+
+    order = None
+    if match["order"]:
+        if not group:
+            raise Unsupported
+        key = _expression(match["order"])
+        if key.isdigit() and 1 <= int(key) <= len(select):
+            position = int(key) - 1
+        elif matches := [i for i, (name, expression) in enumerate(names) if key in (name, expression)]:
+            position = matches[0]
+        else:
+            raise Unsupported
+        if not select[position][0]:
+            # ids sort by the database collation, leave that to Postgres
+            raise Unsupported
+        order = (position, (match["direction"] or "ASC").upper() == "DESC")
+
+    return Plan(
+        table=table,
+        conditions=tuple(conditions),
+        select=tuple(select),
+        group=group,
+        order=order,
+        limit=int(match["limit"]) if match["limit"] else None,
+        columns=tuple(columns),
+    )
+
+
+def _expression(text: str) -> str:
+    """Select item or ORDER BY key without its alias, in a comparable form."""
+    text = re.sub(r"\s+AS\s+\w+$", "", text.strip(), flags=re.IGNORECASE)
+    return re.sub(r"\s+", "", text).lower()
+
+
+def _parse_time(expr: str) -> tuple[re.Match, list[tuple[int, str]]]:
+    base = TIME_BASE_RE.match(expr)
+    if not base:
+        raise Unsupported
+    rest = expr[base.end():]
+    intervals = []
+    while rest.strip():
+        m = INTERVAL_RE.match(rest)
+        if not m or m["unit"].lower() not in INTERVAL_UNITS:
+            raise Unsupported
+        n = int(m["n"]) * (-1 if m["sign"] == "-" else 1)
+        intervals.append((n, INTERVAL_UNITS[m["unit"].lower()]))
+        rest = rest[m.end():]
+    if intervals and base["literal"] and not (base["kind"] or base["cast"]):
+        # Postgres reads an untyped literal next to an interval as an interval and fails
+        raise Unsupported
+    return base, intervals
+
+
+# ---------------------------------------------------------------- evaluation
+
+def _add_months(moment: datetime, months: int) -> datetime:
+    month = moment.month - 1 + months
+    year, month = moment.year + month // 12, month % 12 + 1
+    return moment.replace(year=year, month=month, day=min(moment.day, calendar.monthrange(year, month)[1]))
+
+
+def _time_value(expr: str, params: dict, zone: ZoneInfo, now: datetime) -> np.datetime64:
+    """Evaluate a time expression the way Postgres does in the session time zone."""
+    base, intervals = _parse_time(expr)
+    if base["now"]:
+        moment = now.astimezone(zone)
+    elif base["today"]:
+        moment = datetime.combine(now.astimezone(zone).date(), datetime.min.time(), tzinfo=zone)
+    elif base["param"]:
+        value = params.get(base["param"][1:])
+        if isinstance(value, datetime):
+            moment = value if value.tzinfo else value.replace(tzinfo=zone)
+        elif isinstance(value, date):
+            moment = datetime.combine(value, datetime.min.time(), tzinfo=zone)
+        else:
+            raise Unsupported
+    else:
+        try:
+            moment = datetime.fromisoformat(base["literal"].strip())
+        except ValueError:
+            raise Unsupported
+        is_date = (base["kind"] or base["cast"] or "").lower() == "date"
+        if is_date:
+            moment = datetime.combine(moment.date(), datetime.min.time())
+        if moment.tzinfo is None or is_date or (base["kind"] or base["cast"] or "").lower() == "timestamp":
+            moment = moment.replace(tzinfo=zone)
+    moment = moment.astimezone(zone)
+
+    for n, unit in intervals:
+        if unit in ("months", "years"):
+            moment = _add_months(moment.replace(tzinfo=None), n * (12 if unit == "years" else 1)).replace(tzinfo=zone)
+        elif unit in ("days", "weeks"):
+            # calendar days: the same wall-clock time, as Postgres does for timestamptz
+            moment = (moment.replace(tzinfo=None) + timedelta(days=n * (7 if unit == "weeks" else 1))).replace(tzinfo=zone)
+        else:
+            moment = moment + timedelta(**{unit: n})
+    return np.datetime64(moment.astimezone(timezone.utc).replace(tzinfo=None), "us")
+
+
+class _Rows:
+    """Selected rows of one table: a contiguous slice or an array of row numbers."""
+
+    def __init__(self, data: ColumnarData, table: str, selection):
+        self.data = data
+        self.table = table
+        self.selection = selection
+
+    def __len__(self) -> int:
+        if isinstance(self.selection, slice):
+            return self.selection.stop - self.selection.start
+        return len(self.selection)
+
+    def column(self, name: str) -> np.ndarray:
+        data = self.data
+        if self.table == "videos":
+            array = _video_column(data, name)
+            return array[self.selection]
+        if name.startswith("videos."):
+            return _video_column(data, name[len("videos."):])[data.snapshot_video[self.selection]]
+        if name == "video_id":
+            return data.snapshot_video[self.selection]
+        if name == "created_at":
+            return data.snapshot_created_at[self.selection]
+        return data.snapshot_metrics[name][self.selection]
+
+    def filter(self, mask: np.ndarray) -> "_Rows":
+        if isinstance(self.selection, slice):
+            rows = np.flatnonzero(mask) + self.selection.start
+        else:
+            rows = self.selection[mask]
+        return _Rows(self.data, self.table, rows)
+
+
+def _video_column(data: ColumnarData, name: str) -> np.ndarray:
+    if name == "id":
+        return np.arange(len(data.video_ids), dtype=np.int32)
+    if name == "creator_id":
+        return data.video_creator
+    if name == "video_created_at":
+        return data.video_created_at
+    return data.video_metrics[name]
+
+
+def _code(data: ColumnarData, column: str, value: str, params: dict) -> int:
+    if value.startswith(":"):
+        value = params.get(value[1:])
+        if not isinstance(value, str):
+            raise Unsupported
+    else:
+        value = value[1:-1]
+    codes = data.creator_codes if column.endswith("creator_id") else data.video_codes
+    return codes.get(value, -2)
+
+
+def _rows_of_videos(data: ColumnarData, videos: np.ndarray) -> np.ndarray:
+    starts, ends = data.video_offsets[videos], data.video_offsets[videos + 1]
+    if not len(videos):
+        return np.empty(0, dtype=np.int64)
+    return np.sort(np.concatenate([data.by_video[s:e] for s, e in zip(starts, ends)]))
+
+
+def _candidates(plan: Plan, data: ColumnarData, params: dict, zone: ZoneInfo, now: datetime) -> _Rows:
+    """Narrow the rows with the cheapest index: id lookup, time range or per-video rows."""
+    if plan.table == "videos":
+        for column, kind, payload in plan.conditions:
+            if column == "id" and kind == "compare" and payload[0] == "=":
+                code = _code(data, column, payload[1], params)
+                return _Rows(data, "videos", np.array([code] if code >= 0 else [], dtype=np.int64))
+        return _Rows(data, "videos", slice(0, len(data.video_ids)))
+
+    lo, hi = 0, data.snapshots
+    videos = None
+    for column, kind, payload in plan.conditions:
+        if column == "created_at" and kind == "compare":
+            op, rhs = payload
+            value = _time_value(rhs, params, zone, now)
+            if op in (">=", ">", "="):
+                lo = max(lo, int(np.searchsorted(data.snapshot_created_at, value, "left" if op != ">" else "right")))
+            if op in ("<", "<=", "="):
+                hi = min(hi, int(np.searchsorted(data.snapshot_created_at, value, "left" if op == "<" else "right")))
+        elif column == "video_id" and (kind == "in" or payload[0] == "="):
+            values = payload if kind == "in" else (payload[1],)
+            codes = {_code(data, column, v, params) for v in values} - {-2}
+            videos = codes if videos is None else videos & codes
+        elif column == "videos.creator_id" and (kind == "in" or payload[0] == "="):
+            values = payload if kind == "in" else (payload[1],)
+            creators = {_code(data, column, v, params) for v in values} - {-2}
+            codes = set(np.flatnonzero(np.isin(data.video_creator, list(creators))).tolist()) if creators else set()
+            videos = codes if videos is None else videos & codes
+
+    hi = max(hi, lo)
+    if videos is not None:
+        video_array = np.fromiter(videos, dtype=np.int64, count=len(videos))
+        per_video = int((data.video_offsets[video_array + 1] - data.video_offsets[video_array]).sum()) if len(video_array) else 0
+        if per_video < hi - lo:
+            # row numbers are positions in created_at order, so the time range is lo..hi
+            rows = _rows_of_videos(data, video_array)
+            return _Rows(data, "video_snapshots", rows[(rows >= lo) & (rows < hi)])
+    return _Rows(data, "video_snapshots", slice(lo, hi))
+
+
+def _apply_conditions(plan: Plan, rows: _Rows, params: dict, zone: ZoneInfo, now: datetime) -> _Rows:
+    mask = None
+    for column, kind, payload in plan.conditions:
+        values = rows.column(column)
+        bare = column.rpartition(".")[2]
+        if kind == "in":
+            codes = [_code(rows.data, column, v, params) for v in payload]
+            condition = np.isin(values, codes)
+        else:
+            op, rhs = payload
+            if bare in TIME_COLUMNS:
+                target = _time_value(rhs, params, zone, now)
+            elif bare in ID_COLUMNS:
+                target = _code(rows.data, column, rhs, params)
+            elif rhs.startswith(":"):
+                target = params.get(rhs[1:])
+                if not isinstance(target, int) or isinstance(target, bool):
+                    raise Unsupported
+            else:
+                target = int(rhs)
+            condition = OPERATORS[op](values, target)
+            if bare == "creator_id" and op in ("<>", "!="):
+                # NULL creators never match a comparison
+                condition &= values >= 0
+        mask = condition if mask is None else mask & condition
+    return rows if mask is None else rows.filter(mask)
+
+
+def _python(value) -> Any:
+    if isinstance(value, np.datetime64):
+        return _to_datetime(int(value.astype("datetime64[us]").astype(np.int64)))
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _aggregate(func: str, column: str | None, distinct: bool, rows: _Rows) -> Any:
+    """Aggregate like Postgres: NULL over no rows, numeric AVG of integers."""
+    if func == "COUNT":
+        if column is None:
+            return len(rows)
+        values = rows.column(column)
+        if column.endswith("creator_id"):
+            values = values[values >= 0]
+        return len(np.unique(values)) if distinct else len(values)
+    values = rows.column(column)
+    if not len(values):
+        return None
+    if distinct:
+        values = np.unique(values)
+    if func == "SUM":
+        return int(values.sum(dtype=np.int64))
+    if func == "AVG":
+        return Decimal(int(values.sum(dtype=np.int64))) / Decimal(len(values))
+    return _python(values.min() if func == "MIN" else values.max())
+
+
+def _decode(data: ColumnarData, column: str, code: int) -> Any:
+    """Id behind a dictionary code."""
+    if column.endswith("creator_id"):
+        return data.creator_ids[code] if code >= 0 else None
+    return data.video_ids[code]
+
+
+def _grouped(plan: Plan, rows: _Rows) -> list[tuple]:
+    data = rows.data
+    keys = rows.column(plan.group)
+    func, column, _ = next(s for s in plan.select if s[0])
+    if not len(keys):
+        return []
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    starts = np.concatenate([[0], np.flatnonzero(np.diff(sorted_keys)) + 1])
+    counts = np.diff(np.concatenate([starts, [len(sorted_keys)]]))
+    groups = sorted_keys[starts]
+
+    if func == "COUNT" and column is None:
+        results = counts
+    else:
+        values = rows.column(column)[order]
+        if func == "COUNT":
+            results = counts
+        elif func in ("SUM", "AVG"):
+            results = np.add.reduceat(values.astype(np.int64), starts)
+        elif func == "MIN":
+            results = np.minimum.reduceat(values, starts)
+        else:
+            results = np.maximum.reduceat(values, starts)
+
+    position = next(i for i, s in enumerate(plan.select) if s[0])
+    if plan.order is not None:
+        by_aggregate = plan.order[0] == position
+        sort_keys = results if by_aggregate else groups
+        if by_aggregate and func == "AVG":
+            sort_keys = results / counts
+        ranking = np.argsort(sort_keys, kind="stable")
+        if plan.order[1]:
+            ranking = ranking[::-1]
+    else:
+        ranking = np.arange(len(groups))
+    if plan.limit is not None:
+        ranking = ranking[:plan.limit]
+
+    output = []
+    for i in ranking:
+        if func == "AVG":
+            value = Decimal(int(results[i])) / Decimal(int(counts[i]))
+        else:
+            value = _python(results[i])
+        key = _decode(data, plan.group, int(groups[i]))
+        output.append(tuple(value if s[0] else key for s in plan.select))
+    return output
+
+
+def evaluate(plan: Plan, data: ColumnarData, params: dict, now: datetime | None = None) -> list[tuple]:
+    zone = ZoneInfo(data.time_zone)
+    now = now or datetime.now(timezone.utc)
+    rows = _apply_conditions(plan, _candidates(plan, data, params, zone, now), params, zone, now)
+
+    if plan.group:
+        return _grouped(plan, rows)
+    if plan.select[0][0] is None:
+        # plain columns of one video (the plan requires an id lookup)
+        output = []
+        for row in rows.selection[:plan.limit]:
+            values = []
+            for _, column, _ in plan.select:
+                value = int(_video_column(data, column)[row]) if column in ("id", "creator_id") else None
+                values.append(_decode(data, column, value) if value is not None else _python(_video_column(data, column)[row]))
+            output.append(tuple(values))
+        return output
+    return [(_aggregate(*plan.select[0], rows),)] if plan.limit != 0 else []
+
+
+# ---------------------------------------------------------------- store
+
+class ColumnarStore:
+    """In-process column copy of the analytics tables for aggregate questions.
+
+    Answers only for the data version it was loaded at; when the version
+    moves on it refreshes in the background (only rows changed since the
+    last load) and queries go to SQL meanwhile.
+    """
+
+    def __init__(self, chunk_size: int = 100_000):
+        self.chunk_size = chunk_size
+        self.data: ColumnarData | None = None
+        self._refresh: asyncio.Task | None = None
+        self.hits = 0
+        self.misses = 0
+
+    def refresh(self) -> ColumnarData:
+        started = time.perf_counter()
+        connection = engine.raw_connection()
+        try:
+            old = self.data
+            data = load_columnar(connection, old, self.chunk_size)
+        finally:
+            connection.close()
+        if data is not old:
+            self.data = data
+            stats = self.stats()
+            logger.info(
+                f"Columnar store at data version {data.version}: {len(data.video_ids)} videos, {data.snapshots} snapshots, "
+                f"{stats['bytes'] / 2**20:.1f} MiB ({stats['bytes_per_million_snapshots'] / 2**20:.1f} MiB per million snapshots), "
+                f"{'reloaded' if old is None else 'refreshed'} in {time.perf_counter() - started:.2f}s"
+            )
+        return data
+
+    async def refresh_async(self) -> None:
+        try:
+            await asyncio.to_thread(self.refresh)
+        except Exception as e:
+            logger.error(f"Columnar store refresh failed: {e}")
+
+    def schedule_refresh(self) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self._refresh is None or self._refresh.done():
+            self._refresh = loop.create_task(self.refresh_async())
+
+    async def wait(self) -> None:
+        """Wait for the refresh in progress, if any; cancelling the wait leaves it running."""
+        if self._refresh is not None:
+            await asyncio.shield(self._refresh)
+
+    def query(self, sql: str, params: dict | None, data_version: int) -> tuple[list[str], list[tuple]] | None:
+        """Column names and rows of the query, or None when it has to go to SQL."""
+        data = self.data
+        if data is None or data.version != data_version:
+            self.misses += 1
+            self.schedule_refresh()
+            return None
+        plan = compile_query(sql)
+        if plan is None:
+            self.misses += 1
+            return None
+        try:
+            rows = evaluate(plan, data, params or {})
+        except Unsupported:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return list(plan.columns), rows
+
+    def stats(self) -> dict:
+        data = self.data
+        snapshot_bytes = data.snapshot_bytes() if data else 0
+        snapshots = data.snapshots if data else 0
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "version": data.version if data else None,
+            "snapshots": snapshots,
+            "bytes": snapshot_bytes + (data.video_bytes() if data else 0),
+            "bytes_per_million_snapshots": snapshot_bytes / snapshots * 1_000_000 if snapshots else 0.0,
+        }
+
+
+columnar_store = ColumnarStore()
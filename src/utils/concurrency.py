@@ -0,0 +1,109 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.types import Message, TelegramObject
+
+from src.config import settings
+from src.utils.shared_state import MemoryState, PostgresState
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """Runs one computation per key; concurrent callers with the same key share it."""
+
+    def __init__(self):
+        self.tasks: dict[str, asyncio.Task] = {}
+        self.shared = 0
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        task = self.tasks.get(key)
+        if task is None:
+            task = asyncio.create_task(func())
+            self.tasks[key] = task
+            task.add_done_callback(lambda _: self.tasks.pop(key, None))
+        else:
+            self.shared += 1
+            logger.info(f"Joined in-flight computation for: {key}")
+        # shield: a caller that gives up must not cancel the others
+        return await asyncio.shield(task)
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """Per-user token buckets for incoming messages.
+
+    A message that would wait less than `max_wait` seconds for a token is
+    queued for that long; anything beyond is rejected with a short reply.
+    Buckets live in `state`, so webhook workers can share them.
+    """
+
+    def __init__(self, rate_per_minute: float, burst: int, max_wait: float, state: MemoryState | PostgresState):
+        self.rate = rate_per_minute / 60
+        self.burst = burst
+        self.max_wait = max_wait
+        self.state = state
+        self.rejected = 0
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        if not isinstance(event, Message) or event.from_user is None:
+            return await handler(event, data)
+
+        key = f"rate:{event.from_user.id}"
+        wait = await self.state.reserve(key, self.rate, self.burst)
+        if wait > self.max_wait:
+            await self.state.refund(key, self.burst)
+            self.rejected += 1
+            logger.warning(f"Rate limit exceeded for user {event.from_user.id}")
+            await event.answer("Слишком много запросов, подожди немного и спроси снова.")
+            return None
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return await handler(event, data)
+
+
+class UpdateTracker(BaseMiddleware):
+    """Counts updates being handled so shutdown can wait for them."""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.idle = asyncio.Event()
+        self.idle.set()
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        self.in_flight += 1
+        self.idle.clear()
+        try:
+            return await handler(event, data)
+        finally:
+            self.in_flight -= 1
+            if not self.in_flight:
+                self.idle.set()
+
+    async def drain(self, timeout: float) -> bool:
+        """Wait until no update is being handled; False if `timeout` ran out first."""
+        # let updates accepted just before shutdown enter the middleware
+        await asyncio.sleep(0)
+        try:
+            await asyncio.wait_for(self.idle.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+single_flight = SingleFlight()
+llm_slots = asyncio.Semaphore(settings.max_concurrent_llm)
+db_slots = asyncio.Semaphore(settings.max_concurrent_db)
+# background jobs never take the slots of interactive questions
+job_slots = asyncio.Semaphore(max(settings.job_workers, 1))
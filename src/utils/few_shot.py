@@ -0,0 +1,104 @@
+import re
+import json
+import math
+import logging
+from collections import Counter, defaultdict
+from pathlib import Path
+
+from src.utils.sql_cache import normalize_question
+
+logger = logging.getLogger(__name__)
+
+
+# creator and video ids say nothing about the shape of a question
+ID_RE = re.compile(r"^(?=.*\d)[A-Za-z0-9_\-]{5,}$")
+TABLE_RE = re.compile(r"\b(?:FROM|JOIN)\s+(videos|video_snapshots)\b", re.IGNORECASE)
+
+
+def _words(question: str) -> list[str]:
+    return ["<id>" if ID_RE.match(word) else word.lower() for word in normalize_question(question).split()]
+
+
+def _terms(question: str) -> Counter:
+    """Word stems, word pairs and character trigrams of the normalized question."""
+    words = _words(question)
+    terms = Counter(f"w:{word}" for word in words)
+    terms.update(f"b:{a}_{b}" for a, b in zip(words, words[1:]))
+    for word in words:
+        if word != "<id>":
+            padded = f" {word} "
+            terms.update(f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2))
+    return terms
+
+
+def tables_of(sql: str) -> set[str]:
+    return {table.lower() for table in TABLE_RE.findall(sql)}
+
+
+class FewShotIndex:
+    """TF-IDF index of verified question -> SQL pairs for picking prompt examples.
+
+    Questions are compared by cosine similarity of their stem, stem pair and
+    character trigram weights, through an inverted index. Everything is
+    local: no embeddings, no network.
+    """
+
+    def __init__(self, examples: list[tuple[str, str]]):
+        self.examples: list[tuple[str, str]] = []
+        seen = set()
+        # the first pair of every question shape wins
+        for question, sql in examples:
+            key = " ".join(_words(question))
+            if key not in seen:
+                seen.add(key)
+                self.examples.append((question, sql))
+
+        counts = [_terms(question) for question, _ in self.examples]
+        df = Counter(term for terms in counts for term in terms)
+        n = len(self.examples)
+        self.idf = {term: math.log((n + 1) / (freq + 1)) + 1 for term, freq in df.items()}
+        self.postings: dict[str, list[tuple[int, float]]] = defaultdict(list)
+        for i, terms in enumerate(counts):
+            for term, weight in self._vector(terms).items():
+                self.postings[term].append((i, weight))
+
+    def __len__(self) -> int:
+        return len(self.examples)
+
+    def _vector(self, terms: Counter) -> dict[str, float]:
+        vector = {
+            term: (1 + math.log(count)) * self.idf[term] for term, count in terms.items() if term in self.idf
+        }
+        norm = math.sqrt(sum(w * w for w in vector.values())) or 1.0
+        return {term: w / norm for term, w in vector.items()}
+
+    def nearest(self, question: str, k: int, min_ratio: float = 0.0) -> list[tuple[float, str, str]]:
+        """Up to `k` (similarity, question, sql) most similar to `question`, best first.
+
+        Examples scoring below `min_ratio` of the best one are left out.
+        """
+        scores: dict[int, float] = defaultdict(float)
+        for term, weight in self._vector(_terms(question)).items():
+            for i, example_weight in self.postings[term]:
+                scores[i] += weight * example_weight
+        best = sorted(scores.items(), key=lambda item: -item[1])[:k]
+        return [(score, *self.examples[i]) for i, score in best if score >= min_ratio * best[0][1]]
+
+    @classmethod
+    def load(cls, path: str | Path, base: list[tuple[str, str]] = ()) -> "FewShotIndex":
+        """Index `base` plus the pairs of a JSONL file of {"question", "sql"} objects."""
+        examples = list(base)
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    item = json.loads(line)
+                    examples.append((item["question"], item["sql"]))
+        index = cls(examples)
+        logger.info(f"Loaded {len(index)} few-shot examples from {path}")
+        return index
+
+
+def append_verified(path: str | Path, question: str, sql: str) -> None:
+    """Log a question whose generated SQL ran successfully, for the next index build."""
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"question": question, "sql": sql}, ensure_ascii=False) + "\n")
@@ -0,0 +1,239 @@
+import re
+import logging
+from dataclasses import dataclass, field
+
+from src.utils.sql_cache import stem_russian
+
+logger = logging.getLogger(__name__)
+
+
+TOKEN_RE = re.compile(r"[\w\-]+")
+CYRILLIC_RE = re.compile(r"^[а-яё]+$", re.IGNORECASE)
+ID_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_\-]*$")
+
+
+def _stems(*words: str) -> set[str]:
+    return {stem_russian(word) for word in words}
+
+
+METRICS = {
+    "views_count": _stems("просмотр", "просмотры", "просмотров", "просмотрам"),
+    "likes_count": _stems("лайк", "лайки", "лайков", "лайкам", "лайка"),
+    "comments_count": _stems("комментарий", "комментарии", "комментариев", "комментария", "комменты", "комментов"),
+    "reports_count": _stems("жалоба", "жалобы", "жалоб", "репорт", "репорты", "репортов"),
+}
+VIDEO_WORDS = _stems("видео", "ролик", "ролика", "роликов", "ролики")
+CREATOR_WORDS = _stems("креатор", "креатора", "креатору", "автор", "автора", "автору", "блогер", "блогера")
+ID_MARKERS = _stems("id", "айди", "идентификатор", "идентификатором", "номер", "номером")
+# "видео с id xyz": the preposition is read only right before a marker, "видео с 5 лайками" is not an id
+ID_PREPOSITION = "с"
+
+AGGREGATIONS = {
+    "AVG": _stems("среднее", "средний", "средняя", "среднем"),
+    "MAX": _stems("максимальное", "максимальный", "максимум", "наибольшее"),
+    "MIN": _stems("минимальное", "минимальный", "минимум", "наименьшее"),
+}
+DYNAMICS_WORDS = _stems("прирост", "прибавилось", "добавилось", "выросло", "рост", "набрали", "набрало")
+NEW_WORDS = _stems("новых", "новые", "новое", "новый")
+PUBLISHED_WORDS = _stems("опубликовано", "опубликованных", "опубликовали", "вышло", "загружено", "загрузили")
+
+TIME_UNITS = {
+    "minutes": _stems("минута", "минуту", "минуты", "минут"),
+    "hours": _stems("час", "часа", "часов"),
+    "days": _stems("день", "дня", "дней", "сутки", "суток"),
+    "weeks": _stems("неделя", "неделю", "недели", "недель"),
+    "months": _stems("месяц", "месяца", "месяцев"),
+}
+TODAY_WORDS = _stems("сегодня")
+YESTERDAY_WORDS = _stems("вчера")
+
+FILLER_WORDS = _stems(
+    "сколько", "какой", "какая", "какое", "каков", "какова", "каково", "всего", "все", "всех", "всем",
+    "у", "по", "за", "в", "на", "от", "и", "а", "ли", "мне", "это", "был", "было", "были", "есть", "стало",
+    "общее", "общий", "общая", "количество", "число", "сумма", "суммарно", "итого", "значение",
+    "посчитай", "покажи", "скажи", "подскажи", "получили", "получено", "собрали", "последний",
+    "последние", "последнюю", "последних", "последнее", "текущий", "текущее", "один", "одно",
+)
+
+
+@dataclass
+class Intent:
+    sql: str
+    params: dict = field(default_factory=dict)
+
+
+def _parse(question: str) -> dict | None:
+    tokens = [token.strip("-_") for token in TOKEN_RE.findall(question)]
+    tokens = [token for token in tokens if token]
+    words = [stem_russian(token.lower().replace("ё", "е")) if CYRILLIC_RE.match(token) else token for token in tokens]
+
+    parsed = {
+        "metric": None, "count_videos": False, "aggregation": "SUM", "dynamics": False,
+        "new": False, "published": False, "creator_id": None, "video_id": None, "window": None,
+    }
+
+    def is_marker(i: int) -> bool:
+        return i < len(words) and words[i].lower() in ID_MARKERS
+
+    def read_id(start: int, marked: bool) -> tuple[str | None, int]:
+        """The id at `start`; with `marked`, only after an explicit marker like "id" or "номер"."""
+        i = start + 1 if start < len(words) and words[start] == ID_PREPOSITION and is_marker(start + 1) else start
+        markers = i
+        while is_marker(i):
+            i += 1
+        if marked and i == markers or i >= len(tokens):
+            return None, start
+        token = tokens[i]
+        # "5 лайков" is a count, not an id
+        if token.isdigit() and i + 1 < len(words) and any(words[i + 1] in stems for stems in METRICS.values()):
+            return None, start
+        if ID_RE.match(token) and not CYRILLIC_RE.match(token):
+            return token, i + 1
+        return None, start
+
+    i = 0
+    while i < len(words):
+        word = words[i]
+
+        if word in CREATOR_WORDS:
+            # a creator word always comes with an id, so the marker is optional
+            creator_id, i = read_id(i + 1, marked=False)
+            if creator_id is None or parsed["creator_id"]:
+                return None
+            parsed["creator_id"] = creator_id
+            continue
+
+        if word in VIDEO_WORDS:
+            # without a marker "видео" counts videos: "сколько видео 5 лайков" has no id
+            video_id, next_i = read_id(i + 1, marked=True)
+            if video_id is not None:
+                if parsed["video_id"]:
+                    return None
+                parsed["video_id"] = video_id
+                i = next_i
+            else:
+                parsed["count_videos"] = True
+                i += 1
+            continue
+
+        if word.isdigit() and i + 1 < len(words):
+            unit = next((u for u, stems in TIME_UNITS.items() if words[i + 1] in stems), None)
+            if unit is None or parsed["window"] or not 0 < int(word) <= 10_000:
+                return None
+            parsed["window"] = (f"NOW() - INTERVAL '{int(word)} {unit}'", None)
+            i += 2
+            continue
+
+        unit = next((u for u, stems in TIME_UNITS.items() if word in stems), None)
+        if unit is not None:
+            if parsed["window"]:
+                return None
+            parsed["window"] = (f"NOW() - INTERVAL '1 {unit}'", None)
+        elif word in TODAY_WORDS:
+            if parsed["window"]:
+                return None
+            parsed["window"] = ("CURRENT_DATE", None)
+        elif word in YESTERDAY_WORDS:
+            if parsed["window"]:
+                return None
+            parsed["window"] = ("CURRENT_DATE - INTERVAL '1 day'", "CURRENT_DATE")
+        elif metric := next((m for m, stems in METRICS.items() if word in stems), None):
+            if parsed["metric"] and parsed["metric"] != metric:
+                return None
+            parsed["metric"] = metric
+        elif aggregation := next((a for a, stems in AGGREGATIONS.items() if word in stems), None):
+            parsed["aggregation"] = aggregation
+        elif word in DYNAMICS_WORDS:
+            parsed["dynamics"] = True
+        elif word in NEW_WORDS:
+            parsed["new"] = True
+        elif word in PUBLISHED_WORDS:
+            parsed["published"] = True
+        elif word not in FILLER_WORDS:
+            return None
+        i += 1
+
+    return parsed
+
+
+def _time_filter(column: str, window: tuple[str, str | None] | None) -> list[str]:
+    if window is None:
+        return []
+    lo, hi = window
+    return [f"{column} >= {lo}"] + ([f"{column} < {hi}"] if hi else [])
+
+
+def build_intent(parsed: dict) -> Intent | None:
+    metric, creator_id, video_id, window = parsed["metric"], parsed["creator_id"], parsed["video_id"], parsed["window"]
+    if creator_id and video_id:
+        return None
+
+    params = {}
+    if creator_id:
+        params["creator_id"] = creator_id
+    if video_id:
+        params["video_id"] = video_id
+
+    if metric is None:
+        # "Сколько видео (у креатора X) (за неделю)?"
+        if not parsed["count_videos"] or video_id or parsed["dynamics"] or parsed["aggregation"] != "SUM":
+            return None
+        filters = (["creator_id = :creator_id"] if creator_id else []) + _time_filter("video_created_at", window)
+        where = f" WHERE {' AND '.join(filters)}" if filters else ""
+        return Intent(f"SELECT COUNT(*) FROM videos{where};", params)
+
+    # "лайки видео, опубликованных за неделю" filters by publication date, leave it to the LLM
+    if parsed["published"] or parsed["new"] and not window:
+        return None
+
+    if parsed["dynamics"] or window:
+        # growth of a metric: deltas of the hourly snapshots
+        if parsed["aggregation"] != "SUM":
+            return None
+        filters = []
+        if video_id:
+            filters.append("video_id = :video_id")
+        if creator_id:
+            filters.append("video_id IN (SELECT id FROM videos WHERE creator_id = :creator_id)")
+        filters += _time_filter("created_at", window)
+        where = f" WHERE {' AND '.join(filters)}" if filters else ""
+        return Intent(f"SELECT SUM(delta_{metric}) FROM video_snapshots{where};", params)
+
+    if video_id:
+        return Intent(f"SELECT {metric} FROM videos WHERE id = :video_id;", params)
+    where = " WHERE creator_id = :creator_id" if creator_id else ""
+    return Intent(f"SELECT {parsed['aggregation']}({metric}) FROM videos{where};", params)
+
+
+class IntentMatcher:
+    """Answers the common question shapes without the LLM and counts its coverage."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def parse(self, question: str) -> Intent | None:
+        """The intent of `question` without counting it, e.g. for warm-up."""
+        parsed = _parse(question)
+        return build_intent(parsed) if parsed else None
+
+    def match(self, question: str) -> Intent | None:
+        intent = self.parse(question)
+        if intent is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        if (self.hits + self.misses) % 100 == 0:
+            logger.info(f"Intent fast path coverage: {self.stats()}")
+        return intent
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "matched": self.hits,
+            "fallback": self.misses,
+            "coverage": self.hits / total if total else 0.0,
+        }
+
+
+intent_matcher = IntentMatcher()
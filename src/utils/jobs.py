@@ -0,0 +1,165 @@
+import json
+import time
+import uuid
+import asyncio
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
+
+from src.config import settings
+from src.database.db import get_async_read_session
+from src.utils.metrics import JOB_SECONDS, JOBS_QUEUED
+from src.utils.query_executor import DeferredToJob, run_sql, remember_sql
+from src.utils.timing import stage
+
+logger = logging.getLogger(__name__)
+
+
+# finished jobs kept for status lookups
+FINISHED_JOBS = 1000
+
+
+@dataclass
+class Job:
+    id: str
+    question: str
+    sql: str
+    params: dict[str, Any]
+    from_llm: bool
+    # (chat id, message id) of everyone waiting for the answer
+    subscribers: list[tuple[int, int]] = field(default_factory=list)
+    # queued, running, done or failed
+    status: str = "queued"
+    result: Any = None
+    error: Exception | None = None
+    created_at: float = field(default_factory=time.monotonic)
+    started_at: float | None = None
+
+    @property
+    def key(self) -> tuple[str, str]:
+        return self.sql, json.dumps(self.params, sort_keys=True, default=str)
+
+
+class JobQueue:
+    """In-process queue of heavy questions, run by a few worker tasks.
+
+    Workers take `job_slots`, not `db_slots`, so heavy reports never hold up
+    interactive questions. Identical queries waiting or running share one
+    job. `deliver` is awaited with every finished job. Queued jobs do not
+    survive a restart: on shutdown their subscribers get a failure.
+    """
+
+    def __init__(self, workers: int, max_size: int):
+        self.workers = workers
+        self.queue: asyncio.Queue[Job] = asyncio.Queue(max_size)
+        self.jobs: OrderedDict[str, Job] = OrderedDict()
+        self.active: dict[tuple[str, str], Job] = {}
+        self.tasks: list[asyncio.Task] = []
+        self.deliver: Callable[[Job], Awaitable[None]] | None = None
+
+    def start(self, deliver: Callable[[Job], Awaitable[None]]) -> None:
+        self.deliver = deliver
+        self.tasks = [asyncio.create_task(self._work(i)) for i in range(self.workers)]
+        logger.info(f"Started {self.workers} job workers")
+
+    def submit(self, deferred: DeferredToJob, chat_id: int, message_id: int) -> Job:
+        """Queue the deferred question, or join the same query already queued or running.
+
+        Raises `asyncio.QueueFull` when `JOB_QUEUE_SIZE` jobs are waiting.
+        """
+        job = Job(
+            id=uuid.uuid4().hex[:8],
+            question=deferred.question,
+            sql=deferred.sql,
+            params=deferred.params,
+            from_llm=deferred.from_llm,
+        )
+        if job.key in self.active:
+            job = self.active[job.key]
+        else:
+            self.queue.put_nowait(job)
+            self.active[job.key] = job
+            self.jobs[job.id] = job
+            JOBS_QUEUED.set(self.queue.qsize())
+            logger.info(f"Job {job.id} queued: {job.question}")
+        job.subscribers.append((chat_id, message_id))
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        return self.jobs.get(job_id)
+
+    def position(self, job: Job) -> int:
+        """Number of jobs queued before `job`."""
+        ahead = 0
+        for other in self.jobs.values():
+            if other is job:
+                break
+            ahead += other.status == "queued"
+        return ahead
+
+    async def _run(self, job: Job) -> Any:
+        async with get_async_read_session() as db:
+            value = await run_sql(db, job.sql, job.params, job=True)
+        if job.from_llm:
+            await remember_sql(job.question, job.sql)
+        return value
+
+    async def _finish(self, job: Job) -> None:
+        self.active.pop(job.key, None)
+        outcome = "ok" if job.error is None else "error"
+        JOB_SECONDS.labels(outcome).observe(time.monotonic() - job.created_at)
+        try:
+            await self.deliver(job)
+        except Exception as e:
+            logger.exception(f"Could not deliver job {job.id}: {e}")
+        # a CSV answer is deleted once nothing refers to it
+        job.result = None
+        while len(self.jobs) > FINISHED_JOBS + len(self.active):
+            oldest = next(iter(self.jobs.values()))
+            if oldest.status in ("queued", "running"):
+                break
+            self.jobs.popitem(last=False)
+
+    async def _work(self, worker: int) -> None:
+        while True:
+            job = await self.queue.get()
+            JOBS_QUEUED.set(self.queue.qsize())
+            job.status = "running"
+            job.started_at = time.monotonic()
+            logger.info(f"Worker {worker} runs job {job.id} after {job.started_at - job.created_at:.1f}s in the queue")
+            try:
+                with stage("job"):
+                    job.result = await self._run(job)
+                job.status = "done"
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job {job.id} failed: {e}")
+                job.status, job.error = "failed", e
+            finally:
+                self.queue.task_done()
+            logger.info(f"Job {job.id} {job.status} in {time.monotonic() - job.started_at:.1f}s")
+            await self._finish(job)
+
+    async def stop(self, timeout: float) -> None:
+        """Give running jobs up to `timeout` seconds, then fail everything left."""
+        running = [job for job in self.active.values() if job.status == "running"]
+        if running:
+            logger.info(f"Waiting for {len(running)} running jobs")
+            deadline = time.monotonic() + timeout
+            while any(job.status == "running" for job in running) and time.monotonic() < deadline:
+                await asyncio.sleep(0.1)
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        left = list(self.active.values())
+        if left:
+            logger.warning(f"{len(left)} jobs were not finished before shutdown")
+        for job in left:
+            job.status, job.error = "failed", RuntimeError("The bot is shutting down")
+            await self._finish(job)
+
+
+job_queue = JobQueue(settings.job_workers, settings.job_queue_size)
@@ -1,17 +1,18 @@
 import re
+import json
 import logging
-
-from openai import OpenAI
+from pathlib import Path
 
 from src.config import settings
+from src.utils.few_shot import FewShotIndex, tables_of
+from src.utils.llm_gateway import llm_gateway
 
 logger = logging.getLogger(__name__)
 
 
-DATABASE_SCHEMA = """
-База данных содержит две таблицы:
-
-1. Таблица `videos` (итоговая статистика по видео):
+# Schema description by table, so a prompt can carry only the tables a question needs
+SCHEMA_TABLES = {
+    "videos": """Таблица `videos` (итоговая статистика по видео):
    - id (String, PRIMARY KEY) - идентификатор видео
    - creator_id (String) - идентификатор креатора
    - video_created_at (DateTime) - дата и время публикации видео
@@ -20,9 +21,8 @@ DATABASE_SCHEMA = """
    - comments_count (Integer) - финальное количество комментариев
    - reports_count (Integer) - финальное количество жалоб
    - created_at (DateTime) - время создания записи
-   - updated_at (DateTime) - время обновления записи
-
-2. Таблица `video_snapshots` (почасовые замеры статистики):
+   - updated_at (DateTime) - время обновления записи""",
+    "video_snapshots": """Таблица `video_snapshots` (почасовые замеры статистики):
    - id (String, PRIMARY KEY) - идентификатор снапшота
    - video_id (String, FOREIGN KEY -> videos.id) - ссылка на видео
    - views_count (Integer) - текущее количество просмотров на момент замера
@@ -34,18 +34,44 @@ DATABASE_SCHEMA = """
    - delta_comments_count (Integer) - приращение комментариев с прошлого замера
    - delta_reports_count (Integer) - приращение жалоб с прошлого замера
    - created_at (DateTime) - время замера (раз в час)
-   - updated_at (DateTime) - время обновления записи
-
-Важно:
-- Для итоговых значений используй таблицу `videos`
-- Для динамики/прироста используй таблицу `video_snapshots` и поля delta_*
-- Для фильтрации по дате используй поля video_created_at (в videos) или created_at (в snapshots)
-- Для фильтрации по креатору используй creator_id в таблице videos
-"""
-
-SYSTEM_PROMPT = f"""Ты - помощник для генерации SQL запросов к базе данных аналитики видео.
-
-{DATABASE_SCHEMA}
+   - updated_at (DateTime) - время обновления записи""",
+}
+# notes with the tables they are about
+SCHEMA_NOTES = [
+    ({"videos"}, "Для итоговых значений используй таблицу `videos`"),
+    ({"video_snapshots"}, "Для динамики/прироста используй таблицу `video_snapshots` и поля delta_*"),
+    ({"videos", "video_snapshots"}, "Для фильтрации по дате используй поля video_created_at (в videos) или created_at (в snapshots)"),
+    ({"videos"}, "Для фильтрации по креатору используй creator_id в таблице videos"),
+]
+
+
+def database_schema(tables: list[str]) -> str:
+    intro = "База данных содержит две таблицы:" if len(tables) == len(SCHEMA_TABLES) else "Для вопроса нужны таблицы:"
+    parts = [f"{i}. {SCHEMA_TABLES[table]}" for i, table in enumerate(tables, 1)]
+    notes = [f"- {note}" for note_tables, note in SCHEMA_NOTES if note_tables & set(tables)]
+    return "\n" + "\n\n".join([intro, *parts, "Важно:\n" + "\n".join(notes)]) + "\n"
+
+
+DATABASE_SCHEMA = database_schema(list(SCHEMA_TABLES))
+
+# Verified examples of the static prompt; the few-shot index starts from them
+EXAMPLES = [
+    ("Сколько всего видео?", "SELECT COUNT(*) FROM videos;"),
+    ("Сколько просмотров у всех видео?", "SELECT SUM(views_count) FROM videos;"),
+    ("Сколько лайков у креатора abc123?", "SELECT SUM(likes_count) FROM videos WHERE creator_id = 'abc123';"),
+    ("Какой прирост просмотров за последний час?",
+     "SELECT SUM(delta_views_count) FROM video_snapshots WHERE created_at >= NOW() - INTERVAL '1 hour';"),
+    ("Сколько комментариев у видео с id xyz?", "SELECT comments_count FROM videos WHERE id = 'xyz';"),
+    ("Топ-5 креаторов по просмотрам",
+     "SELECT creator_id, SUM(views_count) AS views FROM videos GROUP BY creator_id ORDER BY views DESC LIMIT 5;"),
+    ("Прирост просмотров по часам за сутки",
+     "SELECT date_trunc('hour', created_at) AS hour, SUM(delta_views_count) AS views FROM video_snapshots "
+     "WHERE created_at >= NOW() - INTERVAL '1 day' GROUP BY hour ORDER BY hour;"),
+]
+
+PROMPT_TEMPLATE = """Ты - помощник для генерации SQL запросов к базе данных аналитики видео.
+
+{schema}
 
 Твоя задача:
 1. Понять запрос пользователя на русском языке
@@ -54,7 +80,8 @@ SYSTEM_PROMPT = f"""Ты - помощник для генерации SQL зап
 
 Правила:
 - Используй только SELECT запросы
-- Запрос должен возвращать одно число (результат агрегации: COUNT, SUM, AVG и т.д.)
+- Если спрашивают одно значение - запрос должен возвращать одно число (результат агрегации: COUNT, SUM, AVG и т.д.)
+- Если просят список, топ или разбивку (по креаторам, видео, дням, часам) - верни таблицу: только нужные колонки с понятными именами через AS, ORDER BY и LIMIT из вопроса
 - Если нужна сумма - используй SUM()
 - Если нужен счетчик - используй COUNT()
 - Если нужен прирост - используй SUM() по полям delta_* из video_snapshots
@@ -65,34 +92,139 @@ SYSTEM_PROMPT = f"""Ты - помощник для генерации SQL зап
 - Всегда используй корректные имена таблиц и полей
 
 Примеры:
-- "Сколько всего видео?" -> SELECT COUNT(*) FROM videos;
-- "Сколько просмотров у всех видео?" -> SELECT SUM(views_count) FROM videos;
-- "Сколько лайков у креатора abc123?" -> SELECT SUM(likes_count) FROM videos WHERE creator_id = 'abc123';
-- "Какой прирост просмотров за последний час?" -> SELECT SUM(delta_views_count) FROM video_snapshots WHERE created_at >= NOW() - INTERVAL '1 hour';
-- "Сколько комментариев у видео с id xyz?" -> SELECT comments_count FROM videos WHERE id = 'xyz';
+{examples}
 
 Верни ТОЛЬКО SQL запрос, без markdown форматирования, без объяснений."""
 
 
-def generate_sql_query(user_query: str) -> str:
-    client = OpenAI(api_key=settings.openai_api_key)
-    
-    response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": user_query}
-        ],
-        temperature=0.7,
-    )
-    
-    sql_query = response.choices[0].message.content.strip()
-    
-    if sql_query.startswith("```"):
-        lines = sql_query.split("\n")
-        sql_query = "\n".join(lines[1:-1]) if len(lines) > 2 else sql_query
-    
-    return sql_query.strip()
+def format_examples(examples: list[tuple[str, str]]) -> str:
+    return "\n".join(f'- "{question}" -> {sql}' for question, sql in examples)
+
+
+SYSTEM_PROMPT = PROMPT_TEMPLATE.format(schema=DATABASE_SCHEMA, examples=format_examples(EXAMPLES))
+
+# examples much less similar than the best one only cost tokens
+FEW_SHOT_MIN_RATIO = 0.5
+
+# question words that need a table even when the nearest examples do not use it
+TABLE_HINTS = {
+    "videos": re.compile(r"креатор|автор|блогер|опубликов|вышл|загруж", re.IGNORECASE),
+    "video_snapshots": re.compile(
+        r"прирост|динамик|замер|снапшот|вырос|набрал|прибав|добав|по час|по дн|за (?:последн|сегодня|вчера|час|сутки|недел|день)",
+        re.IGNORECASE,
+    ),
+}
+
+
+def load_few_shot_index() -> FewShotIndex:
+    path = settings.few_shot_path
+    if path and Path(path).exists():
+        return FewShotIndex.load(path, base=EXAMPLES)
+    if path:
+        logger.warning(f"Few-shot index {path} not found, using the built-in examples")
+    return FewShotIndex(EXAMPLES)
+
+
+few_shot_index = load_few_shot_index()
+
+
+def system_prompt(questions: list[str]) -> str:
+    """Prompt with the nearest verified examples and only the tables they need.
+
+    With FEW_SHOT_K=0 it is the full static `SYSTEM_PROMPT`.
+    """
+    k = settings.few_shot_k
+    if not k:
+        return SYSTEM_PROMPT
+    examples, tables = [], set()
+    for question in questions:
+        for _, example_question, sql in few_shot_index.nearest(question, k, FEW_SHOT_MIN_RATIO):
+            if (example_question, sql) not in examples:
+                examples.append((example_question, sql))
+        tables |= {table for table, hint in TABLE_HINTS.items() if hint.search(question)}
+    if not examples:
+        examples = EXAMPLES[:k]
+    tables |= {table for _, sql in examples for table in tables_of(sql)}
+    schema = database_schema([table for table in SCHEMA_TABLES if table in tables] or list(SCHEMA_TABLES))
+    return PROMPT_TEMPLATE.format(schema=schema, examples=format_examples(examples))
+
+
+COST_FEEDBACK = """Этот запрос слишком тяжелый для базы (оценка планировщика {cost:.0f} при лимите {limit:.0f}).
+Перепиши его дешевле: без CROSS JOIN и лишних таблиц, с фильтрами по дате, креатору или видео из вопроса.
+Верни ТОЛЬКО SQL запрос."""
+
+
+BATCH_PROMPT = """Пользователь прислал несколько вопросов, они пронумерованы.
+Для каждого вопроса сгенерируй один SQL запрос по тем же правилам.
+Верни JSON вида {"queries": [{"n": <номер вопроса>, "sql": "<SQL запрос>"}]}, по одному элементу на каждый вопрос."""
+
+# structured output: the model must return exactly this shape
+BATCH_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "sql_batch",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "queries": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {"n": {"type": "integer"}, "sql": {"type": "string"}},
+                        "required": ["n", "sql"],
+                        "additionalProperties": False,
+                    },
+                },
+            },
+            "required": ["queries"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+
+def _strip_code_fence(content: str) -> str:
+    content = content.strip()
+    if content.startswith("```"):
+        lines = content.split("\n")
+        content = "\n".join(lines[1:-1]) if len(lines) > 2 else content
+    return content.strip()
+
+
+async def generate_sql_query(user_query: str, rejected: tuple[str, str] | None = None) -> str:
+    """Generate SQL for the question.
+
+    `rejected` is a previous (sql, reason) pair to ask the model for a fix.
+    """
+    messages = [
+        {"role": "system", "content": system_prompt([user_query])},
+        {"role": "user", "content": user_query}
+    ]
+    if rejected is not None:
+        messages.append({"role": "assistant", "content": rejected[0]})
+        messages.append({"role": "user", "content": rejected[1]})
+    content = await llm_gateway.complete(messages)
+    return _strip_code_fence(content)
+
+
+async def generate_sql_batch(questions: list[str]) -> list[str | None]:
+    """Generate SQL for several questions in one completion.
+
+    Returns one SQL per question, None where the model skipped it.
+    """
+    numbered = "\n".join(f"{i}. {question}" for i, question in enumerate(questions, 1))
+    messages = [
+        {"role": "system", "content": f"{system_prompt(questions)}\n\n{BATCH_PROMPT}"},
+        {"role": "user", "content": numbered},
+    ]
+    content = await llm_gateway.complete(messages, response_format=BATCH_RESPONSE_FORMAT)
+    try:
+        items = json.loads(_strip_code_fence(content))["queries"]
+        by_number = {int(item["n"]): _strip_code_fence(item["sql"]) for item in items}
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"LLM returned malformed batch output: {e}")
+    return [by_number.get(i) or None for i in range(1, len(questions) + 1)]
 
 
 def validate_sql_query(sql: str) -> bool:
@@ -0,0 +1,141 @@
+import time
+import asyncio
+import importlib
+import logging
+from typing import TYPE_CHECKING
+
+from src.config import settings
+from src.utils.metrics import LLM_SECONDS, LLM_HEDGES, record_llm_usage
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+logger = logging.getLogger(__name__)
+
+
+class LLMGateway:
+    """Single entry point for chat completions.
+
+    One keep-alive client is shared by all requests. If the primary model has
+    not answered within `hedge_after` seconds, or fails, a second request is
+    sent to the fallback model and whichever answers first wins. Nothing
+    waits longer than `timeout` seconds.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        fallback_model: str | None,
+        hedge_after: float,
+        timeout: float,
+        temperature: float = 0.0,
+        client: "AsyncOpenAI | None" = None,
+    ):
+        self.model = model
+        self.fallback_model = fallback_model
+        self.hedge_after = hedge_after
+        self.timeout = timeout
+        self.temperature = temperature
+        self._client = client
+        # only a client created here is closed here
+        self._owned = False
+
+    @property
+    def client(self) -> "AsyncOpenAI":
+        if self._client is None:
+            # the SDK takes half a second to import, so it is loaded with the first client
+            from openai import AsyncOpenAI
+
+            # retries are handled here by hedging, not by the SDK
+            self._client = AsyncOpenAI(
+                api_key=settings.openai_api_key,
+                base_url=settings.openai_base_url,
+                timeout=self.timeout,
+                max_retries=0,
+            )
+            self._owned = True
+        return self._client
+
+    def set_client(self, client) -> None:
+        self._client = client
+        self._owned = False
+
+    async def warm_up(self) -> None:
+        """Open the keep-alive connection to the API before the first question."""
+        if self._client is not None and not self._owned:
+            return
+        try:
+            if self._client is None:
+                # the SDK import is most of it; in a thread it overlaps the rest of the warm-up
+                await asyncio.to_thread(importlib.import_module, "openai")
+            await self.client.models.list()
+        except Exception as e:
+            logger.warning(f"LLM warm-up request failed: {e}")
+
+    async def close(self) -> None:
+        if self._owned:
+            await self._client.close()
+        self._client = None
+        self._owned = False
+
+    async def _attempt(self, model: str, messages: list[dict], response_format: dict | None = None) -> str:
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            extra = {"response_format": response_format} if response_format else {}
+            response = await self.client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=self.temperature,
+                **extra,
+            )
+            outcome = "ok"
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        finally:
+            LLM_SECONDS.labels(model, outcome).observe(time.perf_counter() - started)
+        record_llm_usage(model, getattr(response, "usage", None))
+        return response.choices[0].message.content
+
+    async def complete(self, messages: list[dict], response_format: dict | None = None) -> str:
+        """Content of the first successful completion; `response_format` asks for structured output."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        pending = {asyncio.create_task(self._attempt(self.model, messages, response_format))}
+        hedged = False
+        errors: list[BaseException] = []
+        try:
+            while pending:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                wait_for = remaining if hedged else min(self.hedge_after, remaining)
+                done, pending = await asyncio.wait(pending, timeout=wait_for, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    errors.append(task.exception())
+                    logger.warning(f"LLM request failed: {task.exception()!r}")
+
+                if not hedged and self.fallback_model and (errors or not done):
+                    hedged = True
+                    LLM_HEDGES.labels(self.fallback_model).inc()
+                    logger.warning(f"{self.model} failed or is slow, hedging with {self.fallback_model}")
+                    pending.add(asyncio.create_task(self._attempt(self.fallback_model, messages, response_format)))
+
+            if errors and not pending:
+                raise errors[-1]
+            raise TimeoutError(f"LLM did not answer within {self.timeout}s")
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+llm_gateway = LLMGateway(
+    model=settings.llm_model,
+    fallback_model=settings.llm_fallback_model or None,
+    hedge_after=settings.llm_hedge_after,
+    timeout=settings.llm_timeout,
+    temperature=settings.llm_temperature,
+)
@@ -0,0 +1,152 @@
+import logging
+from collections import defaultdict
+from typing import Callable
+
+from aiohttp import web
+from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, REGISTRY
+from sqlalchemy import text
+
+from src.config import settings
+from src.database.db import read_engines
+from src.utils.intents import intent_matcher
+from src.utils.result_cache import result_cache
+from src.utils.sql_cache import sql_cache
+
+logger = logging.getLogger(__name__)
+
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+STAGE_SECONDS = Histogram(
+    "bot_stage_duration_seconds",
+    "Duration of one stage of answering a question",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUEST_SECONDS = Histogram(
+    "bot_request_duration_seconds",
+    "Time from receiving a question to sending the answer",
+    ["outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+ERRORS = Counter("bot_errors_total", "Errors by stage and exception class", ["stage", "error"])
+LLM_TOKENS = Counter("bot_llm_tokens_total", "Tokens used by LLM completions", ["model", "kind"])
+JOB_SECONDS = Histogram(
+    "bot_job_duration_seconds",
+    "Background job time from submission to the answer",
+    ["outcome"],
+    buckets=(1, 2.5, 5, 10, 30, 60, 120, 300, 600),
+)
+JOBS_QUEUED = Gauge("bot_jobs_queued", "Background jobs waiting for a worker")
+STARTUP_SECONDS = Gauge(
+    "bot_startup_seconds", "Duration of a startup phase: import, init, warm_up, first_answer", ["phase"]
+)
+READY = Gauge("bot_ready", "1 once the process has warmed up and takes updates")
+LLM_PROMPT_TOKENS = Histogram(
+    "bot_llm_prompt_tokens",
+    "Prompt size of one LLM completion, tokens",
+    ["model"],
+    buckets=(100, 250, 500, 750, 1000, 1500, 2000, 3000, 5000, 10000),
+)
+LLM_REQUESTS = Counter("bot_llm_requests_total", "LLM completions", ["model"])
+LLM_SECONDS = Histogram(
+    "bot_llm_duration_seconds",
+    "Duration of one LLM completion by model and outcome",
+    ["model", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_HEDGES = Counter("bot_llm_hedges_total", "Hedged LLM requests by fallback model", ["model"])
+DB_ROWS_RETURNED = Counter("bot_db_rows_returned_total", "Rows returned to the bot by analytics queries")
+DB_PLAN_COST = Histogram(
+    "bot_db_plan_cost",
+    "Planner cost estimates of analytics queries",
+    buckets=(10, 100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000),
+)
+DB_ROWS_SCANNED = Gauge(
+    "bot_db_rows_scanned",
+    "Rows read from the analytics tables since the statistics reset (pg_stat_user_tables)",
+    ["table", "scan"],
+)
+
+
+def record_llm_usage(model: str, usage) -> None:
+    LLM_REQUESTS.labels(model).inc()
+    if usage is None:
+        return
+    LLM_TOKENS.labels(model, "prompt").inc(usage.prompt_tokens or 0)
+    LLM_PROMPT_TOKENS.labels(model).observe(usage.prompt_tokens or 0)
+    LLM_TOKENS.labels(model, "completion").inc(usage.completion_tokens or 0)
+
+
+class CacheCollector:
+    """Exports the counters the caches and the intent matcher keep anyway."""
+
+    def collect(self):
+        lookups = CounterMetricFamily("bot_cache_lookups", "Cache lookups by cache and result", labels=["cache", "result"])
+        size = GaugeMetricFamily("bot_cache_entries", "Entries held in memory by cache", labels=["cache"])
+        for name, cache in (("sql", sql_cache), ("result", result_cache)):
+            stats = cache.stats()
+            lookups.add_metric([name, "hit"], stats["hits"])
+            lookups.add_metric([name, "miss"], stats["misses"])
+            size.add_metric([name], stats["size"])
+        intents = intent_matcher.stats()
+        lookups.add_metric(["intent", "hit"], intents["matched"])
+        lookups.add_metric(["intent", "miss"], intents["fallback"])
+        yield size
+        if settings.columnar_cache:
+            from src.utils.columnar import columnar_store
+
+            columnar = columnar_store.stats()
+            lookups.add_metric(["columnar", "hit"], columnar["hits"])
+            lookups.add_metric(["columnar", "miss"], columnar["misses"])
+            memory = GaugeMetricFamily("bot_columnar_bytes", "Memory held by the columnar store arrays")
+            memory.add_metric([], columnar["bytes"])
+            yield memory
+        yield lookups
+
+
+REGISTRY.register(CacheCollector())
+
+
+async def refresh_db_stats() -> None:
+    # analytics queries run on the replicas, and every server counts only its own scans
+    scanned: dict[tuple[str, str], int] = defaultdict(int)
+    for read_engine in read_engines:
+        async with read_engine.connect() as conn:
+            result = await conn.execute(text(
+                "SELECT relname, COALESCE(seq_tup_read, 0), COALESCE(idx_tup_fetch, 0) FROM pg_stat_user_tables "
+                "WHERE relname LIKE 'video%'"
+            ))
+            for table, seq_rows, idx_rows in result:
+                scanned[table, "seq"] += seq_rows
+                scanned[table, "index"] += idx_rows
+    for (table, scan), rows in scanned.items():
+        DB_ROWS_SCANNED.labels(table, scan).set(rows)
+
+
+async def metrics_handler(request: web.Request) -> web.Response:
+    try:
+        await refresh_db_stats()
+    except Exception as e:
+        logger.warning(f"Could not read table statistics: {e}")
+    return web.Response(body=generate_latest(REGISTRY), headers={"Content-Type": CONTENT_TYPE_LATEST})
+
+
+async def start_metrics_server(port: int | None = None, ready: Callable[[], bool] | None = None) -> web.AppRunner:
+    """Serve /metrics and /ready, which answers 200 once `ready()` is true and 503 before."""
+    port = port or settings.metrics_port
+
+    async def ready_handler(request: web.Request) -> web.Response:
+        if ready is None or ready():
+            return web.Response(text="ready")
+        return web.Response(status=503, text="warming up")
+
+    app = web.Application()
+    app.router.add_get("/metrics", metrics_handler)
+    app.router.add_get("/ready", ready_handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, settings.metrics_host, port).start()
+    logger.info(f"Metrics available on http://{settings.metrics_host}:{port}/metrics")
+    return runner
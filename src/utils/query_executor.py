@@ -1,40 +1,229 @@
+import json
 from typing import Any
-from sqlalchemy import text
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.engine.result import Row
 
-from src.utils.llm import generate_sql_query, validate_sql_query
+from src.database.db import get_data_version, get_async_read_session
+from src.utils.llm import generate_sql_query, validate_sql_query, COST_FEEDBACK
+from src.utils.sql_cache import sql_cache, normalize_question
+from src.utils.result_cache import result_cache, MISSING
+from src.utils.rollup_router import route_to_rollups
+from src.utils.intents import intent_matcher
+from src.utils.sql_governor import fetch_governed, interactive_limits, job_limits, QueryTooExpensive, QueryTimedOut
+from src.utils.tables import TableResult, collector
+from src.utils.few_shot import append_verified
+from src.utils.sql_params import parameterize
+from src.utils.timing import stage, Handoff
+from src.utils.concurrency import single_flight, llm_slots, db_slots, job_slots
+from src.utils.shared_state import shared_state
+from src.config import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
-def execute_natural_language_query(db: Session, user_query: str) -> Any:
+
+class DeferredToJob(Handoff):
+    """The question's SQL is over the interactive limits and should run as a background job."""
+
+    def __init__(self, question: str, sql: str, params: dict[str, Any], from_llm: bool, reason: ValueError):
+        super().__init__(f"Deferred to a background job: {reason}")
+        self.question = question
+        self.sql = sql
+        self.params = params
+        self.from_llm = from_llm
+
+
+def to_scalar(row: Any) -> Any:
+    if row is None:
+        return 0
+
+    value = row[0] if isinstance(row, (Row, tuple)) else row
+
+    if isinstance(value, (int, float)):
+        return int(value) if isinstance(value, float) and value.is_integer() else value
+
     try:
-        sql_query = generate_sql_query(user_query)
-        logger.info(f"Generated SQL query: \n{sql_query}")
-
-        if not validate_sql_query(sql_query):
-            raise ValueError("Generated query is not safe or incorrect")
-        
-        result = db.execute(text(sql_query))
-        row = result.fetchone()
-        
-        if row is None:
-            return 0
-        
-        value = row[0] if isinstance(row, (Row)) else row
-        
-        if isinstance(value, (int, float)):
-            return int(value) if isinstance(value, float) and value.is_integer() else value
-        
+        return int(value)
+    except (ValueError, TypeError):
         try:
-            return int(value)
+            return float(value)
         except (ValueError, TypeError):
-            try:
-                return float(value)
-            except (ValueError, TypeError):
-                return value
-        
+            return value
+
+
+def to_value(table: TableResult) -> Any:
+    """A single value for a one-value result, the table otherwise."""
+    if table.is_scalar:
+        return to_scalar(table.rows[0] if table.rows else None)
+    return table
+
+
+def prepare_sql(sql_query: str, params: dict[str, Any]) -> tuple[str, str | None, dict[str, Any]]:
+    """Validate a query and return the SQL to run, the SQL for the columnar store and the params."""
+    if settings.sql_parameterize:
+        sql_query, params = parameterize(sql_query, params)
+    if not validate_sql_query(sql_query):
+        raise ValueError("Generated query is not safe or incorrect")
+    final_sql = route_to_rollups(sql_query) if settings.rollup_routing else sql_query
+    # rows are read without a round trip to the database when the columnar store can answer
+    columnar_sql = sql_query if settings.columnar_cache else None
+    return final_sql, columnar_sql, params
+
+
+async def lookup_result(final_sql: str, columnar_sql: str | None, params: dict[str, Any], data_version: int) -> Any:
+    """The result from the caches or the columnar store, or `MISSING`."""
+    value = result_cache.get(final_sql, data_version, params)
+    if value is MISSING and shared_state.distributed:
+        shared_key, _ = result_cache.shared_key(final_sql, data_version, params)
+        shared_value = await shared_state.get(shared_key)
+        if shared_value is not None:
+            value = json.loads(shared_value)
+            result_cache.set(final_sql, data_version, value, params)
+    if value is not MISSING:
+        logger.info("Result served from cache")
+        return value
+    if columnar_sql is not None:
+        # numpy is imported only when the columnar store is on
+        from src.utils.columnar import columnar_store
+
+        with stage("columnar"):
+            answer = columnar_store.query(columnar_sql, params, data_version)
+        if answer is not None:
+            columns, rows = answer
+            table = collector(columns)
+            table.add(rows)
+            value = to_value(table.finish())
+            if not isinstance(value, TableResult) or value.path is None:
+                result_cache.set(final_sql, data_version, value, params)
+            logger.info("Result computed by the columnar store")
+    return value
+
+
+async def store_result(final_sql: str, params: dict[str, Any], data_version: int, value: Any) -> None:
+    if isinstance(value, TableResult):
+        # tables are cached in this process only, and files not at all
+        if value.path is None:
+            result_cache.set(final_sql, data_version, value, params)
+        return
+    result_cache.set(final_sql, data_version, value, params)
+    if shared_state.distributed:
+        shared_key, ttl = result_cache.shared_key(final_sql, data_version, params)
+        await shared_state.set(shared_key, json.dumps(value, default=str), ttl)
+
+
+async def run_sql(db: AsyncSession, sql_query: str, params: dict[str, Any], job: bool = False) -> Any:
+    """Run a query through the caches and the governor.
+
+    A `job` query runs under the job limits and slots instead of the interactive ones.
+    """
+    with stage("validate"):
+        final_sql, columnar_sql, params = prepare_sql(sql_query, params)
+
+    async with job_slots if job else db_slots:
+        with stage("db"):
+            data_version = await get_data_version(db)
+            value = await lookup_result(final_sql, columnar_sql, params, data_version)
+            if value is MISSING:
+                limits = job_limits() if job else interactive_limits()
+                value = to_value(await fetch_governed(db, final_sql, params, data_version, limits))
+                await store_result(final_sql, params, data_version, value)
+    return value
+
+
+async def lookup_sql(user_query: str) -> str | None:
+    """SQL generated earlier for the same question."""
+    with stage("sql_cache"):
+        sql_query = sql_cache.get(user_query)
+        if sql_query is None and shared_state.distributed:
+            sql_query = await shared_state.get(f"sql:{normalize_question(user_query)}")
+            if sql_query is not None:
+                sql_cache.set(user_query, sql_query)
+    return sql_query
+
+
+async def remember_sql(user_query: str, sql_query: str) -> None:
+    """Cache SQL the LLM generated once it ran successfully."""
+    sql_cache.set(user_query, sql_query)
+    if settings.few_shot_log_path:
+        append_verified(settings.few_shot_log_path, user_query, sql_query)
+    if shared_state.distributed:
+        await shared_state.set(f"sql:{normalize_question(user_query)}", sql_query, settings.sql_cache_ttl)
+
+
+async def _run_or_defer(
+    db: AsyncSession, user_query: str, sql_query: str, params: dict[str, Any], from_llm: bool,
+    defer_expensive: bool = True,
+) -> Any:
+    """`run_sql`, handing queries over the interactive limits to the job queue when it is on.
+
+    Without `defer_expensive` a query over SQL_MAX_COST is raised as is, so the LLM can rewrite it first.
+    """
+    try:
+        return await run_sql(db, sql_query, params)
+    except (QueryTooExpensive, QueryTimedOut) as e:
+        expensive = isinstance(e, QueryTooExpensive)
+        too_heavy = expensive and settings.job_max_cost and e.cost > settings.job_max_cost
+        if settings.job_workers and not too_heavy and (defer_expensive or not expensive):
+            logger.info(f"Deferring to a background job: {e}")
+            raise DeferredToJob(user_query, sql_query, params, from_llm, e) from e
+        raise
+
+
+async def execute_natural_language_query(db: AsyncSession, user_query: str) -> Any:
+    try:
+        params = {}
+        with stage("intent"):
+            intent = intent_matcher.match(user_query) if settings.intent_fast_path else None
+        if intent is not None:
+            sql_query, params = intent.sql, intent.params
+            from_llm = False
+            logger.info(f"Matched intent SQL query: \n{sql_query} {params}")
+        else:
+            sql_query = await lookup_sql(user_query)
+            from_llm = sql_query is None
+            if not from_llm:
+                logger.info(f"Cached SQL query: \n{sql_query}")
+            else:
+                async with llm_slots:
+                    with stage("llm"):
+                        sql_query = await generate_sql_query(user_query)
+                logger.info(f"Generated SQL query: \n{sql_query}")
+
+        # intent SQL is fixed; LLM and cached SQL get one cheaper rewrite before it becomes a job
+        rewrite = intent is None and settings.sql_reprompt_on_cost
+        try:
+            value = await _run_or_defer(db, user_query, sql_query, params, from_llm, defer_expensive=not rewrite)
+        except QueryTooExpensive as e:
+            if not rewrite:
+                raise
+            from_llm = True
+            logger.info("Asking the LLM for a cheaper query")
+            async with llm_slots:
+                with stage("llm"):
+                    sql_query = await generate_sql_query(
+                        user_query, rejected=(sql_query, COST_FEEDBACK.format(cost=e.cost, limit=e.limit))
+                    )
+            logger.info(f"Regenerated SQL query: \n{sql_query}")
+            value = await _run_or_defer(db, user_query, sql_query, params, from_llm)
+
+        if from_llm:
+            await remember_sql(user_query, sql_query)
+
+        return value
+
+    except DeferredToJob:
+        raise
     except Exception as e:
         raise ValueError(f"Error executing query: {str(e)}")
 
+
+async def answer_query(user_query: str) -> Any:
+    """Answer a question in its own session.
+
+    Concurrent questions that normalize to the same text share one run.
+    """
+    async def run() -> Any:
+        async with get_async_read_session() as db:
+            return await execute_natural_language_query(db, user_query)
+
+    return await single_flight.do(normalize_question(user_query), run)
@@ -0,0 +1,93 @@
+import re
+import time
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Any
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+# Functions whose value depends on the moment the query runs
+TIME_DEPENDENT_RE = re.compile(
+    r"\b(NOW\s*\(|CURRENT_DATE|CURRENT_TIMESTAMP|CURRENT_TIME|LOCALTIMESTAMP|LOCALTIME)", re.IGNORECASE
+)
+
+MISSING = object()
+
+
+class ResultCache:
+    """LRU cache of query results keyed by SQL text, bind parameters and data version.
+
+    The loader bumps the data version in the same transaction as the load,
+    so an entry computed before a reload can never be served after it.
+    Queries that use NOW() and friends are also keyed by a time bucket of
+    `now_bucket` seconds, which makes them expire when the bucket rolls over.
+    """
+
+    def __init__(self, max_size: int = 1024, now_bucket: int = 60):
+        self.max_size = max_size
+        self.now_bucket = now_bucket
+        self.entries: OrderedDict[tuple, Any] = OrderedDict()
+        self.data_version: int | None = None
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, sql: str, data_version: int, params: dict | None) -> tuple:
+        bucket = None
+        if TIME_DEPENDENT_RE.search(sql):
+            bucket = int(time.time() // self.now_bucket)
+        return (sql.strip(), tuple(sorted((params or {}).items())), data_version, bucket)
+
+    def _check_version(self, data_version: int) -> None:
+        if self.data_version != data_version:
+            if self.data_version is not None:
+                logger.info(f"Data version changed {self.data_version} -> {data_version}, dropping result cache")
+            self.entries.clear()
+            self.data_version = data_version
+
+    def get(self, sql: str, data_version: int, params: dict | None = None) -> Any:
+        """Return the cached result or `MISSING`."""
+        self._check_version(data_version)
+        key = self._key(sql, data_version, params)
+        if key not in self.entries:
+            self.misses += 1
+            return MISSING
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return self.entries[key]
+
+    def set(self, sql: str, data_version: int, value: Any, params: dict | None = None) -> None:
+        self._check_version(data_version)
+        key = self._key(sql, data_version, params)
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def shared_key(self, sql: str, data_version: int, params: dict | None = None) -> tuple[str, float]:
+        """Key and TTL for the entry in the cross-process shared state."""
+        key = self._key(sql, data_version, params)
+        ttl = self.now_bucket if key[3] is not None else 3600
+        return "result:" + hashlib.sha1(repr(key).encode()).hexdigest(), ttl
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "data_version": self.data_version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+
+result_cache = ResultCache(
+    max_size=settings.result_cache_size,
+    now_bucket=settings.result_cache_now_bucket,
+)
@@ -0,0 +1,132 @@
+import re
+import logging
+
+from src.database.rollups import ROLLUP_TIME_ZONE
+
+logger = logging.getLogger(__name__)
+
+
+QUERY_RE = re.compile(
+    r"^\s*SELECT\s+SUM\s*\(\s*(?:(?P<sum_alias>\w+)\.)?(?P<column>delta_(?:views|likes|comments|reports)_count)\s*\)"
+    r"(?:\s+AS\s+\w+)?"
+    r"\s+FROM\s+video_snapshots(?:\s+(?:AS\s+)?(?P<s_alias>(?!JOIN\b|INNER\b|WHERE\b)\w+))?"
+    r"(?:\s+(?:INNER\s+)?JOIN\s+videos(?:\s+(?:AS\s+)?(?P<v_alias>(?!ON\b)\w+))?"
+    r"\s+ON\s+(?P<on_left>[\w.]+)\s*=\s*(?P<on_right>[\w.]+))?"
+    r"(?:\s+WHERE\s+(?P<where>.+?))?\s*;?\s*$",
+    re.IGNORECASE | re.DOTALL,
+)
+
+TIME_RE = re.compile(r"^(?:(?P<alias>\w+)\.)?created_at\s*(?P<op>>=|<)\s*(?P<expr>.+)$", re.IGNORECASE | re.DOTALL)
+# a quoted literal or a bind parameter
+VALUE = r"(?P<value>'[^']*'|:\w+)"
+VIDEO_RE = re.compile(rf"^(?:(?P<alias>\w+)\.)?video_id\s*=\s*{VALUE}$", re.IGNORECASE)
+CREATOR_RE = re.compile(rf"^(?:(?P<alias>\w+)\.)?creator_id\s*=\s*{VALUE}$", re.IGNORECASE)
+CREATOR_SUBQUERY_RE = re.compile(
+    rf"^(?:(?P<alias>\w+)\.)?video_id\s+IN\s*\(\s*SELECT\s+id\s+FROM\s+videos\s+WHERE\s+creator_id\s*=\s*{VALUE}\s*\)$",
+    re.IGNORECASE,
+)
+UNSUPPORTED_RE = re.compile(r"\b(OR|BETWEEN|SELECT|NOT)\b|;", re.IGNORECASE)
+
+
+def _parse(sql: str) -> dict | None:
+    match = QUERY_RE.match(sql)
+    if not match:
+        return None
+
+    s_alias = (match["s_alias"] or "video_snapshots").lower()
+    v_alias = (match["v_alias"] or "videos").lower()
+    snapshot_aliases = {None, s_alias}
+    # videos has a created_at too, so with the join it has to be qualified
+    time_aliases = {s_alias} if match["on_left"] else snapshot_aliases
+
+    if match["sum_alias"] and match["sum_alias"].lower() != s_alias:
+        return None
+    if match["on_left"]:
+        sides = {match["on_left"].lower(), match["on_right"].lower()}
+        if sides != {f"{v_alias}.id", f"{s_alias}.video_id"}:
+            return None
+
+    parsed = {"column": match["column"].lower(), "lo": None, "hi": None, "video": None, "creator": None}
+    where = match["where"]
+    if not where:
+        return parsed
+
+    for condition in re.split(r"\s+AND\s+", where.strip(), flags=re.IGNORECASE):
+        condition = condition.strip()
+        if m := CREATOR_SUBQUERY_RE.match(condition):
+            if (m["alias"] and m["alias"].lower()) not in snapshot_aliases or parsed["creator"]:
+                return None
+            parsed["creator"] = m["value"]
+        elif m := VIDEO_RE.match(condition):
+            if (m["alias"] and m["alias"].lower()) not in snapshot_aliases or parsed["video"]:
+                return None
+            parsed["video"] = m["value"]
+        elif m := CREATOR_RE.match(condition):
+            # creator_id lives in videos, so it needs the join
+            if not match["on_left"] or (m["alias"] and m["alias"].lower()) not in {None, v_alias} or parsed["creator"]:
+                return None
+            parsed["creator"] = m["value"]
+        elif m := TIME_RE.match(condition):
+            bound = "lo" if m["op"] == ">=" else "hi"
+            expr = m["expr"].strip()
+            if (m["alias"] and m["alias"].lower()) not in time_aliases or parsed[bound]:
+                return None
+            if UNSUPPORTED_RE.search(expr) or expr.count("(") != expr.count(")"):
+                return None
+            parsed[bound] = f"CAST(({expr}) AS timestamptz)"
+        else:
+            return None
+
+    return parsed
+
+
+def route_to_rollups(sql: str) -> str:
+    """Rewrite SUM(delta_*) over video_snapshots to read the rollup tables.
+
+    Whole buckets inside the time window are summed from the rollup and the
+    partial buckets at its edges from video_snapshots, so the answer is exact
+    for any window. Queries of any other shape are returned unchanged.
+    """
+    parsed = _parse(sql)
+    if parsed is None:
+        return sql
+
+    column, lo, hi = parsed["column"], parsed["lo"], parsed["hi"]
+    if parsed["video"]:
+        # one video has few snapshots per day, the daily rollup is per video
+        granularity, table = "day", "video_snapshots_daily"
+    else:
+        granularity, table = "hour", "video_snapshots_hourly"
+
+    rollup_filters, raw_filters = [], []
+    if parsed["video"]:
+        rollup_filters.append(f"video_id = {parsed['video']}")
+        raw_filters.append(f"video_id = {parsed['video']}")
+    if parsed["creator"]:
+        rollup_filters.append(f"creator_id = {parsed['creator']}")
+        raw_filters.append(f"video_id IN (SELECT id FROM videos WHERE creator_id = {parsed['creator']})")
+
+    ceil_lo = f"(date_trunc('{granularity}', {lo}, '{ROLLUP_TIME_ZONE}') + INTERVAL '1 {granularity}')" if lo else None
+    floor_hi = f"date_trunc('{granularity}', {hi}, '{ROLLUP_TIME_ZONE}')" if hi else None
+
+    if ceil_lo:
+        rollup_filters.append(f"bucket >= {ceil_lo}")
+    if floor_hi:
+        rollup_filters.append(f"bucket < {floor_hi}")
+
+    def part(source: str, filters: list[str]) -> str:
+        where = f" WHERE {' AND '.join(filters)}" if filters else ""
+        return f"SELECT SUM({column}) AS part FROM {source}{where}"
+
+    parts = [part(table, rollup_filters)]
+    if lo:
+        upper = f"LEAST({ceil_lo}, {hi})" if hi else ceil_lo
+        parts.append(part("video_snapshots", [*raw_filters, f"created_at >= {lo}", f"created_at < {upper}"]))
+    if hi:
+        lower = f"GREATEST({floor_hi}, {ceil_lo})" if lo else floor_hi
+        parts.append(part("video_snapshots", [*raw_filters, f"created_at >= {lower}", f"created_at < {hi}"]))
+
+    # NULL only when no part has rows, like the SUM over the window itself
+    routed = "SELECT SUM(part) FROM (" + "\n    UNION ALL ".join(parts) + ") AS parts;"
+    logger.info(f"Routed query to {table}")
+    return routed
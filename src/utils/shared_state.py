@@ -0,0 +1,148 @@
+import time
+import logging
+
+from sqlalchemy import text
+
+from src.config import settings
+from src.database.db import async_engine
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """Take a token and return how long to wait before using it."""
+        self._refill()
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def refund(self) -> None:
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+    def idle(self) -> bool:
+        self._refill()
+        return self.tokens >= self.capacity
+
+
+class MemoryState:
+    """Process-local state: enough for one polling or webhook process."""
+
+    distributed = False
+
+    def __init__(self):
+        self.values: dict[str, tuple[str, float]] = {}
+        self.buckets: dict[str, TokenBucket] = {}
+
+    async def get(self, key: str) -> str | None:
+        entry = self.values.get(key)
+        if entry is None or entry[1] <= time.time():
+            return None
+        return entry[0]
+
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        if len(self.values) > 10_000:
+            now = time.time()
+            self.values = {k: v for k, v in self.values.items() if v[1] > now}
+        self.values[key] = (value, time.time() + ttl)
+
+    async def reserve(self, key: str, rate: float, capacity: float) -> float:
+        """Take a token from the bucket `key` and return how long to wait for it."""
+        if len(self.buckets) > 10_000:
+            self.buckets = {k: b for k, b in self.buckets.items() if not b.idle()}
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = TokenBucket(rate, capacity)
+        return bucket.reserve()
+
+    async def refund(self, key: str, capacity: float) -> None:
+        bucket = self.buckets.get(key)
+        if bucket is not None:
+            bucket.refund()
+
+
+class PostgresState:
+    """State shared by all worker processes through two UNLOGGED tables.
+
+    Token buckets are updated with a single upsert, so concurrent workers
+    never lose a reservation.
+    """
+
+    distributed = True
+    # expired cache rows and idle buckets are deleted every this many writes
+    CLEANUP_EVERY = 1000
+
+    GET_SQL = text("SELECT value FROM shared_cache WHERE key = :key AND expires_at > now()")
+    SET_SQL = text(
+        "INSERT INTO shared_cache (key, value, expires_at) "
+        "VALUES (:key, :value, now() + make_interval(secs => :ttl)) "
+        "ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value, expires_at = EXCLUDED.expires_at"
+    )
+    RESERVE_SQL = text(
+        "INSERT INTO rate_limit_buckets AS b (key, tokens, updated_at) "
+        "VALUES (:key, CAST(:capacity AS double precision) - 1, now()) "
+        "ON CONFLICT (key) DO UPDATE SET "
+        "tokens = LEAST(CAST(:capacity AS double precision), "
+        "b.tokens + EXTRACT(EPOCH FROM now() - b.updated_at) * CAST(:rate AS double precision)) - 1, "
+        "updated_at = now() "
+        "RETURNING tokens"
+    )
+    REFUND_SQL = text(
+        "UPDATE rate_limit_buckets SET tokens = LEAST(CAST(:capacity AS double precision), tokens + 1) "
+        "WHERE key = :key"
+    )
+    CLEANUP_SQL = (
+        text("DELETE FROM shared_cache WHERE expires_at <= now()"),
+        text("DELETE FROM rate_limit_buckets WHERE updated_at < now() - INTERVAL '1 hour'"),
+    )
+
+    def __init__(self):
+        self.writes = 0
+
+    async def _cleanup(self, conn) -> None:
+        self.writes += 1
+        if self.writes % self.CLEANUP_EVERY == 0:
+            for statement in self.CLEANUP_SQL:
+                await conn.execute(statement)
+
+    async def get(self, key: str) -> str | None:
+        async with async_engine.connect() as conn:
+            return (await conn.execute(self.GET_SQL, {"key": key})).scalar()
+
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        async with async_engine.begin() as conn:
+            await conn.execute(self.SET_SQL, {"key": key, "value": value, "ttl": float(ttl)})
+            await self._cleanup(conn)
+
+    async def reserve(self, key: str, rate: float, capacity: float) -> float:
+        async with async_engine.begin() as conn:
+            tokens = (await conn.execute(
+                self.RESERVE_SQL, {"key": key, "rate": float(rate), "capacity": float(capacity)}
+            )).scalar()
+            await self._cleanup(conn)
+        return 0.0 if tokens >= 0 else -tokens / rate
+
+    async def refund(self, key: str, capacity: float) -> None:
+        async with async_engine.begin() as conn:
+            await conn.execute(self.REFUND_SQL, {"key": key, "capacity": float(capacity)})
+
+
+def create_shared_state(backend: str) -> MemoryState | PostgresState:
+    if backend == "memory":
+        return MemoryState()
+    if backend == "postgres":
+        return PostgresState()
+    raise ValueError(f"Unknown shared state backend: {backend}")
+
+
+shared_state = create_shared_state(settings.shared_state_backend)
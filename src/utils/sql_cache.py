@@ -0,0 +1,190 @@
+import os
+import re
+import time
+import sqlite3
+import logging
+from collections import OrderedDict
+from pathlib import Path
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+TOKEN_RE = re.compile(r"[\w\-]+")
+CYRILLIC_RE = re.compile(r"^[а-я]+$")
+
+# Longest endings first, so "ами" is stripped before "и"
+RUSSIAN_ENDINGS = sorted([
+    "иями", "ями", "ами", "ией", "ием", "иях", "ого", "его", "ому", "ему", "ыми", "ими",
+    "ая", "яя", "ое", "ее", "ые", "ие", "ый", "ий", "ой", "ей", "ую", "юю", "ов", "ев",
+    "ам", "ям", "ах", "ях", "ом", "ем", "ия", "ию", "ии", "ть", "ся", "сь",
+    "а", "я", "о", "е", "ы", "и", "у", "ю", "ь", "й",
+], key=len, reverse=True)
+
+MIN_STEM_LENGTH = 3
+
+
+def stem_russian(word: str) -> str:
+    for ending in RUSSIAN_ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM_LENGTH:
+            return word[:-len(ending)]
+    return word
+
+
+def normalize_question(question: str) -> str:
+    """Fold case, whitespace, punctuation and Russian word forms of a question.
+
+    Only Cyrillic words are folded. Latin and numeric tokens are kept as is,
+    because they are usually creator or video ids and those are case-sensitive.
+    """
+    tokens = []
+    for token in TOKEN_RE.findall(question):
+        token = token.strip("-_")
+        if not token:
+            continue
+        lowered = token.lower().replace("ё", "е")
+        if CYRILLIC_RE.match(lowered):
+            tokens.append(stem_russian(lowered))
+        else:
+            tokens.append(token)
+    return " ".join(tokens)
+
+
+class SqliteStore:
+    """On-disk store that keeps generated SQL across restarts.
+
+    The connection is opened on first use in each process: the webhook forks
+    its workers after importing this module, and a SQLite connection must not
+    be used across fork().
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = str(path)
+        self._connection: sqlite3.Connection | None = None
+        self._pid: int | None = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None or self._pid != os.getpid():
+            # an inherited connection is left alone, closing it could touch the parent's file locks
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._pid = os.getpid()
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS sql_cache (key TEXT PRIMARY KEY, sql TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._connection.commit()
+        return self._connection
+
+    def get(self, key: str) -> tuple[str, float] | None:
+        row = self.connection.execute("SELECT sql, created_at FROM sql_cache WHERE key = ?", (key,)).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def set(self, key: str, sql: str, created_at: float) -> None:
+        self.connection.execute(
+            "INSERT OR REPLACE INTO sql_cache (key, sql, created_at) VALUES (?, ?, ?)", (key, sql, created_at)
+        )
+        self.connection.commit()
+
+    def newest(self, limit: int) -> list[tuple[str, str, float]]:
+        rows = self.connection.execute(
+            "SELECT key, sql, created_at FROM sql_cache ORDER BY created_at DESC LIMIT ?", (limit,)
+        ).fetchall()
+        return [(row[0], row[1], row[2]) for row in rows]
+
+    def delete(self, key: str) -> None:
+        self.connection.execute("DELETE FROM sql_cache WHERE key = ?", (key,))
+        self.connection.commit()
+
+    def clear(self) -> None:
+        self.connection.execute("DELETE FROM sql_cache")
+        self.connection.commit()
+
+
+class SQLCache:
+    """LRU + TTL cache of generated SQL keyed by the normalized question.
+
+    An optional store is used as a second level: misses in memory are looked
+    up there, and every new entry is written through to it.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 86400, store: SqliteStore | None = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.store = store
+        self.entries: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _expired(self, created_at: float) -> bool:
+        return self.ttl > 0 and time.time() - created_at > self.ttl
+
+    def get(self, question: str) -> str | None:
+        key = normalize_question(question)
+        entry = self.entries.get(key)
+
+        if entry is None and self.store is not None:
+            entry = self.store.get(key)
+            if entry is not None:
+                self._remember(key, entry)
+
+        if entry is None or self._expired(entry[1]):
+            if entry is not None:
+                self.invalidate(question)
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, question: str, sql: str) -> None:
+        key = normalize_question(question)
+        created_at = time.time()
+        self._remember(key, (sql, created_at))
+        if self.store is not None:
+            self.store.set(key, sql, created_at)
+
+    def invalidate(self, question: str) -> None:
+        key = normalize_question(question)
+        self.entries.pop(key, None)
+        if self.store is not None:
+            self.store.delete(key)
+
+    def clear(self) -> None:
+        self.entries.clear()
+        if self.store is not None:
+            self.store.clear()
+
+    def preload(self) -> int:
+        """Load the newest unexpired entries of the store into memory."""
+        if self.store is None or self.max_size <= 0:
+            return 0
+        loaded = 0
+        for key, sql, created_at in reversed(self.store.newest(self.max_size)):
+            if not self._expired(created_at):
+                self._remember(key, (sql, created_at))
+                loaded += 1
+        return loaded
+
+    def _remember(self, key: str, entry: tuple[str, float]) -> None:
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+
+sql_cache = SQLCache(
+    max_size=settings.sql_cache_size,
+    ttl=settings.sql_cache_ttl,
+    store=SqliteStore(settings.sql_cache_path) if settings.sql_cache_path else None,
+)
@@ -0,0 +1,209 @@
+import re
+import time
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Iterator
+
+from sqlalchemy import text, TextClause
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.engine.result import Row
+
+from src.config import settings
+from src.utils.metrics import DB_PLAN_COST
+from src.utils.tables import TableResult, collect_result
+
+logger = logging.getLogger(__name__)
+
+# both settings are transaction-local and end with the request's transaction
+GUARD_SQL = text(
+    "SELECT set_config('transaction_read_only', 'on', true), "
+    "set_config('statement_timeout', :timeout, true)"
+)
+
+# a bind parameter outside string literals; `::` casts are not parameters
+BIND_RE = re.compile(r"'(?:[^']|'')*'|(?<![:\w]):(\w+)")
+
+# planner estimates by SQL text: with bound parameters one shape is one entry
+COST_CACHE_SIZE = 1024
+
+# SQLSTATE of a statement cancelled by statement_timeout
+QUERY_CANCELED = "57014"
+
+
+class QueryTooExpensive(ValueError):
+    def __init__(self, cost: float, limit: float):
+        super().__init__(f"Query is too expensive: estimated cost {cost:.0f} > {limit:.0f}")
+        self.cost = cost
+        self.limit = limit
+
+
+class QueryTimedOut(ValueError):
+    def __init__(self, timeout_ms: int):
+        super().__init__(f"Query ran longer than {timeout_ms} ms")
+        self.timeout_ms = timeout_ms
+
+
+@dataclass(frozen=True)
+class Limits:
+    """Budget of one query: planner cost (0 disables the check) and statement timeout."""
+    max_cost: float
+    timeout_ms: int
+
+
+def interactive_limits() -> Limits:
+    return Limits(settings.sql_max_cost, settings.sql_statement_timeout_ms)
+
+
+def job_limits() -> Limits:
+    return Limits(settings.job_max_cost, settings.job_statement_timeout_ms)
+
+
+def explain(sql: str) -> TextClause:
+    return text(f"EXPLAIN (FORMAT JSON) {sql}")
+
+
+_costs: OrderedDict[tuple[str, int | None], float] = OrderedDict()
+
+
+async def estimate_cost(
+    db: AsyncSession, sql: str, params: dict[str, Any] | None = None, data_version: int | None = None
+) -> float:
+    """Planner cost of `sql`, planned once per query shape and data version.
+
+    The estimate of a parameterized query barely depends on which id is
+    bound, so repeated shapes skip the EXPLAIN round trip and its planning.
+    """
+    key = (sql, data_version)
+    if key in _costs:
+        _costs.move_to_end(key)
+        return _costs[key]
+    result = await db.execute(explain(sql), params or {})
+    cost = float(result.scalar()[0]["Plan"]["Total Cost"])
+    _costs[key] = cost
+    while len(_costs) > COST_CACHE_SIZE:
+        _costs.popitem(last=False)
+    return cost
+
+
+async def _guard(
+    db: AsyncSession, sql: str, params: dict[str, Any] | None, data_version: int | None, limits: Limits
+) -> float:
+    await db.execute(GUARD_SQL, {"timeout": str(limits.timeout_ms)})
+
+    cost = await estimate_cost(db, sql, params, data_version)
+    DB_PLAN_COST.observe(cost)
+    if limits.max_cost and cost > limits.max_cost:
+        logger.warning(f"Rejected query with estimated cost {cost:.0f}: \n{sql}")
+        raise QueryTooExpensive(cost, limits.max_cost)
+    return cost
+
+
+@contextmanager
+def _timeouts(limits: Limits) -> Iterator[None]:
+    try:
+        yield
+    except Exception as e:
+        # a server-side cursor fetch raises the driver's error as is, without the DBAPIError wrapper
+        error = e.orig if isinstance(e, DBAPIError) else e
+        if getattr(error, "sqlstate", None) == QUERY_CANCELED:
+            raise QueryTimedOut(limits.timeout_ms) from e
+        raise
+
+
+async def execute_governed(
+    db: AsyncSession,
+    sql: str,
+    params: dict[str, Any] | None = None,
+    data_version: int | None = None,
+    limits: Limits | None = None,
+) -> Row | None:
+    """Run a generated SELECT and return its first row.
+
+    The query runs in a read-only transaction under `statement_timeout`, and
+    only if the planner's cost estimate fits into the cost limit. `limits`
+    default to the interactive ones, `SQL_MAX_COST` and `SQL_STATEMENT_TIMEOUT_MS`.
+    """
+    limits = limits or interactive_limits()
+    cost = await _guard(db, sql, params, data_version, limits)
+
+    started = time.perf_counter()
+    with _timeouts(limits):
+        result = await db.execute(text(sql), params or {})
+        row = result.fetchone()
+    elapsed = (time.perf_counter() - started) * 1000
+    logger.info(f"Query cost: estimated {cost:.0f}, actual {elapsed:.1f} ms")
+    return row
+
+
+async def fetch_governed(
+    db: AsyncSession,
+    sql: str,
+    params: dict[str, Any] | None = None,
+    data_version: int | None = None,
+    limits: Limits | None = None,
+) -> TableResult:
+    """Run a generated SELECT and read all of its rows, within the result limits.
+
+    Same guards as `execute_governed`. Rows come from a server-side cursor
+    `RESULT_CHUNK_ROWS` at a time, so memory is bounded by the chunk, not by
+    the result.
+    """
+    limits = limits or interactive_limits()
+    cost = await _guard(db, sql, params, data_version, limits)
+
+    started = time.perf_counter()
+    with _timeouts(limits):
+        result = await db.stream(text(sql).execution_options(yield_per=settings.result_chunk_rows), params or {})
+        table = await collect_result(result)
+    elapsed = (time.perf_counter() - started) * 1000
+    logger.info(f"Query cost: estimated {cost:.0f}, actual {elapsed:.1f} ms, {table.row_count} rows")
+    return table
+
+
+# rows of each query read by the combined SELECT: a second one means the answer is a table
+COMBINED_ROWS = 2
+
+
+def combine_queries(queries: list[tuple[str, dict[str, Any]]]) -> tuple[str, dict[str, Any]]:
+    """One SELECT with the first rows of every query as a column.
+
+    Each query gives an array of up to `COMBINED_ROWS` records, so queries
+    with any number of columns combine, and an empty result is NULL. Bind
+    parameters get a per-query prefix.
+    """
+    columns, combined_params = [], {}
+    for i, (sql, params) in enumerate(queries, 1):
+        prefix = f"q{i}_"
+        sql = BIND_RE.sub(lambda m: m[0] if m[1] is None else f":{prefix}{m[1]}", sql.strip().rstrip(";"))
+        columns.append(f"(SELECT array_agg(s.t) FROM (SELECT t FROM ({sql}) AS t LIMIT {COMBINED_ROWS}) AS s) AS q{i}")
+        combined_params.update({f"{prefix}{name}": value for name, value in (params or {}).items()})
+    return "SELECT " + ",\n       ".join(columns), combined_params
+
+
+async def execute_combined(
+    db: AsyncSession, queries: list[tuple[str, dict[str, Any]]], data_version: int | None = None
+) -> list[list[tuple]]:
+    """Run several generated SELECTs in one round trip and return up to `COMBINED_ROWS` rows of each.
+
+    Same guards as `execute_governed`; the cost budget is `SQL_MAX_COST` per query.
+    """
+    sql, params = combine_queries(queries)
+    limits = interactive_limits()
+    await db.execute(GUARD_SQL, {"timeout": str(limits.timeout_ms)})
+
+    cost = await estimate_cost(db, sql, params, data_version)
+    DB_PLAN_COST.observe(cost)
+    limit = limits.max_cost * len(queries)
+    if limits.max_cost and cost > limit:
+        logger.warning(f"Rejected combined query with estimated cost {cost:.0f}")
+        raise QueryTooExpensive(cost, limit)
+
+    started = time.perf_counter()
+    with _timeouts(limits):
+        row = (await db.execute(text(sql), params)).fetchone()
+    elapsed = (time.perf_counter() - started) * 1000
+    logger.info(f"Combined {len(queries)} queries: estimated cost {cost:.0f}, actual {elapsed:.1f} ms")
+    return [list(rows or []) for rows in row]
@@ -0,0 +1,74 @@
+import re
+import logging
+from functools import lru_cache
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+
+# Literals that vary between questions of the same shape. Dates and intervals
+# stay inline: their bind type would depend on the column, and asyncpg does
+# not coerce strings to timestamps. So do literals with a `::` cast, since
+# `:name::type` is not read as a bind parameter.
+ID_COLUMNS = r"(?:\w+\.)?(?P<id_column>id|creator_id|video_id)"
+COUNT_COLUMNS = r"(?:\w+\.)?(?P<count_column>(?:delta_)?(?:views|likes|comments|reports)_count)"
+STRING = r"'(?:[^']|'')*'"
+
+LITERAL_RE = re.compile(
+    # string literals anywhere else are skipped whole
+    rf"(?P<string>{STRING})"
+    rf"|\b{ID_COLUMNS}\s*(?P<id_op>=|<>|!=)\s*(?P<id_value>{STRING})(?!'|\s*::)"
+    rf"|\b(?:\w+\.)?(?P<in_column>id|creator_id|video_id)\s+IN\s*\((?P<in_values>\s*{STRING}(?:\s*,\s*{STRING})*\s*)\)"
+    rf"|\b{COUNT_COLUMNS}\s*(?P<count_op>>=|<=|<>|!=|=|>|<)\s*(?P<count_value>-?\d+)\b(?!\s*(?:\.|::))",
+    re.IGNORECASE,
+)
+STRING_RE = re.compile(STRING)
+
+# integer columns: larger literals would not fit the int4 parameter
+MAX_INT = 2**31 - 1
+
+
+def _unquote(literal: str) -> str:
+    return literal[1:-1].replace("''", "'")
+
+
+@lru_cache(maxsize=1024)
+def _lift(sql: str, taken: frozenset[str]) -> tuple[str, tuple[tuple[str, Any], ...]]:
+    lifted: dict[str, Any] = {}
+
+    def bind(column: str, value: Any) -> str:
+        column = column.lower()
+        name, n = column, 1
+        while name in taken or name in lifted:
+            n += 1
+            name = f"{column}_{n}"
+        lifted[name] = value
+        return f":{name}"
+
+    def replace(m: re.Match) -> str:
+        if m["id_column"]:
+            return f"{m[0][:m.start('id_value') - m.start()]}{bind(m['id_column'], _unquote(m['id_value']))}"
+        if m["in_column"]:
+            values = ", ".join(bind(m["in_column"], _unquote(v)) for v in STRING_RE.findall(m["in_values"]))
+            return f"{m[0][:m.start('in_values') - m.start()]}{values})"
+        if m["count_column"] and abs(int(m["count_value"])) <= MAX_INT:
+            return f"{m[0][:m.start('count_value') - m.start()]}{bind(m['count_column'], int(m['count_value']))}"
+        return m[0]
+
+    return LITERAL_RE.sub(replace, sql), tuple(lifted.items())
+
+
+def parameterize(sql: str, params: dict[str, Any] | None = None) -> tuple[str, dict[str, Any]]:
+    """Lift id and counter literals out of generated SQL into bind parameters.
+
+    `WHERE creator_id = 'abc'` becomes `WHERE creator_id = :creator_id` with
+    `{"creator_id": "abc"}`, so questions of one shape share the SQL text:
+    one prepared statement per connection, one generic plan, one cache key
+    per shape. Existing `params` are kept and never shadowed.
+    """
+    params = dict(params or {})
+    template, lifted = _lift(sql, frozenset(params))
+    if lifted:
+        logger.debug(f"Lifted {len(lifted)} literals into bind parameters")
+    params.update(lifted)
+    return template, params
@@ -0,0 +1,190 @@
+import time
+import asyncio
+import logging
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+from aiogram import Bot
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from src.config import settings
+from src.database.db import async_engine, read_engines, get_async_read_session, get_data_version
+from src.utils.intents import intent_matcher
+from src.utils.llm_gateway import llm_gateway
+from src.utils.metrics import STARTUP_SECONDS, READY
+from src.utils.query_executor import prepare_sql, run_sql
+from src.utils.sql_cache import sql_cache
+from src.utils.sql_governor import GUARD_SQL, explain
+
+logger = logging.getLogger(__name__)
+
+
+# the examples of /start and /help; the ids only fill bind parameters,
+# so real ids reuse the prepared statements and cached plan costs
+WARMUP_QUESTIONS = [
+    "Сколько всего видео?",
+    "Сколько просмотров у всех видео?",
+    "Среднее количество лайков?",
+    "Какой прирост просмотров за последний час?",
+    "Какой прирост лайков за последний час?",
+    "Сколько новых лайков за сегодня?",
+    "Сколько видео у креатора с id abc123?",
+    "Сколько просмотров у креатора abc123?",
+    "Сколько комментариев у креатора с id abc123?",
+]
+
+# newest SQL cache entries that are planned on every connection too
+WARMUP_CACHED_QUERIES = 50
+
+
+class Startup:
+    """Phases of a process start: import, init, warm_up and first_answer.
+
+    Durations are logged and exported as `bot_startup_seconds`. The process
+    reports ready (`/ready`, `bot_ready`) only once `set_ready` is called.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.ready = False
+        self.first_answer: float | None = None
+
+    def begin(self, started: float) -> None:
+        """Count from `started`, taken before the heavy imports."""
+        self.started = started
+        self._record("import", time.perf_counter() - started)
+
+    def _record(self, phase: str, seconds: float) -> None:
+        STARTUP_SECONDS.labels(phase).set(seconds)
+        logger.info(f"Startup phase {phase}: {seconds:.2f}s")
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._record(name, time.perf_counter() - started)
+
+    def set_ready(self) -> None:
+        self.ready = True
+        READY.set(1)
+        logger.info(f"Ready {time.perf_counter() - self.started:.2f}s after start")
+
+    def is_ready(self) -> bool:
+        return self.ready
+
+    def answered(self) -> None:
+        """Record the time to the first answer of the process."""
+        if self.first_answer is None:
+            self.first_answer = time.perf_counter() - self.started
+            self._record("first_answer", self.first_answer)
+
+
+startup = Startup()
+
+
+def _intent_queries() -> list[tuple[str, dict[str, Any]]]:
+    queries = []
+    for question in WARMUP_QUESTIONS:
+        intent = intent_matcher.parse(question)
+        if intent is not None:
+            queries.append((intent.sql, intent.params))
+    return queries
+
+
+def _cached_queries() -> list[tuple[str, dict[str, Any]]]:
+    cached = [sql for sql, _ in reversed(sql_cache.entries.values())]
+    return [(sql, {}) for sql in cached[:WARMUP_CACHED_QUERIES]]
+
+
+def _statements(queries: list[tuple[str, dict[str, Any]]]) -> list[tuple[str, dict[str, Any]]]:
+    statements = []
+    for sql, params in queries:
+        try:
+            final_sql, _, params = prepare_sql(sql, params)
+        except ValueError:
+            continue
+        if (final_sql, params) not in statements:
+            statements.append((final_sql, params))
+    return statements
+
+
+async def _prepare(conn: AsyncConnection, statements: list[tuple[str, dict[str, Any]]]) -> None:
+    """Prepare the per-request statements and load the catalogs of the queried tables into the backend.
+
+    A request plans its SQL and then runs it, so both statements are run here,
+    in a read-only transaction (GUARD_SQL) that is rolled back.
+    """
+    transaction = await conn.begin()
+    try:
+        await conn.execute(GUARD_SQL, {"timeout": str(settings.sql_statement_timeout_ms)})
+        await get_data_version(conn)
+        for sql, params in statements:
+            try:
+                async with conn.begin_nested():
+                    await conn.execute(explain(sql), params)
+                    await conn.execute(text(sql), params)
+            except Exception as e:
+                logger.debug(f"Could not prepare a warm-up query: {e}")
+    finally:
+        await transaction.rollback()
+
+
+async def warm_pool(engine: AsyncEngine, statements: list[tuple[str, dict[str, Any]]], connections: int) -> None:
+    """Open `connections` pool connections at once and prepare the statements on each."""
+    conns = [engine.connect() for _ in range(connections)]
+    try:
+        await asyncio.gather(*(conn.start() for conn in conns))
+        await asyncio.gather(*(_prepare(conn, statements) for conn in conns))
+    finally:
+        await asyncio.gather(*(conn.close() for conn in conns), return_exceptions=True)
+
+
+async def warm_caches(queries: list[tuple[str, dict[str, Any]]]) -> None:
+    """Run the warm-up questions once: plan costs, results and the columnar store are loaded."""
+    if settings.columnar_cache:
+        from src.utils.columnar import columnar_store
+
+        await columnar_store.wait()
+    async with get_async_read_session() as db:
+        for sql, params in queries:
+            try:
+                async with db.begin_nested():
+                    await run_sql(db, sql, params)
+            except Exception as e:
+                logger.debug(f"Warm-up query failed: {e}")
+
+
+async def warm_up(bot: Bot) -> None:
+    """Get everything the first questions need before taking updates.
+
+    Every step is best effort and the whole warm-up gives up after
+    STARTUP_WARMUP_TIMEOUT seconds: a cold start is slower, not broken.
+    """
+    loaded = sql_cache.preload()
+    queries = _intent_queries()
+    statements = _statements(queries + _cached_queries())
+    connections = min(settings.db_pool_size, settings.max_concurrent_db)
+    engines = list(dict.fromkeys([*read_engines, async_engine]))
+    steps = {
+        **{f"pool {e.url.host}:{e.url.port}": warm_pool(e, statements, connections) for e in engines},
+        "caches": warm_caches(queries),
+        "llm": llm_gateway.warm_up(),
+        "telegram": bot.get_me(),
+    }
+    try:
+        results = await asyncio.wait_for(
+            asyncio.gather(*steps.values(), return_exceptions=True), settings.startup_warmup_timeout
+        )
+    except asyncio.TimeoutError:
+        logger.warning(f"Warm-up did not finish in {settings.startup_warmup_timeout}s, starting anyway")
+        return
+    for name, result in zip(steps, results):
+        if isinstance(result, Exception):
+            logger.warning(f"Warm-up step {name} failed: {result}")
+    logger.info(
+        f"Warmed up {connections} connections on {len(engines)} engines with {len(statements)} statements, "
+        f"{loaded} cached SQL queries loaded"
+    )
@@ -0,0 +1,180 @@
+import io
+import os
+import csv
+import html
+import logging
+import tempfile
+import weakref
+from dataclasses import dataclass, field
+from typing import Any, Iterable
+
+from sqlalchemy.ext.asyncio import AsyncResult
+
+from src.config import settings
+from src.utils.metrics import DB_ROWS_RETURNED
+
+logger = logging.getLogger(__name__)
+
+
+# Telegram rejects longer messages
+MAX_MESSAGE_CHARS = 4096
+# longer cells are shortened in messages, the CSV keeps them whole
+MAX_CELL_CHARS = 60
+
+
+def _remove(path: str) -> None:
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+@dataclass
+class TableResult:
+    """Rows of a multi-row answer.
+
+    Small tables keep their rows in memory. Large ones are written to a CSV
+    file while they are read, and `rows` stays empty; the file is deleted
+    once the result is no longer referenced.
+    """
+    columns: list[str]
+    rows: list[tuple] = field(default_factory=list)
+    row_count: int = 0
+    # the row or byte limit cut the result
+    truncated: bool = False
+    path: str | None = None
+
+    @property
+    def is_scalar(self) -> bool:
+        return self.path is None and len(self.columns) == 1 and self.row_count <= 1
+
+
+class TableCollector:
+    """Builds a `TableResult` from chunks of rows with bounded memory.
+
+    Up to `inline_rows` rows are kept in memory. Past that they are spilled to
+    a CSV file, so at most one chunk is held at a time. Reading stops at
+    `max_rows` rows or `max_bytes` of CSV.
+    """
+
+    def __init__(self, columns: list[str], inline_rows: int, max_rows: int, max_bytes: int):
+        self.table = TableResult(columns=columns)
+        self.inline_rows = inline_rows
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.file = None
+        self.bytes = 0
+        self.line = io.StringIO()
+        self.writer = csv.writer(self.line)
+
+    @property
+    def done(self) -> bool:
+        return self.table.truncated
+
+    def _encode(self, row: Iterable) -> bytes:
+        self.line.seek(0)
+        self.line.truncate()
+        self.writer.writerow(["" if value is None else value for value in row])
+        return self.line.getvalue().encode("utf-8")
+
+    def _write(self, row: Iterable) -> bool:
+        data = self._encode(row)
+        if self.bytes + len(data) > self.max_bytes:
+            return False
+        self.file.write(data)
+        self.bytes += len(data)
+        return True
+
+    def _spill(self) -> None:
+        fd, path = tempfile.mkstemp(prefix="answer_", suffix=".csv")
+        self.file = os.fdopen(fd, "wb")
+        self.table.path = path
+        weakref.finalize(self.table, _remove, path)
+        # BOM: Excel opens UTF-8 CSV with Cyrillic correctly only with it
+        self.file.write(b"\xef\xbb\xbf")
+        self._write(self.table.columns)
+        written = 0
+        for row in self.table.rows:
+            if not self._write(row):
+                self.table.truncated = True
+                break
+            written += 1
+        self.table.rows = []
+        self.table.row_count = written
+
+    def add(self, rows: Iterable) -> None:
+        for row in rows:
+            if self.table.row_count >= self.max_rows:
+                self.table.truncated = True
+                return
+            if self.file is None and self.table.row_count >= self.inline_rows:
+                self._spill()
+                if self.done:
+                    return
+            if self.file is None:
+                self.table.rows.append(tuple(row))
+            elif not self._write(row):
+                self.table.truncated = True
+                return
+            self.table.row_count += 1
+
+    def finish(self) -> TableResult:
+        if self.file is not None:
+            self.file.close()
+        if self.table.truncated:
+            logger.warning(
+                f"Result cut at {self.table.row_count} rows "
+                f"(limits: {self.max_rows} rows, {self.max_bytes} bytes)"
+            )
+        return self.table
+
+
+def collector(columns: list[str]) -> TableCollector:
+    return TableCollector(
+        columns,
+        inline_rows=settings.result_inline_rows,
+        max_rows=settings.result_max_rows,
+        max_bytes=settings.result_max_bytes,
+    )
+
+
+async def collect_result(result: AsyncResult) -> TableResult:
+    """Read a streamed result chunk by chunk into a `TableResult`."""
+    rows = collector(list(result.keys()))
+    try:
+        async for chunk in result.partitions():
+            DB_ROWS_RETURNED.inc(len(chunk))
+            rows.add(chunk)
+            if rows.done:
+                break
+    finally:
+        await result.close()
+    return rows.finish()
+
+
+def _cell(value: Any) -> str:
+    text = "" if value is None else str(value)
+    return text if len(text) <= MAX_CELL_CHARS else text[:MAX_CELL_CHARS - 1] + "…"
+
+
+def render_table(table: TableResult, max_chars: int = MAX_MESSAGE_CHARS) -> list[str]:
+    """The inline rows as aligned monospace text, split into HTML messages of at most `max_chars`."""
+    cells = [[_cell(c) for c in table.columns]] + [[_cell(v) for v in row] for row in table.rows]
+    widths = [max(len(row[i]) for row in cells) for i in range(len(table.columns))]
+    lines = ["  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip() for row in cells]
+    lines.insert(1, "  ".join("-" * width for width in widths))
+
+    frame = len("<pre></pre>")
+    # escaping makes a character at most 5 long ("&amp;"), so any cut line fits one message
+    max_line = (max_chars - frame) // 5
+    messages, current, size = [], [], frame
+    for line in lines:
+        line = html.escape(line if len(line) <= max_line else line[:max_line - 1] + "…", quote=False)
+        if current and size + len(line) + 1 > max_chars:
+            messages.append("<pre>" + "\n".join(current) + "</pre>")
+            current, size = [], frame
+        current.append(line)
+        size += len(line) + 1
+    if current:
+        messages.append("<pre>" + "\n".join(current) + "</pre>")
+    return messages
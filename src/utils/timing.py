@@ -0,0 +1,48 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
+from src.utils.metrics import STAGE_SECONDS, ERRORS
+
+
+class Handoff(Exception):
+    """Hands a request over instead of answering it, e.g. to a background job; not an error."""
+
+
+_stages: ContextVar[dict[str, float] | None] = ContextVar("stages", default=None)
+
+
+@contextmanager
+def collect_stages() -> Iterator[dict[str, float]]:
+    """Collect the durations of all `stage` blocks run inside this block."""
+    stages: dict[str, float] = {}
+    token = _stages.set(stages)
+    try:
+        yield stages
+    finally:
+        _stages.reset(token)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a stage of request processing, in seconds.
+
+    The duration goes to the `bot_stage_duration_seconds` histogram and, inside
+    `collect_stages`, to the collected dict. Exceptions are counted by class,
+    except a `Handoff`.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    except Handoff:
+        raise
+    except Exception as e:
+        ERRORS.labels(name, type(e).__name__).inc()
+        raise
+    finally:
+        duration = time.perf_counter() - started
+        STAGE_SECONDS.labels(name).observe(duration)
+        stages = _stages.get()
+        if stages is not None:
+            stages[name] = stages.get(name, 0.0) + duration
@@ -0,0 +1,133 @@
+import os
+import json
+import asyncio
+
+import pytest
+
+# the tests truncate and load tables, so they get a database of their own;
+# set before src is imported, because settings and engines are read at import
+os.environ.setdefault("BOT_TOKEN", "123:test")
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ["DB_NAME"] = os.environ.get("TEST_DB_NAME", "rlt_test_bot_tests")
+os.environ["DB_PRIMARY_URL"] = ""
+os.environ["DB_REPLICA_URLS"] = ""
+os.environ["SQL_CACHE_PATH"] = ""
+os.environ["FEW_SHOT_LOG_PATH"] = ""
+
+TABLES = [
+    "videos", "video_snapshots", "video_snapshots_hourly", "video_snapshots_daily",
+    "data_version", "ingestion_watermark",
+]
+
+
+@pytest.fixture(scope="session")
+def database():
+    """The test database with the schema, created on first use; skips without PostgreSQL."""
+    import psycopg2
+    from src.config import settings
+
+    try:
+        connection = psycopg2.connect(
+            host=settings.db_host, port=settings.db_port, user=settings.db_user,
+            password=settings.db_password, dbname="postgres",
+        )
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"PostgreSQL is not available: {e}")
+    connection.autocommit = True
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_database WHERE datname = %s", (settings.db_name,))
+        if cursor.fetchone() is None:
+            cursor.execute(f'CREATE DATABASE "{settings.db_name}"')
+    connection.close()
+
+    from src.database.db import init_db
+
+    init_db()
+    return settings.db_name
+
+
+@pytest.fixture
+def clean_db(database):
+    from sqlalchemy import text
+    from src.database.db import get_db_session
+    from src.utils.result_cache import result_cache
+    from src.utils.sql_governor import _costs
+
+    with get_db_session() as db:
+        db.execute(text(f"TRUNCATE {', '.join(TABLES)} CASCADE"))
+    result_cache.clear()
+    _costs.clear()
+    yield database
+
+
+def make_export(count: int) -> dict:
+    """An export of `count` videos of one creator, one snapshot each; video i has 10 * i views."""
+    videos = []
+    for i in range(count):
+        counters = {"views_count": 10 * i, "likes_count": i, "comments_count": 0, "reports_count": 0}
+        videos.append({
+            "id": f"video-{i}",
+            "creator_id": "creator-1",
+            "video_created_at": "2025-11-01T10:00:00+00:00",
+            **counters,
+            "snapshots": [{
+                "id": f"snapshot-{i}",
+                "created_at": "2025-11-01T11:00:00+00:00",
+                **counters,
+                **{f"delta_{name}": value for name, value in counters.items()},
+            }],
+        })
+    return {"videos": videos}
+
+
+@pytest.fixture
+def export_path(tmp_path):
+    path = tmp_path / "export.json"
+    path.write_text(json.dumps(make_export(3)), encoding="utf-8")
+    return path
+
+
+@pytest.fixture
+def loaded_db(clean_db, export_path):
+    from scripts.loader import stream_load_json_to_db
+
+    stream_load_json_to_db(export_path)
+    return clean_db
+
+
+@pytest.fixture
+def run():
+    """Run a coroutine in a fresh event loop; pooled asyncpg connections do not outlive it."""
+    from src.database.db import close_db
+
+    def run(coro):
+        async def main():
+            try:
+                return await coro
+            finally:
+                await close_db()
+
+        return asyncio.run(main())
+
+    return run
+
+
+@pytest.fixture
+def stub_llm(monkeypatch):
+    """An LLM that takes `delay` seconds and answers with the SQL in `sql` for the question."""
+    from types import SimpleNamespace
+    from src.config import settings
+    from src.utils import query_executor
+    from src.utils.sql_cache import sql_cache
+
+    llm = SimpleNamespace(sql={}, delay=0.0, calls=[])
+
+    async def generate_sql_query(user_query, rejected=None):
+        llm.calls.append(user_query)
+        await asyncio.sleep(llm.delay)
+        return llm.sql[user_query]
+
+    monkeypatch.setattr(settings, "intent_fast_path", False)
+    monkeypatch.setattr(query_executor, "generate_sql_query", generate_sql_query)
+    yield llm
+    sql_cache.entries.clear()
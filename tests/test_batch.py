@@ -0,0 +1,83 @@
+import pytest
+
+from src.config import settings
+from src.utils.batch import answer_batch, split_questions
+from src.utils.sql_cache import sql_cache
+from src.utils.tables import TableResult
+
+
+@pytest.mark.parametrize("message", [
+    "Сколько просмотров у креатора abc123 за период с 1 по 5 ноября? Ответь числом.",
+    "Сколько просмотров у креатора abc123 за период с 1 по 5 ноября?\nОтветь числом.",
+    "Сколько видео? Сколько лайков?",
+    "Какой прирост просмотров\nза последний час?",
+])
+def test_one_question_stays_whole(message):
+    assert split_questions(message) == [" ".join(message.split())]
+
+
+def test_lines_ending_with_question_marks_split():
+    assert split_questions("Сколько видео?\nСколько лайков?") == ["Сколько видео?", "Сколько лайков?"]
+
+
+def test_trailing_fragment_stays_with_its_question():
+    message = "Сколько видео у креатора abc123?\nТолько за ноябрь.\nСколько лайков у него?\nОтветь числом."
+    assert split_questions(message) == [
+        "Сколько видео у креатора abc123? Только за ноябрь. Сколько лайков у него? Ответь числом.",
+    ]
+    message = "Сколько видео?\nСколько лайков?\nОтветь числом."
+    assert split_questions(message) == ["Сколько видео?", "Сколько лайков? Ответь числом."]
+
+
+def test_list_items_split_and_share_the_preamble():
+    message = "По креатору abc123:\n1. Сколько видео\n   за ноябрь?\n2) Сколько лайков?\nОтветь числом."
+    assert split_questions(message) == [
+        "По креатору abc123: Сколько видео за ноябрь?",
+        "По креатору abc123: Сколько лайков? Ответь числом.",
+    ]
+
+
+@pytest.fixture
+def cached_sql(monkeypatch):
+    """Answer questions from cached SQL only: no intents, no LLM."""
+    monkeypatch.setattr(settings, "intent_fast_path", False)
+
+    def cache(questions: dict[str, str]) -> list[str]:
+        for question, sql in questions.items():
+            sql_cache.set(question, sql)
+        return list(questions)
+
+    yield cache
+    sql_cache.entries.clear()
+
+
+def test_tables_in_a_batch_are_read_in_full(loaded_db, run, cached_sql):
+    questions = cached_sql({
+        "Сколько всего видео?": "SELECT COUNT(*) FROM videos;",
+        "Просмотры по видео?": "SELECT id, views_count FROM videos ORDER BY id;",
+        "Какие видео есть?": "SELECT id FROM videos ORDER BY id;",
+        "Сколько просмотров у самого популярного видео?": "SELECT MAX(views_count) FROM videos;",
+    })
+
+    results = run(answer_batch(questions))
+
+    assert results[0] == 3
+    assert isinstance(results[1], TableResult)
+    assert results[1].columns == ["id", "views_count"]
+    assert results[1].rows == [("video-0", 0), ("video-1", 10), ("video-2", 20)]
+    assert isinstance(results[2], TableResult)
+    assert results[2].row_count == 3
+    assert results[3] == 20
+
+
+def test_one_row_of_several_columns_is_a_table(loaded_db, run, cached_sql):
+    questions = cached_sql({
+        "Сколько всего видео?": "SELECT COUNT(*) FROM videos;",
+        "Минимум и максимум просмотров?": "SELECT MIN(views_count), MAX(views_count) FROM videos;",
+    })
+
+    results = run(answer_batch(questions))
+
+    assert results[0] == 3
+    assert isinstance(results[1], TableResult)
+    assert results[1].rows == [(0, 20)]
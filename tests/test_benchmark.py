@@ -0,0 +1,41 @@
+import sys
+import asyncio
+
+import pytest
+
+from benchmarks import run as benchmark
+
+
+def test_answers_are_compared_exactly_but_for_float_noise():
+    assert benchmark.same_answer(1.0000000001, 1)
+    assert benchmark.same_answer("abc", "abc")
+    assert not benchmark.same_answer(None, 0)
+    assert not benchmark.same_answer(0, None)
+    assert not benchmark.same_answer(2, 1)
+
+
+@pytest.mark.parametrize("options", [[], ["--no-cache", "--no-intents"], ["--batch", "3"]])
+def test_benchmark_answers_every_question_right(clean_db, tmp_path, monkeypatch, options):
+    from scripts.loader import stream_load_json_to_db
+    from scripts.synthetic import write_json
+    from src.config import settings
+    from src.utils.llm_gateway import llm_gateway
+    from src.utils.sql_cache import sql_cache
+    from src.utils.result_cache import result_cache
+
+    path = tmp_path / "synthetic.json"
+    write_json(path, n_videos=40, snapshots_per_video=6, n_creators=4, seed=8)
+    stream_load_json_to_db(path)
+    # the run swaps these for its own; put them back afterwards
+    monkeypatch.setattr(settings, "intent_fast_path", settings.intent_fast_path)
+    monkeypatch.setattr(llm_gateway, "_client", llm_gateway._client)
+    monkeypatch.setattr(sql_cache, "max_size", sql_cache.max_size)
+    monkeypatch.setattr(result_cache, "max_size", result_cache.max_size)
+    monkeypatch.setattr(sys, "argv", ["run.py", "--requests", "60", "--llm-latency", "0", "--llm-jitter", "0", *options])
+
+    report = asyncio.run(benchmark.run(benchmark.parse_args()))
+    sql_cache.clear()
+
+    assert report["requests"] == 60
+    assert report["llm_calls"] > 0
+    assert (report["errors"], report["wrong_answers"]) == (0, 0)
@@ -0,0 +1,187 @@
+import json
+import random
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import text
+
+from scripts import loader
+from tests.conftest import TABLES
+from src.utils.columnar import ColumnarStore
+
+
+@pytest.mark.parametrize("load", [loader.stream_load_json_to_db, loader.incremental_load_json_to_db])
+def test_refresh_between_batches_of_one_load(clean_db, export_path, monkeypatch, load):
+    # one load: every batch is prepared with the same Python-side time, but commits on its own
+    store = ColumnarStore()
+    iter_videos = loader.iter_videos
+
+    def refresh_between_batches(json_path):
+        for i, video in enumerate(iter_videos(json_path)):
+            if i == 1:
+                # the first batch is committed, the others are not yet
+                assert len(store.refresh().video_ids) == 1
+            yield video
+
+    monkeypatch.setattr(loader, "iter_videos", refresh_between_batches)
+    load(export_path, batch_size=2)
+
+    data = store.refresh()
+    assert sorted(data.video_ids) == ["video-0", "video-1", "video-2"]
+    assert data.snapshots == 3
+    assert int(data.snapshot_metrics["delta_views_count"].sum()) == 30
+
+
+# ---------------------------------------------------------------- answers compared with PostgreSQL
+
+# UTC midnight, Moscow midnight, New York midnight before and after the DST change of 2025-11-02
+BOUNDARIES = ["2025-11-01T00:00:00+00:00", "2025-10-31T21:00:00+00:00", "2025-11-01T04:00:00+00:00",
+              "2025-11-03T05:00:00+00:00"]
+
+
+def comparison_export(now: datetime) -> dict:
+    """Videos of four creators, snapshots around the boundaries and in the last days."""
+    rng = random.Random(7)
+    videos = []
+    for i in range(12):
+        times = BOUNDARIES[i % 2::2] + [
+            "2025-10-30T00:00:00+00:00",
+            *(datetime(2025, 10, 30, tzinfo=timezone.utc) + timedelta(minutes=rng.randrange(6 * 24 * 60))
+              for _ in range(8)),
+            *(now - timedelta(minutes=rng.randrange(3 * 24 * 60)) for _ in range(8)),
+        ]
+        snapshots, totals = [], dict.fromkeys(["views_count", "likes_count", "comments_count", "reports_count"], 0)
+        for j, moment in enumerate(sorted(t if isinstance(t, datetime) else datetime.fromisoformat(t) for t in times)):
+            deltas = {name: rng.randrange(-50, 100_000) for name in totals}
+            totals = {name: totals[name] + deltas[name] for name in totals}
+            snapshots.append({
+                "id": f"snapshot-{i}-{j}", "created_at": moment.isoformat(),
+                **totals, **{f"delta_{name}": value for name, value in deltas.items()},
+            })
+        created = now - timedelta(hours=rng.randrange(24 * 10)) if i % 3 else datetime.fromisoformat(BOUNDARIES[i % 4])
+        videos.append({
+            "id": f"video-{i}", "creator_id": f"creator-{i % 4}",
+            "video_created_at": created.isoformat(), **totals, "snapshots": snapshots,
+        })
+    return {"videos": videos}
+
+
+COMPARED = [
+    ("SELECT COUNT(*) FROM videos", {}),
+    ("SELECT SUM(views_count) FROM videos WHERE likes_count > 300000", {}),
+    ("SELECT AVG(delta_likes_count) FROM video_snapshots WHERE delta_likes_count >= 0", {}),
+    ("SELECT MIN(created_at) FROM video_snapshots WHERE delta_views_count < 1000", {}),
+    ("SELECT MAX(video_created_at) FROM videos WHERE views_count <= :views", {"views": 1000000}),
+    ("SELECT COUNT(DISTINCT video_id) FROM video_snapshots WHERE delta_views_count > 90000", {}),
+    ("SELECT SUM(delta_views_count) FROM video_snapshots WHERE created_at >= NOW() - INTERVAL '1 day'", {}),
+    ("SELECT SUM(delta_views_count) FROM video_snapshots WHERE created_at >= NOW() - INTERVAL '36 hours' "
+     "AND created_at < NOW() - INTERVAL '90 minutes'", {}),
+    ("SELECT COUNT(*) FROM videos WHERE video_created_at >= CURRENT_DATE - INTERVAL '3 days'", {}),
+    ("SELECT SUM(delta_likes_count) FROM video_snapshots WHERE created_at >= CURRENT_DATE", {}),
+    ("SELECT COUNT(*) FROM videos WHERE video_created_at >= NOW() - INTERVAL '1 week'", {}),
+    # boundaries: the same instants read as timestamptz, timestamp or date in the session time zone
+    ("SELECT COUNT(*) FROM video_snapshots WHERE created_at >= '2025-11-01'", {}),
+    ("SELECT COUNT(*) FROM video_snapshots WHERE created_at >= '2025-11-01 00:00:00+00'", {}),
+    ("SELECT COUNT(*) FROM video_snapshots WHERE created_at < '2025-11-01 00:00:00+03'::timestamptz", {}),
+    ("SELECT COUNT(*) FROM video_snapshots WHERE created_at >= '2025-11-01 00:00:00+03'::timestamp", {}),
+    ("SELECT COUNT(*) FROM video_snapshots WHERE created_at >= DATE '2025-11-01' "
+     "AND created_at < DATE '2025-11-01' + INTERVAL '1 day'", {}),
+    ("SELECT COUNT(*) FROM video_snapshots WHERE created_at >= '2025-11-01'::date "
+     "AND created_at <= '2025-11-01'::date + INTERVAL '2 days'", {}),
+    ("SELECT COUNT(*) FROM video_snapshots WHERE created_at > TIMESTAMPTZ '2025-10-31 21:00:00+00' "
+     "AND created_at <= TIMESTAMP '2025-11-02 00:00:00' + INTERVAL '1 day'", {}),
+    ("SELECT SUM(delta_views_count) FROM video_snapshots WHERE created_at >= TIMESTAMPTZ '2025-11-01 04:00:00+00' "
+     "+ INTERVAL '1 day' AND created_at < TIMESTAMPTZ '2025-11-01 04:00:00+00' + INTERVAL '48 hours'", {}),
+    ("SELECT COUNT(*) FROM video_snapshots WHERE created_at >= DATE '2025-12-01' - INTERVAL '1 month'", {}),
+    ("SELECT COUNT(*) FROM video_snapshots WHERE created_at >= :day AND created_at < :until",
+     {"day": date(2025, 11, 1), "until": datetime(2025, 11, 3)}),
+    ("SELECT COUNT(*) FROM video_snapshots WHERE created_at < :moment",
+     {"moment": datetime(2025, 11, 1, 4, tzinfo=timezone.utc)}),
+    # joins and creator filters
+    ("SELECT SUM(s.delta_views_count) FROM video_snapshots s JOIN videos v ON v.id = s.video_id "
+     "WHERE v.creator_id = 'creator-2'", {}),
+    ("SELECT COUNT(*) FROM video_snapshots AS s INNER JOIN videos AS v ON s.video_id = v.id "
+     "WHERE v.video_created_at >= NOW() - INTERVAL '5 days' AND s.created_at >= '2025-11-01'", {}),
+    ("SELECT SUM(delta_likes_count) FROM video_snapshots "
+     "WHERE video_id IN (SELECT id FROM videos WHERE creator_id = :creator_id)", {"creator_id": "creator-3"}),
+    ("SELECT COUNT(*) FROM video_snapshots WHERE video_id IN ('video-1', 'video-4', 'missing')", {}),
+    ("SELECT SUM(views_count) FROM videos WHERE creator_id IN ('creator-1', :other)", {"other": "creator-3"}),
+    ("SELECT views_count FROM videos WHERE id = 'video-5'", {}),
+    ("SELECT likes_count, creator_id FROM videos WHERE id = :video_id", {"video_id": "video-3"}),
+    # grouping, ordering and limits
+    ("SELECT creator_id, SUM(views_count) FROM videos GROUP BY creator_id", {}),
+    ("SELECT video_id, SUM(delta_views_count) AS total FROM video_snapshots GROUP BY video_id "
+     "ORDER BY total DESC LIMIT 3", {}),
+    ("SELECT v.creator_id, SUM(s.delta_likes_count) FROM video_snapshots s JOIN videos v ON v.id = s.video_id "
+     "WHERE s.created_at >= NOW() - INTERVAL '2 days' GROUP BY v.creator_id ORDER BY 2", {}),
+    ("SELECT id, MAX(likes_count) FROM videos GROUP BY id ORDER BY MAX(likes_count) DESC LIMIT 5", {}),
+    ("SELECT creator_id, AVG(views_count) FROM videos WHERE creator_id <> 'creator-1' GROUP BY creator_id", {}),
+    # the videos without a creator
+    ("SELECT COUNT(creator_id) FROM videos", {}),
+    ("SELECT COUNT(DISTINCT creator_id) FROM videos", {}),
+    ("SELECT COUNT(*) FROM videos WHERE creator_id <> 'creator-2'", {}),
+    ("SELECT COUNT(*) FROM video_snapshots s JOIN videos v ON v.id = s.video_id WHERE v.creator_id != :creator_id",
+     {"creator_id": "creator-1"}),
+    ("SELECT creator_id, COUNT(*) FROM videos GROUP BY creator_id", {}),
+]
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT COUNT(*) FROM video_snapshots WHERE created_at >= '2025-11-01' - INTERVAL '1 month'",
+    "SELECT COUNT(*) FROM videos WHERE video_created_at < '2025-11-01 00:00:00+03' + INTERVAL '1 day'",
+])
+def test_untyped_literal_with_an_interval_goes_to_sql(sql):
+    # Postgres takes the literal for an interval and rejects the query
+    from src.utils.columnar import compile_query
+
+    assert compile_query(sql) is None
+
+
+def comparable(rows, ordered: bool) -> list[tuple]:
+    rows = [
+        tuple(round(float(value), 6) if isinstance(value, (Decimal, float)) else value for value in row)
+        for row in rows
+    ]
+    return rows if ordered else sorted(rows, key=repr)
+
+
+@pytest.mark.parametrize("zone", ["UTC", "Europe/Moscow", "America/New_York"])
+def test_answers_match_postgres(clean_db, tmp_path, zone):
+    from src.database.db import engine
+    from src.utils.columnar import compile_query, evaluate, load_columnar
+
+    path = tmp_path / "export.json"
+    path.write_text(json.dumps(comparison_export(datetime.now(timezone.utc))), encoding="utf-8")
+    loader.stream_load_json_to_db(path)
+
+    connection = engine.connect()
+    try:
+        # the schema has creator_id NOT NULL, older databases do not
+        connection.exec_driver_sql("ALTER TABLE videos ALTER COLUMN creator_id DROP NOT NULL")
+        connection.exec_driver_sql("UPDATE videos SET creator_id = NULL WHERE creator_id = 'creator-0'")
+        # the time zone is set for the session only, which is thrown away afterwards
+        connection.exec_driver_sql(f"SET TIME ZONE '{zone}'")
+        connection.commit()
+        data = load_columnar(connection.connection.dbapi_connection)
+        assert data.time_zone == zone
+        mismatches = []
+        for sql, params in COMPARED:
+            plan = compile_query(sql)
+            assert plan is not None, sql
+            now = connection.execute(text("SELECT now()")).scalar()
+            expected = connection.execute(text(sql), params).all()
+            connection.rollback()
+            ordered = plan.order is not None
+            actual = evaluate(plan, data, params, now)
+            if comparable(actual, ordered) != comparable(expected, ordered):
+                mismatches.append((sql, actual, expected))
+    finally:
+        connection.rollback()
+        connection.exec_driver_sql(f"TRUNCATE {', '.join(TABLES)} CASCADE")
+        connection.exec_driver_sql("ALTER TABLE videos ALTER COLUMN creator_id SET NOT NULL")
+        connection.commit()
+        connection.invalidate()
+        connection.close()
+
+    assert mismatches == []
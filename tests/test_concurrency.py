@@ -0,0 +1,110 @@
+import asyncio
+import time
+from datetime import datetime
+
+import pytest
+from aiogram.types import Chat, Message, User
+
+from src.utils.concurrency import SingleFlight, ThrottlingMiddleware, UpdateTracker
+from src.utils.shared_state import MemoryState
+
+
+def test_concurrent_callers_share_one_computation():
+    flight = SingleFlight()
+    runs = []
+
+    async def compute(value: int) -> int:
+        runs.append(value)
+        await asyncio.sleep(0.05)
+        return value
+
+    async def main() -> list:
+        first = await asyncio.gather(
+            *(flight.do("a", lambda: compute(1)) for _ in range(5)), flight.do("b", lambda: compute(2)),
+        )
+        # finished keys are forgotten
+        return [*first, await flight.do("a", lambda: compute(3))]
+
+    assert asyncio.run(main()) == [1, 1, 1, 1, 1, 2, 3]
+    assert runs == [1, 2, 3]
+    assert flight.shared == 4 and flight.tasks == {}
+
+
+def test_a_caller_giving_up_does_not_cancel_the_others():
+    flight = SingleFlight()
+
+    async def compute() -> str:
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def main() -> str:
+        impatient = asyncio.create_task(flight.do("a", compute))
+        patient = asyncio.create_task(flight.do("a", compute))
+        await asyncio.sleep(0.01)
+        impatient.cancel()
+        return await patient
+
+    assert asyncio.run(main()) == "done"
+
+
+def test_identical_questions_reach_the_llm_once(loaded_db, run, stub_llm):
+    from src.utils.query_executor import answer_query
+
+    stub_llm.delay = 0.2
+    stub_llm.sql["Сколько всего видео?"] = "SELECT COUNT(*) FROM videos;"
+
+    async def ask() -> list:
+        return await asyncio.gather(*(answer_query(q) for q in ["Сколько всего видео?", "сколько всего видео"] * 3))
+
+    assert run(ask()) == [3] * 6
+    assert stub_llm.calls == ["Сколько всего видео?"]
+
+
+def message(user_id: int) -> Message:
+    return Message(
+        message_id=1, date=datetime.now(), chat=Chat(id=user_id, type="private"),
+        from_user=User(id=user_id, is_bot=False, first_name="test"), text="Сколько видео?",
+    )
+
+
+def test_users_over_their_rate_wait_and_then_are_rejected(monkeypatch):
+    replies = []
+
+    async def answer(self, text, **kwargs):
+        replies.append((self.from_user.id, text))
+
+    monkeypatch.setattr(Message, "answer", answer)
+    # a burst of two, then one message every 0.1 s; waits of up to 0.15 s are queued
+    throttling = ThrottlingMiddleware(rate_per_minute=600, burst=2, max_wait=0.15, state=MemoryState())
+
+    async def handler(event, data):
+        return event.from_user.id
+
+    async def main() -> tuple[list, float]:
+        started = time.perf_counter()
+        handled = [await throttling(handler, message(1), {}) for _ in range(3)]
+        waited = time.perf_counter() - started
+        handled += await asyncio.gather(throttling(handler, message(1), {}), throttling(handler, message(1), {}))
+        handled.append(await throttling(handler, message(2), {}))
+        return handled, waited
+
+    handled, waited = asyncio.run(main())
+
+    assert handled == [1, 1, 1, 1, None, 2]
+    assert 0.05 < waited < 0.15
+    assert replies == [(1, "Слишком много запросов, подожди немного и спроси снова.")]
+    assert throttling.rejected == 1
+
+
+def test_drain_waits_for_updates_in_flight():
+    tracker = UpdateTracker()
+
+    async def handler(event, data):
+        await asyncio.sleep(0.1)
+
+    async def main() -> list:
+        update = asyncio.create_task(tracker(handler, object(), {}))
+        early = await tracker.drain(timeout=0.01)
+        return [early, tracker.in_flight, await tracker.drain(timeout=1), tracker.in_flight, update.done()]
+
+    assert asyncio.run(main()) == [False, 1, True, 0, True]
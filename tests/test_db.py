@@ -0,0 +1,43 @@
+from sqlalchemy import text
+
+
+def test_read_session_falls_back_to_the_primary(database, run, monkeypatch):
+    from src.database import db as database_module
+    from src.config import settings
+
+    unreachable = database_module._create_async_engine(
+        settings.async_db_url.replace(f":{settings.db_port}/", ":1/")
+    )
+    monkeypatch.setattr(database_module, "_next_read_engine", lambda: unreachable)
+
+    async def read() -> list:
+        try:
+            async with database_module.get_async_read_session() as db:
+                first = (await db.execute(text("SELECT 1"))).scalar()
+                second = (await db.execute(text("SELECT 2"))).scalar()
+                return [first, second, db.sync_session.fallback is database_module.async_engine.sync_engine]
+        finally:
+            await unreachable.dispose()
+
+    assert run(read()) == [1, 2, True]
+
+
+def test_read_session_connects_to_a_replica_once(database, run, monkeypatch):
+    from sqlalchemy import event
+    from src.database import db as database_module
+    from src.config import settings
+
+    replica = database_module._create_async_engine(settings.async_db_url)
+    checkouts = []
+    event.listen(replica.sync_engine, "checkout", lambda *args: checkouts.append(1))
+    monkeypatch.setattr(database_module, "_next_read_engine", lambda: replica)
+
+    async def read() -> int:
+        try:
+            async with database_module.get_async_read_session() as db:
+                return (await db.execute(text("SELECT 1"))).scalar()
+        finally:
+            await replica.dispose()
+
+    assert run(read()) == 1
+    assert len(checkouts) == 1
@@ -0,0 +1,111 @@
+import pytest
+
+from src.utils.few_shot import FewShotIndex, append_verified, tables_of
+from src.utils.llm import EXAMPLES
+
+SNAPSHOTS_TABLE = "Таблица `video_snapshots`"
+VIDEOS_TABLE = "Таблица `videos`"
+
+
+@pytest.fixture
+def prompt(monkeypatch):
+    """`system_prompt` over an index of the built-in examples only."""
+    from src.config import settings
+    from src.utils import llm
+
+    monkeypatch.setattr(settings, "few_shot_k", 4)
+    monkeypatch.setattr(llm, "few_shot_index", FewShotIndex(EXAMPLES))
+    return llm.system_prompt
+
+
+@pytest.mark.parametrize("question, expected", [
+    # ids say nothing about the shape of a question
+    ("Сколько лайков у креатора zz99xx?", "Сколько лайков у креатора abc123?"),
+    ("Какой прирост лайков за последний час?", "Какой прирост просмотров за последний час?"),
+    ("Топ-3 креаторов по лайкам", "Топ-5 креаторов по просмотрам"),
+    ("Сколько комментариев у видео с id 7f3k2?", "Сколько комментариев у видео с id xyz?"),
+])
+def test_nearest_example_comes_first(question, expected):
+    assert FewShotIndex(EXAMPLES).nearest(question, k=3)[0][1] == expected
+
+
+def test_nearest_keeps_k_examples_close_to_the_best():
+    index = FewShotIndex(EXAMPLES)
+
+    everything = index.nearest("Сколько видео у креатора?", k=len(EXAMPLES))
+    close = index.nearest("Сколько видео у креатора?", k=len(EXAMPLES), min_ratio=0.5)
+
+    assert [score for score, *_ in everything] == sorted((score for score, *_ in everything), reverse=True)
+    assert len(index.nearest("Сколько видео у креатора?", k=2)) == 2
+    assert 0 < len(close) < len(everything)
+    assert all(score >= 0.5 * close[0][0] for score, *_ in close)
+
+
+def test_one_example_per_question_shape():
+    index = FewShotIndex([
+        ("Сколько видео у креатора abc123?", "SELECT 1"),
+        ("сколько видео у креатора  zz99xx", "SELECT 2"),
+        ("Сколько видео у креатора abc123 за час?", "SELECT 3"),
+    ])
+
+    assert index.examples == [("Сколько видео у креатора abc123?", "SELECT 1"),
+                              ("Сколько видео у креатора abc123 за час?", "SELECT 3")]
+
+
+def test_verified_pairs_are_loaded_after_the_base(tmp_path):
+    path = tmp_path / "few_shot.jsonl"
+    append_verified(path, "Сколько репортов у креатора abc123?", "SELECT SUM(reports_count) FROM videos")
+    append_verified(path, "Сколько всего видео?", "SELECT 2")
+
+    index = FewShotIndex.load(path, base=EXAMPLES)
+
+    assert len(index) == len(EXAMPLES) + 1
+    assert index.nearest("Сколько репортов у креатора qq11?", k=1)[0][2] == "SELECT SUM(reports_count) FROM videos"
+
+
+@pytest.mark.parametrize("sql, tables", [
+    ("SELECT COUNT(*) FROM videos", {"videos"}),
+    ("SELECT SUM(s.delta_views_count) FROM video_snapshots s JOIN Videos v ON v.id = s.video_id",
+     {"videos", "video_snapshots"}),
+    ("SELECT 1", set()),
+])
+def test_tables_of(sql, tables):
+    assert tables_of(sql) == tables
+
+
+def test_prompt_carries_the_tables_of_its_examples(prompt):
+    text = prompt(["Какой прирост лайков за последний час?"])
+
+    assert SNAPSHOTS_TABLE in text
+    assert VIDEOS_TABLE not in text
+    assert "INTERVAL '1 hour'" in text
+    assert "GROUP BY creator_id" not in text
+
+
+def test_question_words_add_tables(prompt, monkeypatch):
+    from src.utils import llm
+
+    # the examples alone would only bring video_snapshots
+    snapshot_examples = [pair for pair in EXAMPLES if tables_of(pair[1]) == {"video_snapshots"}]
+    monkeypatch.setattr(llm, "few_shot_index", FewShotIndex(snapshot_examples))
+
+    text = prompt(["Какой прирост лайков у креатора abc123 за последний час?"])
+
+    assert SNAPSHOTS_TABLE in text
+    assert VIDEOS_TABLE in text
+
+
+def test_batch_prompt_has_the_examples_of_every_question_once(prompt):
+    text = prompt(["Сколько лайков у креатора zz99xx?", "Сколько лайков у креатора qq11?", "Топ-3 креаторов по лайкам"])
+
+    assert text.count("Сколько лайков у креатора abc123?") == 1
+    assert "Топ-5 креаторов по просмотрам" in text
+
+
+def test_no_few_shot_gives_the_static_prompt(prompt, monkeypatch):
+    from src.config import settings
+    from src.utils.llm import SYSTEM_PROMPT
+
+    monkeypatch.setattr(settings, "few_shot_k", 0)
+
+    assert prompt(["Какой прирост лайков за последний час?"]) == SYSTEM_PROMPT
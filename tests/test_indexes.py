@@ -0,0 +1,40 @@
+import sys
+
+import pytest
+
+
+@pytest.fixture
+def sample(clean_db):
+    """A cursor over synthetic data inserted in a transaction that is rolled back."""
+    from scripts.check_indexes import load_sample
+    from src.database.db import engine
+
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        load_sample(cursor, n_videos=1000, snapshots_per_video=24, seed=5)
+        yield cursor
+    finally:
+        connection.rollback()
+        connection.close()
+
+
+def test_filtered_sequential_scans_fail_the_check(sample):
+    from scripts.check_indexes import check_query
+
+    assert check_query(sample, "SELECT COUNT(*) FROM videos WHERE comments_count = 123456789")[0] is False
+    # nothing to gain from an index when the filter keeps almost every row
+    assert check_query(sample, "SELECT COUNT(*) FROM videos WHERE comments_count >= 0")[0] is True
+    assert check_query(sample, "SELECT SUM(views_count) FROM videos")[0] is True
+
+
+def test_prompt_query_shapes_use_indexes(clean_db, monkeypatch):
+    from sqlalchemy import text
+    from scripts import check_indexes
+    from src.database.db import get_db_session
+
+    monkeypatch.setattr(sys, "argv", ["check_indexes.py", "--videos", "1000", "--snapshots-per-video", "24"])
+    check_indexes.main()
+
+    with get_db_session() as db:
+        assert db.execute(text("SELECT COUNT(*) FROM videos")).scalar() == 0
@@ -0,0 +1,40 @@
+import pytest
+
+from src.utils.intents import IntentMatcher
+
+
+@pytest.mark.parametrize("question, sql, params", [
+    ("Сколько видео?", "SELECT COUNT(*) FROM videos;", {}),
+    ("Сколько просмотров у видео с id xyz?", "SELECT views_count FROM videos WHERE id = :video_id;", {"video_id": "xyz"}),
+    ("Сколько лайков у видео с номером 5?", "SELECT likes_count FROM videos WHERE id = :video_id;", {"video_id": "5"}),
+    ("Сколько видео у креатора с id abc123?", "SELECT COUNT(*) FROM videos WHERE creator_id = :creator_id;",
+     {"creator_id": "abc123"}),
+    ("Сколько просмотров у креатора abc123?", "SELECT SUM(views_count) FROM videos WHERE creator_id = :creator_id;",
+     {"creator_id": "abc123"}),
+    ("Сколько видео за 5 дней?",
+     "SELECT COUNT(*) FROM videos WHERE video_created_at >= NOW() - INTERVAL '5 days';", {}),
+])
+def test_common_questions_match(question, sql, params):
+    intent = IntentMatcher().parse(question)
+
+    assert (intent.sql, intent.params) == (sql, params)
+
+
+@pytest.mark.parametrize("question", [
+    "Сколько видео с 5 лайками?",
+    "Сколько видео с 100 просмотрами?",
+    "Сколько видео с id 5 лайков?",
+    "Сколько лайков у видео xyz?",
+    "Сколько видео у креатора 5 лайков?",
+    "Топ-10 креаторов по просмотрам",
+])
+def test_other_questions_go_to_the_llm(question):
+    assert IntentMatcher().parse(question) is None
+
+
+def test_match_counts_coverage():
+    matcher = IntentMatcher()
+    matcher.match("Сколько видео?")
+    matcher.match("Сколько видео с 5 лайками?")
+
+    assert matcher.stats() == {"matched": 1, "fallback": 1, "coverage": 0.5}
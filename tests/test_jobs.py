@@ -0,0 +1,131 @@
+import asyncio
+
+import pytest
+
+QUESTION = "Сколько всего видео?"
+SQL = "SELECT COUNT(*) FROM videos;"
+
+
+@pytest.fixture
+def heavy(loaded_db, stub_llm, monkeypatch):
+    """Every query is over the interactive cost limit and fits the job limits."""
+    from src.config import settings
+
+    monkeypatch.setattr(settings, "sql_max_cost", 0.001)
+    monkeypatch.setattr(settings, "sql_reprompt_on_cost", False)
+    monkeypatch.setattr(settings, "job_workers", 1)
+    monkeypatch.setattr(settings, "job_max_cost", 0)
+    stub_llm.sql[QUESTION] = SQL
+    return stub_llm
+
+
+def deferred(question: str = QUESTION, sql: str = SQL):
+    from src.utils.query_executor import DeferredToJob
+    from src.utils.sql_governor import QueryTooExpensive
+
+    return DeferredToJob(question, sql, {}, True, QueryTooExpensive(1000, 100))
+
+
+async def until_delivered(delivered: list, count: int) -> None:
+    while len(delivered) < count:
+        await asyncio.sleep(0.01)
+
+
+def test_heavy_question_is_answered_by_a_job(heavy, run):
+    from src.utils.jobs import JobQueue
+    from src.utils.query_executor import DeferredToJob, answer_query
+    from src.utils.sql_cache import sql_cache
+
+    queue = JobQueue(workers=1, max_size=10)
+    delivered = []
+
+    async def deliver(job):
+        delivered.append((job.status, job.result, job.subscribers))
+
+    async def main():
+        queue.start(deliver)
+        try:
+            with pytest.raises(DeferredToJob) as handoff:
+                await answer_query(QUESTION)
+            first = queue.submit(handoff.value, chat_id=1, message_id=10)
+            second = queue.submit(handoff.value, chat_id=2, message_id=20)
+            await asyncio.wait_for(until_delivered(delivered, 1), 5)
+            return first, second
+        finally:
+            await queue.stop(1)
+
+    first, second = run(main())
+
+    assert first is second
+    assert delivered == [("done", 3, [(1, 10), (2, 20)])]
+    # LLM SQL is cached once its job has run it
+    assert sql_cache.get(QUESTION) == SQL
+
+
+def test_failed_and_unfinished_jobs_are_delivered_as_failures(heavy, run):
+    from src.utils.jobs import JobQueue
+
+    queue = JobQueue(workers=1, max_size=10)
+    delivered = []
+    started = asyncio.Event()
+
+    async def deliver(job):
+        delivered.append((job.question, job.status, str(job.error)))
+        started.set()
+
+    async def main():
+        queue.start(deliver)
+        queue.submit(deferred("broken", "SELECT missing FROM videos"), 1, 1)
+        await asyncio.wait_for(started.wait(), 5)
+        slow = queue.submit(deferred("slow", "SELECT pg_sleep(5)"), 1, 2)
+        waiting = queue.submit(deferred("waiting", "SELECT 2"), 1, 3)
+        await asyncio.sleep(0.2)
+        positions = [queue.position(slow), queue.position(waiting)]
+        await queue.stop(0.1)
+        return positions
+
+    positions = run(main())
+
+    assert positions == [0, 0]
+    assert [(question, status) for question, status, _ in delivered] == [
+        ("broken", "failed"), ("slow", "failed"), ("waiting", "failed"),
+    ]
+    assert "missing" in delivered[0][2]
+    assert delivered[2][2] == "The bot is shutting down"
+
+
+def test_full_queue_rejects_new_jobs():
+    from src.utils.jobs import JobQueue
+
+    queue = JobQueue(workers=1, max_size=2)
+    queue.submit(deferred(sql="SELECT 1"), 1, 1)
+    queue.submit(deferred(sql="SELECT 2"), 1, 2)
+
+    # the same query joins its job even then
+    assert queue.submit(deferred(sql="SELECT 1"), 1, 3).subscribers == [(1, 1), (1, 3)]
+    assert queue.position(queue.submit(deferred(sql="SELECT 2"), 1, 4)) == 1
+    with pytest.raises(asyncio.QueueFull):
+        queue.submit(deferred(sql="SELECT 3"), 1, 5)
+
+
+def test_job_answers_reply_to_every_question(monkeypatch):
+    import main
+    from src.utils.jobs import Job
+
+    sent = []
+
+    async def send_message(chat_id, text, reply_parameters=None, **kwargs):
+        sent.append((chat_id, reply_parameters.message_id, text))
+
+    monkeypatch.setattr(main.bot, "send_message", send_message)
+    done = Job("a1", QUESTION, SQL, {}, True, subscribers=[(1, 10), (2, 20)], status="done", result=3)
+    failed = Job("b2", QUESTION, SQL, {}, True, subscribers=[(1, 11)], status="failed", error=RuntimeError())
+
+    asyncio.run(main.deliver_job(done))
+    asyncio.run(main.deliver_job(failed))
+
+    assert sent == [
+        (1, 10, "Задача a1: 3"),
+        (2, 20, "Задача a1: 3"),
+        (1, 11, "Задача b2: не удалось получить ответ, спроси еще раз."),
+    ]
@@ -0,0 +1,112 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from src.utils.llm_gateway import LLMGateway
+
+
+class FakeClient:
+    """Answers with the model name after the model's delay, or raises the model's error."""
+
+    def __init__(self, **models: float | Exception):
+        self.models = models
+        self.calls: list[str] = []
+        self.cancelled: list[str] = []
+        self.closed = False
+        self.chat = SimpleNamespace(completions=self)
+
+    async def create(self, model: str, messages: list[dict], **kwargs) -> SimpleNamespace:
+        self.calls.append(model)
+        behaviour = self.models[model]
+        if isinstance(behaviour, Exception):
+            raise behaviour
+        try:
+            await asyncio.sleep(behaviour)
+        except asyncio.CancelledError:
+            self.cancelled.append(model)
+            raise
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=model))], usage=None)
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+def complete(client: FakeClient, fallback: str | None = "fallback", hedge_after=0.1, timeout=0.5) -> tuple:
+    gateway = LLMGateway("primary", fallback, hedge_after=hedge_after, timeout=timeout, client=client)
+
+    async def main():
+        started = time.perf_counter()
+        try:
+            return await gateway.complete([{"role": "user", "content": "?"}]), time.perf_counter() - started
+        finally:
+            # let the cancelled attempts see their cancellation
+            await asyncio.sleep(0)
+
+    return asyncio.run(main())
+
+
+def test_a_quick_primary_answers_alone():
+    client = FakeClient(primary=0.01, fallback=0.01)
+
+    assert complete(client)[0] == "primary"
+    assert client.calls == ["primary"]
+
+
+def test_a_slow_primary_is_hedged_and_cancelled():
+    client = FakeClient(primary=10, fallback=0.01)
+
+    answer, elapsed = complete(client)
+
+    assert answer == "fallback"
+    assert 0.1 <= elapsed < 0.3
+    assert client.cancelled == ["primary"]
+
+
+def test_a_failing_primary_is_hedged_at_once():
+    client = FakeClient(primary=ConnectionError("reset"), fallback=0.01)
+
+    answer, elapsed = complete(client, hedge_after=5)
+
+    assert answer == "fallback"
+    assert elapsed < 0.1
+
+
+def test_the_primary_still_wins_if_it_answers_first_after_the_hedge():
+    client = FakeClient(primary=0.15, fallback=10)
+
+    assert complete(client)[0] == "primary"
+    assert client.calls == ["primary", "fallback"] and client.cancelled == ["fallback"]
+
+
+def test_the_last_error_is_raised_when_both_fail():
+    client = FakeClient(primary=ConnectionError("reset"), fallback=ValueError("bad request"))
+
+    with pytest.raises(ValueError, match="bad request"):
+        complete(client)
+
+
+def test_without_a_fallback_the_error_is_raised():
+    with pytest.raises(ConnectionError):
+        complete(FakeClient(primary=ConnectionError("reset")), fallback=None)
+
+
+def test_nothing_waits_past_the_timeout():
+    client = FakeClient(primary=10, fallback=10)
+    started = time.perf_counter()
+
+    with pytest.raises(TimeoutError):
+        complete(client, timeout=0.3)
+    assert time.perf_counter() - started < 0.5
+    assert sorted(client.cancelled) == ["fallback", "primary"]
+
+
+def test_a_client_set_from_outside_is_not_closed():
+    client = FakeClient()
+    gateway = LLMGateway("primary", None, hedge_after=1, timeout=1)
+    gateway.set_client(client)
+
+    asyncio.run(gateway.close())
+
+    assert not client.closed
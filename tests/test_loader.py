@@ -0,0 +1,242 @@
+import pytest
+
+
+def ingestion_lock_is_free() -> bool:
+    """Try the ingestion lock from a session of its own, outside the pool."""
+    import psycopg2
+    from scripts.loader import INGESTION_LOCK_SQL, INGESTION_UNLOCK_SQL
+    from src.config import settings
+
+    connection = psycopg2.connect(settings.primary_db_url)
+    try:
+        cursor = connection.cursor()
+        cursor.execute(INGESTION_LOCK_SQL)
+        free = cursor.fetchone()[0]
+        if free:
+            cursor.execute(INGESTION_UNLOCK_SQL)
+        return free
+    finally:
+        connection.close()
+
+
+@pytest.mark.parametrize("loader", ["incremental", "parallel"])
+def test_load_releases_the_ingestion_lock(clean_db, export_path, loader):
+    from scripts.loader import incremental_load_json_to_db
+    from scripts.parallel_loader import parallel_load_json_to_db
+
+    if loader == "incremental":
+        incremental_load_json_to_db(export_path, batch_size=2)
+    else:
+        parallel_load_json_to_db(export_path, workers=2, shard_rows=2)
+
+    assert ingestion_lock_is_free()
+
+
+@pytest.mark.parametrize("loader", ["orm", "stream", "incremental", "parallel"])
+def test_loads_do_not_overlap(clean_db, export_path, loader):
+    """Every loader holds the ingestion lock: updated_at then grows in commit order."""
+    import psycopg2
+    from scripts.loader import (
+        INGESTION_LOCK_SQL, INGESTION_UNLOCK_SQL,
+        load_json_to_db, stream_load_json_to_db, incremental_load_json_to_db,
+    )
+    from scripts.parallel_loader import parallel_load_json_to_db
+    from src.config import settings
+
+    load = {
+        "orm": load_json_to_db,
+        "stream": stream_load_json_to_db,
+        "incremental": incremental_load_json_to_db,
+        "parallel": lambda path: parallel_load_json_to_db(path, workers=2, shard_rows=2),
+    }[loader]
+    other = psycopg2.connect(settings.primary_db_url)
+    try:
+        cursor = other.cursor()
+        cursor.execute(INGESTION_LOCK_SQL)
+        with pytest.raises(RuntimeError, match="Another load is running"):
+            load(export_path)
+        cursor.execute(INGESTION_UNLOCK_SQL)
+    finally:
+        other.close()
+
+    load(export_path)
+    assert ingestion_lock_is_free()
+
+
+def awkward_export() -> dict:
+    """make_export with several snapshots per video and ids CSV has to quote."""
+    from tests.conftest import make_export
+
+    export = make_export(4)
+    for i, video in enumerate(export["videos"]):
+        video["creator_id"] = ['creator, "one"', "creator\ntwo"][i % 2]
+        video["snapshots"] += [
+            {**video["snapshots"][0], "id": f"snapshot-{i}-{hour}", "created_at": f"2025-11-01T{hour}:00:00+00:00"}
+            for hour in (12, 13)
+        ]
+    return export
+
+
+def loaded_rows() -> list:
+    from sqlalchemy import text
+    from src.database.db import get_db_session
+
+    with get_db_session() as db:
+        return [
+            db.execute(text(f"SELECT * FROM {table} ORDER BY 1, 2")).all()
+            for table in [
+                "(SELECT id, creator_id, video_created_at, views_count, likes_count FROM videos) v",
+                "(SELECT id, video_id, created_at, delta_views_count, views_count FROM video_snapshots) s",
+                "video_snapshots_hourly", "video_snapshots_daily",
+            ]
+        ]
+
+
+def test_stream_load_matches_the_orm_load(clean_db, tmp_path):
+    import json
+    from scripts import loader
+    from tests.conftest import TABLES
+    from sqlalchemy import text
+    from src.database.db import get_db_session
+
+    path = tmp_path / "export.json"
+    path.write_text(json.dumps(awkward_export(), indent=1), encoding="utf-8")
+    loader.load_json_to_db(path)
+    expected = loaded_rows()
+    with get_db_session() as db:
+        db.execute(text(f"TRUNCATE {', '.join(TABLES)} CASCADE"))
+
+    loaded = loader.stream_load_json_to_db(path, batch_size=4)
+
+    assert loaded == 16
+    assert loaded_rows() == expected
+    assert [len(rows) for rows in expected] == [4, 12, 6, 4]
+
+
+def test_videos_are_read_across_chunk_borders(tmp_path):
+    import json
+    from scripts.loader import iter_videos
+
+    export = awkward_export()
+    path = tmp_path / "export.json"
+    path.write_text(json.dumps({"meta": {"videos": 1}, **export}, ensure_ascii=False), encoding="utf-8")
+
+    assert list(iter_videos(path, chunk_size=7)) == export["videos"]
+
+
+def newer_export(export: dict) -> tuple[dict, dict]:
+    """The next export after `export`, and what the database should hold once it is merged.
+
+    Every video gets a snapshot at 14:00 with new views; its video record still has the old totals.
+    Video 0 also carries a new snapshot from before the watermark, and a new video has an old one.
+    """
+    import copy
+
+    newer = copy.deepcopy(export)
+    for i, video in enumerate(newer["videos"]):
+        video["snapshots"].append({
+            **video["snapshots"][0], "id": f"snapshot-{i}-14", "created_at": "2025-11-01T14:00:00+00:00",
+            "views_count": 1000 + i, "delta_views_count": 7,
+        })
+    newer["videos"].append({
+        **copy.deepcopy(export["videos"][0]), "id": "video-new", "creator_id": "creator-new",
+        "snapshots": [{**export["videos"][0]["snapshots"][0], "id": "snapshot-new", "created_at": "2025-11-01T09:00:00+00:00"}],
+    })
+    expected = copy.deepcopy(newer)
+    for i, video in enumerate(expected["videos"][:-1]):
+        video["views_count"] = 1000 + i
+    newer["videos"][0]["snapshots"].append(
+        {**export["videos"][0]["snapshots"][0], "id": "snapshot-stale", "created_at": "2025-11-01T10:00:00+00:00"}
+    )
+    return newer, expected
+
+
+def test_incremental_load_merges_only_what_is_new(clean_db, tmp_path):
+    import json
+    from scripts import loader
+    from tests.conftest import TABLES
+    from sqlalchemy import text
+    from src.database.db import get_db_session
+
+    export = awkward_export()
+    newer, expected = newer_export(export)
+    paths = {}
+    for name, data in [("export", export), ("newer", newer), ("expected", expected)]:
+        paths[name] = tmp_path / f"{name}.json"
+        paths[name].write_text(json.dumps(data), encoding="utf-8")
+
+    version_sql = text("SELECT COALESCE(MAX(version), 0) FROM data_version")
+
+    def stream_loaded_rows(path):
+        loader.stream_load_json_to_db(path)
+        rows = loaded_rows()
+        with get_db_session() as db:
+            db.execute(text(f"TRUNCATE {', '.join(TABLES)} CASCADE"))
+        return rows
+
+    first_rows = stream_loaded_rows(paths["export"])
+    merged_rows = stream_loaded_rows(paths["expected"])
+
+    first = loader.incremental_load_json_to_db(paths["export"], batch_size=4)
+    assert loaded_rows() == first_rows
+    with get_db_session() as db:
+        version = db.execute(version_sql).scalar()
+
+    again = loader.incremental_load_json_to_db(paths["export"], batch_size=4)
+    assert loaded_rows() == first_rows
+    with get_db_session() as db:
+        assert db.execute(version_sql).scalar() == version
+
+    merged = loader.incremental_load_json_to_db(paths["newer"], batch_size=4)
+
+    assert (first, again, merged) == (12, 0, 5)
+    assert loaded_rows() == merged_rows
+
+
+def test_parallel_load_matches_the_stream_load(clean_db, tmp_path):
+    import json
+    from scripts import loader
+    from scripts.parallel_loader import parallel_load_json_to_db
+    from tests.conftest import TABLES
+    from sqlalchemy import text
+    from src.database.db import get_db_session
+
+    path = tmp_path / "export.json"
+    path.write_text(json.dumps(awkward_export(), indent=1), encoding="utf-8")
+    loader.stream_load_json_to_db(path)
+    expected = loaded_rows()
+    with get_db_session() as db:
+        db.execute(text(f"TRUNCATE {', '.join(TABLES)} CASCADE"))
+
+    first = parallel_load_json_to_db(path, workers=2, shard_rows=4)
+    rows = loaded_rows()
+    again = parallel_load_json_to_db(path, workers=2, shard_rows=4)
+
+    assert (first["rows"], first["new_snapshots"], again["new_snapshots"]) == (16, 12, 0)
+    assert rows == expected
+    assert loaded_rows() == expected
+
+
+def test_parallel_load_is_all_or_nothing(loaded_db, tmp_path):
+    import json
+    import psycopg2
+    from sqlalchemy import text
+    from scripts.parallel_loader import parallel_load_json_to_db
+    from src.database.db import get_db_session
+
+    before = loaded_rows()
+    export = awkward_export()
+    # the last shard fails to COPY, after the others are staged
+    export["videos"][-1]["snapshots"][-1]["created_at"] = "not a date"
+    path = tmp_path / "export.json"
+    path.write_text(json.dumps(export), encoding="utf-8")
+
+    with pytest.raises(psycopg2.DataError):
+        parallel_load_json_to_db(path, workers=2, shard_rows=3)
+
+    with get_db_session() as db:
+        staging = db.execute(text(
+            "SELECT COUNT(*) FROM pg_tables WHERE tablename LIKE 'video_load_%' OR tablename LIKE 'snapshot_load_%'"
+        )).scalar()
+    assert loaded_rows() == before
+    assert staging == 0
@@ -0,0 +1,75 @@
+import socket
+from types import SimpleNamespace
+
+import pytest
+from prometheus_client import REGISTRY
+
+from src.utils.timing import collect_stages, stage
+
+
+def sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_stages_are_collected_and_observed():
+    observed = sample("bot_stage_duration_seconds_count", stage="test_stage")
+    errors = sample("bot_errors_total", stage="test_stage", error="KeyError")
+
+    with collect_stages() as stages:
+        with stage("test_stage"):
+            pass
+        with pytest.raises(KeyError):
+            with stage("test_stage"):
+                raise KeyError
+        with collect_stages() as inner:
+            with stage("inner_stage"):
+                pass
+
+    assert list(stages) == ["test_stage"] and stages["test_stage"] > 0
+    assert list(inner) == ["inner_stage"]
+    assert sample("bot_stage_duration_seconds_count", stage="test_stage") == observed + 2
+    assert sample("bot_errors_total", stage="test_stage", error="KeyError") == errors + 1
+
+
+def test_llm_usage_is_counted_by_model():
+    from src.utils.metrics import record_llm_usage
+
+    before = [sample("bot_llm_requests_total", model="test-model"),
+              sample("bot_llm_tokens_total", model="test-model", kind="prompt")]
+    record_llm_usage("test-model", SimpleNamespace(prompt_tokens=120, completion_tokens=30))
+    record_llm_usage("test-model", None)
+
+    assert sample("bot_llm_requests_total", model="test-model") == before[0] + 2
+    assert sample("bot_llm_tokens_total", model="test-model", kind="prompt") == before[1] + 120
+
+
+def test_metrics_and_readiness_are_served(database, run):
+    import aiohttp
+    from src.utils.metrics import start_metrics_server
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    ready = False
+
+    async def scrape() -> list:
+        runner = await start_metrics_server(port, ready=lambda: ready)
+        try:
+            async with aiohttp.ClientSession() as session:
+                async def get(path: str) -> tuple[int, str]:
+                    async with session.get(f"http://127.0.0.1:{port}{path}") as response:
+                        return response.status, await response.text()
+
+                nonlocal ready
+                warming_up = await get("/ready")
+                ready = True
+                return [warming_up, await get("/ready"), await get("/metrics")]
+        finally:
+            await runner.cleanup()
+
+    warming_up, ready_now, (status, metrics) = run(scrape())
+
+    assert warming_up[0] == 503 and ready_now[0] == 200
+    assert status == 200
+    for name in ["bot_stage_duration_seconds", "bot_cache_lookups_total", 'bot_db_rows_scanned{scan="seq",table="videos"}']:
+        assert name in metrics
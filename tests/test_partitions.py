@@ -0,0 +1,93 @@
+import json
+from datetime import date
+
+import pytest
+from sqlalchemy import text
+
+from tests.conftest import make_export
+
+DAYS = [date(2020, 1, 1), date(2020, 1, 2)]
+
+
+@pytest.fixture
+def old_snapshots(clean_db, tmp_path):
+    """Snapshots on DAYS, loaded into the default partition; their partitions are dropped afterwards."""
+    from scripts.loader import stream_load_json_to_db
+    from src.database.db import get_db_session
+    from src.database.partitions import partition_name, list_partitions, drop_partition
+
+    export = make_export(len(DAYS))
+    for video, day in zip(export["videos"], DAYS):
+        video["snapshots"][0]["created_at"] = f"{day.isoformat()}T11:00:00+00:00"
+    path = tmp_path / "export.json"
+    path.write_text(json.dumps(export), encoding="utf-8")
+    stream_load_json_to_db(path)
+    yield
+    with get_db_session() as db:
+        for day in DAYS:
+            if partition_name(day) in list_partitions(db):
+                drop_partition(db, partition_name(day), "drop")
+
+
+def test_maintenance_stops_when_another_run_takes_the_lock(old_snapshots, monkeypatch):
+    from src.database.db import get_db_session, engine
+    from src.database.partitions import maintain_partitions, partition_name, DEFAULT_PARTITION
+
+    other = engine.connect()
+    try:
+        with get_db_session() as db:
+            commit = db.commit
+
+            def commit_and_lose_the_lock():
+                commit()
+                other.execute(text("SELECT pg_advisory_lock(hashtext('partitions'))"))
+
+            monkeypatch.setattr(db, "commit", commit_and_lose_the_lock)
+            stats = maintain_partitions(db, ahead_days=0, retention_days=0)
+            monkeypatch.undo()
+            left = db.execute(text(f"SELECT COUNT(*) FROM {DEFAULT_PARTITION}")).scalar()
+    finally:
+        other.execute(text("SELECT pg_advisory_unlock_all()"))
+        other.close()
+
+    assert stats["created"] == [partition_name(DAYS[0])]
+    assert left == 1
+
+
+@pytest.mark.parametrize("mode", ["detach", "drop"])
+def test_retention_removes_the_rollup_buckets_of_the_partition(old_snapshots, mode):
+    from src.database.db import get_db_session
+    from src.database.partitions import maintain_partitions, partition_name, drop_partition
+
+    with get_db_session() as db:
+        maintain_partitions(db, ahead_days=0, retention_days=0)
+        drop_partition(db, partition_name(DAYS[0]), mode)
+        db.commit()
+        if mode == "detach":
+            db.execute(text(f"DROP TABLE {partition_name(DAYS[0])}"))
+        rollups = [
+            db.execute(text(f"SELECT bucket::date, SUM(snapshots_count) FROM {table} GROUP BY 1")).all()
+            for table in ["video_snapshots_hourly", "video_snapshots_daily"]
+        ]
+
+    assert rollups == [[(DAYS[1], 1)], [(DAYS[1], 1)]]
+
+
+def test_retention_in_the_default_partition_bumps_the_data_version(old_snapshots, monkeypatch):
+    from src.database import partitions
+    from src.database.db import get_db_session
+
+    # only the default partition is under test; its 2020 rows get no partitions past the cutoff
+    monkeypatch.setattr(partitions, "drop_partition", lambda *args: None)
+    version_sql = text("SELECT COALESCE(MAX(version), 0) FROM data_version")
+    with get_db_session() as db:
+        before = db.execute(version_sql).scalar()
+        partitions.maintain_partitions(db, ahead_days=0, retention_days=30)
+        after_delete = db.execute(version_sql).scalar()
+        left = db.execute(text(f"SELECT COUNT(*) FROM {partitions.DEFAULT_PARTITION}")).scalar()
+        partitions.maintain_partitions(db, ahead_days=0, retention_days=30)
+        after_noop = db.execute(version_sql).scalar()
+
+    assert left == 0
+    assert after_delete > before
+    assert after_noop == after_delete
@@ -0,0 +1,87 @@
+import asyncio
+import time
+
+import pytest
+
+HEAVY, CHEAPER = "SELECT heavy", "SELECT cheaper"
+
+
+@pytest.fixture
+def executor(monkeypatch):
+    """The executor with LLM SQL that is over SQL_MAX_COST; `heavy` lists the SQL still over it."""
+    from src.config import settings
+    from src.utils import query_executor
+    from src.utils.sql_governor import QueryTooExpensive
+
+    heavy = {HEAVY}
+
+    async def run_sql(db, sql, params, job=False):
+        if sql in heavy:
+            raise QueryTooExpensive(1000, 100)
+        return 5
+
+    async def generate_sql_query(user_query, rejected=None):
+        return CHEAPER if rejected else HEAVY
+
+    async def nothing(*args):
+        return None
+
+    monkeypatch.setattr(settings, "intent_fast_path", False)
+    monkeypatch.setattr(settings, "sql_reprompt_on_cost", True)
+    monkeypatch.setattr(settings, "job_workers", 1)
+    monkeypatch.setattr(settings, "job_max_cost", 0)
+    monkeypatch.setattr(query_executor, "run_sql", run_sql)
+    monkeypatch.setattr(query_executor, "generate_sql_query", generate_sql_query)
+    monkeypatch.setattr(query_executor, "lookup_sql", nothing)
+    monkeypatch.setattr(query_executor, "remember_sql", nothing)
+    return query_executor, heavy
+
+
+def test_expensive_query_is_rewritten_before_it_is_deferred(executor):
+    query_executor, _ = executor
+
+    assert asyncio.run(query_executor.execute_natural_language_query(None, "Отчет по всем видео?")) == 5
+
+
+def test_rewrite_still_over_the_limit_is_deferred(executor):
+    query_executor, heavy = executor
+    heavy.add(CHEAPER)
+
+    with pytest.raises(query_executor.DeferredToJob) as deferred:
+        asyncio.run(query_executor.execute_natural_language_query(None, "Отчет по всем видео?"))
+    assert deferred.value.sql == CHEAPER
+
+
+def test_deferred_questions_are_not_errors():
+    from prometheus_client import REGISTRY
+    from src.utils.query_executor import DeferredToJob
+    from src.utils.sql_governor import QueryTooExpensive
+    from src.utils.timing import stage
+
+    with pytest.raises(DeferredToJob):
+        with stage("execute"):
+            raise DeferredToJob("?", HEAVY, {}, True, QueryTooExpensive(1000, 100))
+
+    assert not REGISTRY.get_sample_value("bot_errors_total", {"stage": "execute", "error": "DeferredToJob"})
+
+
+def test_questions_are_answered_concurrently(loaded_db, run, stub_llm):
+    from src.utils.query_executor import answer_query
+
+    stub_llm.delay = 0.5
+    stub_llm.sql.update({
+        "Сколько всего видео?": "SELECT COUNT(*) FROM videos;",
+        "Сколько всего просмотров?": "SELECT SUM(views_count) FROM videos;",
+        "Сколько всего лайков?": "SELECT SUM(likes_count) FROM videos;",
+    })
+
+    async def ask_all() -> tuple[list, float]:
+        started = time.perf_counter()
+        answers = await asyncio.gather(*(answer_query(q) for q in stub_llm.sql))
+        return answers, time.perf_counter() - started
+
+    answers, elapsed = run(ask_all())
+
+    assert answers == [3, 30, 3]
+    # one LLM delay, not three: the handler never blocks the event loop
+    assert elapsed < 1.0
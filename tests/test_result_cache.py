@@ -0,0 +1,70 @@
+import json
+import time
+
+from src.utils.result_cache import MISSING, ResultCache
+from tests.conftest import make_export
+
+
+def test_a_new_data_version_drops_every_entry():
+    cache = ResultCache()
+    cache.set("SELECT COUNT(*) FROM videos", 1, 3)
+    cache.set("SELECT SUM(views_count) FROM videos", 1, 30)
+
+    assert cache.get("SELECT COUNT(*) FROM videos", 2) is MISSING
+    assert cache.stats()["size"] == 0
+    assert cache.get("SELECT SUM(views_count) FROM videos", 1) is MISSING
+
+
+def test_parameters_are_part_of_the_key():
+    cache = ResultCache()
+    sql = "SELECT COUNT(*) FROM videos WHERE creator_id = :creator_id"
+    cache.set(sql, 1, 3, {"creator_id": "a"})
+
+    assert cache.get(sql, 1, {"creator_id": "a"}) == 3
+    assert cache.get(sql, 1, {"creator_id": "b"}) is MISSING
+
+
+def test_time_dependent_queries_expire_with_their_bucket(monkeypatch):
+    now = 1_000_000 * 60
+    monkeypatch.setattr(time, "time", lambda: now)
+    cache = ResultCache(now_bucket=60)
+    recent = "SELECT COUNT(*) FROM videos WHERE video_created_at >= NOW() - INTERVAL '1 hour'"
+    cache.set(recent, 1, 3)
+    cache.set("SELECT COUNT(*) FROM videos", 1, 3)
+
+    now += 59
+    assert cache.get(recent, 1) == 3
+    now += 1
+    assert cache.get(recent, 1) is MISSING
+    assert cache.get("SELECT COUNT(*) FROM videos", 1) == 3
+    assert cache.shared_key(recent, 1)[1] == 60
+
+
+def test_least_recently_used_results_are_evicted():
+    cache = ResultCache(max_size=2)
+    for i in range(3):
+        cache.set(f"SELECT {i}", 1, i)
+
+    assert [cache.get(f"SELECT {i}", 1) for i in range(3)] == [MISSING, 1, 2]
+
+
+def test_answers_follow_a_reload(loaded_db, run, stub_llm, tmp_path):
+    from scripts.loader import stream_load_json_to_db
+    from src.utils.query_executor import answer_query
+    from src.utils.result_cache import result_cache
+
+    question = "Сколько всего видео?"
+    stub_llm.sql[question] = "SELECT COUNT(*) FROM videos;"
+    hits = result_cache.hits
+    before = [run(answer_query(question)), run(answer_query(question))]
+    hits = result_cache.hits - hits
+
+    export = make_export(5)
+    export["videos"] = export["videos"][3:]
+    path = tmp_path / "more.json"
+    path.write_text(json.dumps(export), encoding="utf-8")
+    stream_load_json_to_db(path)
+
+    assert before == [3, 3]
+    assert hits == 1
+    assert run(answer_query(question)) == 5
@@ -0,0 +1,143 @@
+import json
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import text
+
+from src.utils.rollup_router import _parse, route_to_rollups
+
+START = datetime(2025, 11, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def snapshots_db(clean_db, tmp_path):
+    """Five videos of two creators, a snapshot every 20 minutes over two days and some in the last day."""
+    from scripts.loader import stream_load_json_to_db
+
+    rng = random.Random(6)
+    now = datetime.now(timezone.utc)
+    videos = []
+    for i in range(5):
+        times = [START + timedelta(minutes=20 * j) for j in range(2 * 24 * 3 + 1)]
+        times += sorted(now - timedelta(minutes=rng.randrange(24 * 60)) for _ in range(10))
+        snapshots, views = [], 0
+        for j, moment in enumerate(times):
+            delta = rng.randrange(-10, 1000)
+            views += delta
+            snapshots.append({
+                "id": f"snapshot-{i}-{j}", "created_at": moment.isoformat(),
+                "views_count": views, "delta_views_count": delta, "delta_likes_count": delta % 7,
+            })
+        videos.append({
+            "id": f"video-{i}", "creator_id": f"creator-{i % 2}", "video_created_at": START.isoformat(),
+            "views_count": views, "snapshots": snapshots,
+        })
+    path = tmp_path / "export.json"
+    path.write_text(json.dumps({"videos": videos}), encoding="utf-8")
+    stream_load_json_to_db(path)
+    return clean_db
+
+
+ROUTED = [
+    ("SELECT SUM(delta_views_count) FROM video_snapshots", {}),
+    # inside one bucket, hourly and daily
+    ("SELECT SUM(delta_views_count) FROM video_snapshots "
+     "WHERE created_at >= '2025-11-01 10:05:00+00' AND created_at < '2025-11-01 10:50:00+00'", {}),
+    ("SELECT SUM(delta_views_count) FROM video_snapshots WHERE video_id = 'video-1' "
+     "AND created_at >= '2025-11-01 03:00:00+00' AND created_at < '2025-11-01 20:00:00+00'", {}),
+    # starting or ending exactly on a bucket boundary
+    ("SELECT SUM(delta_views_count) FROM video_snapshots "
+     "WHERE created_at >= '2025-11-01 10:00:00+00' AND created_at < '2025-11-02 07:40:00+00'", {}),
+    ("SELECT SUM(delta_views_count) FROM video_snapshots "
+     "WHERE created_at >= '2025-11-01 10:40:00+00' AND created_at < '2025-11-02 07:00:00+00'", {}),
+    ("SELECT SUM(delta_views_count) FROM video_snapshots "
+     "WHERE created_at >= '2025-11-01 10:00:00+00' AND created_at < '2025-11-01 11:00:00+00'", {}),
+    ("SELECT SUM(delta_likes_count) FROM video_snapshots WHERE video_id = :video_id "
+     "AND created_at >= '2025-11-02 00:00:00+00' AND created_at < '2025-11-03 00:00:00+00'", {"video_id": "video-2"}),
+    ("SELECT SUM(delta_views_count) FROM video_snapshots WHERE created_at >= '2025-11-01 12:00:00+00'", {}),
+    ("SELECT SUM(delta_views_count) FROM video_snapshots WHERE created_at < '2025-11-02 12:00:00+00'", {}),
+    # session-local literals and expressions
+    ("SELECT SUM(delta_views_count) FROM video_snapshots "
+     "WHERE created_at >= DATE '2025-11-02' AND created_at < DATE '2025-11-02' + INTERVAL '1 day'", {}),
+    ("SELECT SUM(delta_views_count) FROM video_snapshots WHERE created_at >= :start AND created_at < :end",
+     {"start": datetime(2025, 11, 1, 5, 30), "end": datetime(2025, 11, 2, 5, 30)}),
+    ("SELECT SUM(delta_views_count) FROM video_snapshots WHERE created_at >= NOW() - INTERVAL '6 hours'", {}),
+    # no snapshots in the window: NULL, not 0
+    ("SELECT SUM(delta_views_count) FROM video_snapshots WHERE created_at < '2025-10-01 00:00:00+00'", {}),
+    ("SELECT SUM(delta_views_count) FROM video_snapshots WHERE video_id = 'missing' "
+     "AND created_at >= '2025-11-01 10:05:00+00' AND created_at < '2025-11-02 10:50:00+00'", {}),
+    # creators: through the join or the subquery
+    ("SELECT SUM(s.delta_views_count) FROM video_snapshots s JOIN videos v ON v.id = s.video_id "
+     "WHERE v.creator_id = 'creator-1' AND s.created_at >= '2025-11-01 10:20:00+00' "
+     "AND s.created_at < '2025-11-02 00:00:00+00'", {}),
+    ("SELECT SUM(delta_views_count) AS total FROM video_snapshots AS s INNER JOIN videos AS v ON s.video_id = v.id "
+     "WHERE creator_id = :creator_id AND s.created_at >= '2025-11-01 23:00:00+00'", {"creator_id": "creator-0"}),
+    ("SELECT SUM(delta_views_count) FROM video_snapshots "
+     "WHERE video_id IN (SELECT id FROM videos WHERE creator_id = 'creator-0') "
+     "AND created_at >= '2025-11-01 08:20:00+00' AND created_at < '2025-11-01 08:40:00+00'", {}),
+    ("SELECT SUM(delta_views_count) FROM video_snapshots "
+     "WHERE video_id IN (SELECT id FROM videos WHERE creator_id = :creator_id) "
+     "AND created_at < NOW() - INTERVAL '2 hours';", {"creator_id": "creator-1"}),
+]
+
+
+@pytest.mark.parametrize("zone", ["UTC", "Europe/Moscow"])
+def test_routed_queries_give_the_same_answer(snapshots_db, zone):
+    from src.database.db import engine
+
+    connection = engine.connect()
+    try:
+        # the session time zone moves local literals off the UTC buckets
+        connection.exec_driver_sql(f"SET TIME ZONE '{zone}'")
+        mismatches = []
+        for sql, params in ROUTED:
+            routed = route_to_rollups(sql)
+            assert routed != sql, sql
+            expected = connection.execute(text(sql), params).scalar()
+            actual = connection.execute(text(routed), params).scalar()
+            if actual != expected:
+                mismatches.append((sql, actual, expected))
+    finally:
+        connection.invalidate()
+        connection.close()
+
+    assert mismatches == []
+
+
+def test_parse_reads_the_window_and_the_filters():
+    parsed = _parse(
+        "SELECT SUM(delta_views_count) FROM video_snapshots WHERE video_id = 'video-1' "
+        "AND created_at >= '2025-11-01 10:05:00+00' AND created_at < :end"
+    )
+
+    assert parsed == {
+        "column": "delta_views_count",
+        "lo": "CAST(('2025-11-01 10:05:00+00') AS timestamptz)",
+        "hi": "CAST((:end) AS timestamptz)",
+        "video": "'video-1'",
+        "creator": None,
+    }
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT COUNT(*) FROM video_snapshots",
+    "SELECT SUM(views_count) FROM video_snapshots",
+    "SELECT SUM(delta_views_count) FROM videos",
+    "SELECT SUM(delta_views_count) FROM video_snapshots WHERE created_at > '2025-11-01'",
+    "SELECT SUM(delta_views_count) FROM video_snapshots WHERE created_at BETWEEN '2025-11-01' AND '2025-11-02'",
+    "SELECT SUM(delta_views_count) FROM video_snapshots WHERE created_at >= '2025-11-01' OR video_id = 'video-1'",
+    "SELECT SUM(delta_views_count) FROM video_snapshots WHERE created_at >= '2025-11-01' "
+    "AND created_at >= '2025-11-02'",
+    "SELECT SUM(delta_views_count) FROM video_snapshots WHERE created_at >= (SELECT MAX(created_at) FROM videos)",
+    "SELECT SUM(delta_views_count) FROM video_snapshots WHERE delta_views_count > 0",
+    "SELECT SUM(delta_views_count) FROM video_snapshots WHERE creator_id = 'creator-1'",
+    "SELECT SUM(delta_views_count) FROM video_snapshots s JOIN videos v ON v.id = s.id",
+    # ambiguous for Postgres, videos has a created_at too
+    "SELECT SUM(delta_views_count) FROM video_snapshots s JOIN videos v ON v.id = s.video_id "
+    "WHERE created_at >= '2025-11-01'",
+    "SELECT SUM(delta_views_count) FROM video_snapshots GROUP BY video_id",
+    "SELECT SUM(delta_views_count) FROM video_snapshots; DELETE FROM videos",
+])
+def test_other_queries_are_returned_unchanged(sql):
+    assert route_to_rollups(sql) == sql
@@ -0,0 +1,124 @@
+import asyncio
+
+import pytest
+from sqlalchemy import text
+
+from src.utils.shared_state import MemoryState, PostgresState, create_shared_state
+
+# a bucket that refills one token in 1000 seconds, never within a test
+RATE = 0.001
+
+
+@pytest.fixture
+def shared_db(clean_db):
+    """The test database with empty shared state tables."""
+    from src.database.db import get_db_session
+
+    with get_db_session() as db:
+        db.execute(text("TRUNCATE shared_cache, rate_limit_buckets"))
+    yield clean_db
+
+
+@pytest.fixture(params=["memory", "postgres"])
+def state(request):
+    if request.param == "postgres":
+        request.getfixturevalue("shared_db")
+    return create_shared_state(request.param)
+
+
+def test_values_expire(state, run):
+    async def main():
+        await state.set("kept", "1", ttl=60)
+        await state.set("expired", "2", ttl=0)
+        await state.set("kept", "3", ttl=60)
+        return [await state.get("kept"), await state.get("expired"), await state.get("missing")]
+
+    assert run(main()) == ["3", None, None]
+
+
+def test_bucket_makes_requests_over_the_capacity_wait(state, run):
+    async def main():
+        waits = [await state.reserve("user", RATE, capacity=2) for _ in range(3)]
+        await state.refund("user", capacity=2)
+        waits.append(await state.reserve("user", RATE, capacity=2))
+        waits.append(await state.reserve("other", RATE, capacity=2))
+        return waits
+
+    first, second, third, after_refund, other = run(main())
+
+    assert (first, second, other) == (0.0, 0.0, 0.0)
+    assert third == pytest.approx(1 / RATE, rel=0.01)
+    assert after_refund == pytest.approx(third, rel=0.01)
+
+
+def test_workers_share_the_postgres_buckets(shared_db, run):
+    workers = [PostgresState() for _ in range(4)]
+
+    async def main():
+        return await asyncio.gather(*(worker.reserve("user", RATE, capacity=3) for worker in workers))
+
+    waits = run(main())
+
+    assert sorted(waits)[:3] == [0.0, 0.0, 0.0]
+    assert sorted(waits)[3] > 0
+
+
+def test_unknown_backend_is_rejected():
+    assert isinstance(create_shared_state("memory"), MemoryState)
+    with pytest.raises(ValueError, match="redis"):
+        create_shared_state("redis")
+
+
+def test_workers_share_generated_sql_and_results(loaded_db, shared_db, run, stub_llm, monkeypatch):
+    from src.database.db import get_async_db_session
+    from src.utils import query_executor
+    from src.utils.result_cache import result_cache
+    from src.utils.sql_cache import sql_cache
+
+    monkeypatch.setattr(query_executor, "shared_state", PostgresState())
+    stub_llm.sql["Сколько всего видео?"] = "SELECT COUNT(*) FROM videos;"
+
+    async def ask():
+        async with get_async_db_session() as db:
+            return await query_executor.execute_natural_language_query(db, "Сколько всего видео?")
+
+    assert run(ask()) == 3
+
+    # another worker: empty local caches and no database access for the answer
+    sql_cache.entries.clear()
+    result_cache.clear()
+
+    async def no_database(*args):
+        raise AssertionError("the answer should come from the shared state")
+
+    monkeypatch.setattr(query_executor, "fetch_governed", no_database)
+
+    assert run(ask()) == 3
+    assert stub_llm.calls == ["Сколько всего видео?"]
+
+
+def test_webhook_worker_drains_updates_before_closing_the_bot_session(monkeypatch):
+    import webhook
+
+    events = []
+
+    async def close():
+        events.append("session closed")
+
+    async def update(event, data):
+        await asyncio.sleep(0.2)
+        events.append("update answered")
+
+    monkeypatch.setattr(webhook.bot.session, "close", close)
+
+    async def main():
+        app = webhook.create_app(0)
+        app.freeze()
+        handling = asyncio.create_task(webhook.update_tracker(update, None, {}))
+        await asyncio.sleep(0)
+        await app.shutdown()
+        await handling
+
+    asyncio.run(main())
+
+    assert events == ["update answered", "session closed"]
@@ -0,0 +1,87 @@
+import os
+import time
+import multiprocessing
+
+import pytest
+
+from src.utils.sql_cache import SQLCache, SqliteStore, normalize_question
+
+
+def test_questions_that_differ_in_form_share_a_key():
+    assert normalize_question("Сколько  ВИДЕО у креатора abc?") == normalize_question("сколько видео у креатора abc")
+    assert normalize_question("видео ABC") != normalize_question("видео abc")
+
+
+def test_store_keeps_entries_across_instances(tmp_path):
+    path = tmp_path / "sql.db"
+    SQLCache(store=SqliteStore(path)).set("Сколько видео?", "SELECT COUNT(*) FROM videos;")
+
+    assert SQLCache(store=SqliteStore(path)).get("сколько видео") == "SELECT COUNT(*) FROM videos;"
+
+
+def _write_in_child(store: SqliteStore, inherited: int) -> None:
+    store.set("key", "SELECT 1;", 0.0)
+    os._exit(0 if id(store.connection) != inherited else 1)
+
+
+def test_store_opens_its_own_connection_after_fork(tmp_path):
+    store = SqliteStore(tmp_path / "sql.db")
+    assert store._connection is None
+
+    inherited = id(store.connection)
+    child = multiprocessing.get_context("fork").Process(target=_write_in_child, args=(store, inherited))
+    child.start()
+    child.join()
+
+    assert child.exitcode == 0
+    assert store.get("key") == ("SELECT 1;", 0.0)
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = SQLCache(max_size=2)
+    cache.set("первый", "SELECT 1;")
+    cache.set("второй", "SELECT 2;")
+    cache.get("первый")
+    cache.set("третий", "SELECT 3;")
+
+    assert [cache.get(q) for q in ["первый", "второй", "третий"]] == ["SELECT 1;", None, "SELECT 3;"]
+    assert cache.stats() == {"size": 2, "hits": 3, "misses": 1, "hit_ratio": 0.75}
+
+
+def test_expired_entries_are_dropped_from_the_store(tmp_path, monkeypatch):
+    store = SqliteStore(tmp_path / "sql.db")
+    cache = SQLCache(ttl=60, store=store)
+    cache.set("Сколько видео?", "SELECT COUNT(*) FROM videos;")
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+
+    assert cache.get("Сколько видео?") is None
+    assert store.get(normalize_question("Сколько видео?")) is None
+
+
+def test_preload_reads_the_newest_entries(tmp_path):
+    store = SqliteStore(tmp_path / "sql.db")
+    for i in range(3):
+        store.set(f"вопрос {i}", f"SELECT {i};", time.time() - 10 + i)
+    store.set("старый", "SELECT 0;", 0.0)
+    cache = SQLCache(max_size=2, ttl=60, store=store)
+
+    assert cache.preload() == 2
+    assert list(cache.entries) == ["вопрос 1", "вопрос 2"]
+
+
+def test_only_sql_that_ran_is_cached(loaded_db, run, stub_llm):
+    from src.utils.query_executor import answer_query
+    from src.utils.sql_cache import sql_cache
+
+    question = "Сколько всего видео?"
+    stub_llm.sql[question] = "SELECT COUNT(*) FROM missing_table;"
+    with pytest.raises(ValueError):
+        run(answer_query(question))
+    assert sql_cache.get(question) is None
+
+    stub_llm.sql[question] = "SELECT COUNT(*) FROM videos;"
+    answers = [run(answer_query(question)), run(answer_query("сколько всего ВИДЕО"))]
+
+    assert answers == [3, 3]
+    assert stub_llm.calls == [question, question]
@@ -0,0 +1,103 @@
+import pytest
+from sqlalchemy import text
+
+from src.utils.sql_governor import (
+    Limits, QueryTimedOut, QueryTooExpensive, _costs, combine_queries,
+    estimate_cost, execute_combined, execute_governed, fetch_governed,
+)
+
+ROOMY = Limits(max_cost=0, timeout_ms=10_000)
+
+
+def governed(run, query):
+    """Run `query(db)` in a session on the primary and return its result or exception."""
+    from src.database.db import get_async_db_session
+
+    async def main():
+        try:
+            async with get_async_db_session() as db:
+                return await query(db)
+        except Exception as e:
+            return e
+
+    return run(main())
+
+
+def test_generated_sql_cannot_write(loaded_db, run):
+    delete = "WITH d AS (DELETE FROM videos RETURNING 1) SELECT COUNT(*) FROM d"
+
+    error = governed(run, lambda db: execute_governed(db, delete, limits=ROOMY))
+
+    assert "read-only transaction" in str(error)
+    assert governed(run, lambda db: execute_governed(db, "SELECT COUNT(*) FROM videos", limits=ROOMY)) == (3,)
+
+
+@pytest.mark.parametrize("execute", [execute_governed, fetch_governed])
+def test_long_queries_are_cancelled(loaded_db, run, execute):
+    error = governed(run, lambda db: execute(db, "SELECT pg_sleep(2), 1", limits=Limits(0, 100)))
+
+    assert isinstance(error, QueryTimedOut)
+    assert error.timeout_ms == 100
+
+
+def test_the_guards_end_with_the_transaction(loaded_db, run):
+    show = text("SELECT current_setting('statement_timeout'), current_setting('transaction_read_only')")
+
+    async def query(db):
+        before = tuple((await db.execute(show)).one())
+        await db.commit()
+        await execute_governed(db, "SELECT 1", limits=Limits(0, 1234))
+        during = tuple((await db.execute(show)).one())
+        await db.commit()
+        return before, during, tuple((await db.execute(show)).one())
+
+    before, during, after = governed(run, query)
+
+    assert during == ("1234ms", "on")
+    assert after == before != during
+
+
+def test_expensive_queries_are_rejected_before_they_run(loaded_db, run):
+    cross_join = "SELECT COUNT(*) FROM video_snapshots a, video_snapshots b, video_snapshots c"
+
+    error = governed(run, lambda db: fetch_governed(db, cross_join, limits=Limits(1000, 10_000)))
+
+    assert isinstance(error, QueryTooExpensive)
+    assert error.cost > error.limit == 1000
+
+
+def test_cost_is_estimated_once_per_shape_and_data_version(loaded_db, run):
+    sql = "SELECT COUNT(*) FROM videos WHERE creator_id = :creator_id"
+
+    async def query(db):
+        costs = [await estimate_cost(db, sql, {"creator_id": "a"}, 1)]
+        # a cached estimate is served without EXPLAIN, even for a query that would fail it
+        _costs[(sql, 1)] = 42.0
+        costs.append(await estimate_cost(db, sql, {"creator_id": "b"}, 1))
+        costs.append(await estimate_cost(db, sql, {"creator_id": "b"}, 2))
+        return costs
+
+    first, cached, new_version = governed(run, query)
+
+    assert cached == 42.0
+    assert new_version == first != 42.0
+
+
+def test_combined_queries_keep_their_own_parameters(loaded_db, run):
+    queries = [
+        ("SELECT COUNT(*) FROM videos WHERE views_count >= :views", {"views": 10}),
+        ("SELECT id, views_count FROM videos WHERE views_count >= :views ORDER BY id;", {"views": 20}),
+        ("SELECT created_at::date FROM video_snapshots WHERE views_count > 100", {}),
+    ]
+
+    rows = governed(run, lambda db: execute_combined(db, queries))
+
+    assert combine_queries(queries)[1] == {"q1_views": 10, "q2_views": 20}
+    assert [[tuple(row) for row in result] for result in rows] == [[(2,)], [("video-2", 20)], []]
+
+
+def test_combining_leaves_casts_and_literals_alone():
+    sql, params = combine_queries([("SELECT created_at::date FROM videos WHERE id = ':id' AND likes_count > :n", {"n": 1})])
+
+    assert "created_at::date" in sql and "id = ':id'" in sql and ":q1_n" in sql
+    assert params == {"q1_n": 1}
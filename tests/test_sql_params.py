@@ -0,0 +1,79 @@
+import pytest
+from sqlalchemy import text
+
+from src.utils.sql_params import MAX_INT, parameterize
+
+
+@pytest.mark.parametrize("sql, template, params", [
+    ("SELECT COUNT(*) FROM videos WHERE creator_id = 'abc'",
+     "SELECT COUNT(*) FROM videos WHERE creator_id = :creator_id", {"creator_id": "abc"}),
+    ("SELECT COUNT(*) FROM videos v WHERE v.creator_id <> 'abc' AND v.views_count >= 100",
+     "SELECT COUNT(*) FROM videos v WHERE v.creator_id <> :creator_id AND v.views_count >= :views_count",
+     {"creator_id": "abc", "views_count": 100}),
+    ("SELECT COUNT(*) FROM videos WHERE likes_count > -5",
+     "SELECT COUNT(*) FROM videos WHERE likes_count > :likes_count", {"likes_count": -5}),
+    # escaped quotes
+    ("SELECT COUNT(*) FROM videos WHERE creator_id = 'O''Brien'",
+     "SELECT COUNT(*) FROM videos WHERE creator_id = :creator_id", {"creator_id": "O'Brien"}),
+    ("SELECT COUNT(*) FROM videos WHERE creator_id = ''''",
+     "SELECT COUNT(*) FROM videos WHERE creator_id = :creator_id", {"creator_id": "'"}),
+    # IN lists, one parameter per value
+    ("SELECT SUM(views_count) FROM videos WHERE id IN ('a', 'b''c','d')",
+     "SELECT SUM(views_count) FROM videos WHERE id IN (:id, :id_2, :id_3)", {"id": "a", "id_2": "b'c", "id_3": "d"}),
+    ("SELECT COUNT(*) FROM videos WHERE id = 'a' AND creator_id IN ('x')",
+     "SELECT COUNT(*) FROM videos WHERE id = :id AND creator_id IN (:creator_id)", {"id": "a", "creator_id": "x"}),
+    # the same column twice
+    ("SELECT COUNT(*) FROM videos WHERE views_count > 10 AND views_count < 20",
+     "SELECT COUNT(*) FROM videos WHERE views_count > :views_count AND views_count < :views_count_2",
+     {"views_count": 10, "views_count_2": 20}),
+])
+def test_literals_are_lifted(sql, template, params):
+    assert parameterize(sql) == (template, params)
+
+
+@pytest.mark.parametrize("sql", [
+    # casts: `:name::type` would not be a bind parameter
+    "SELECT COUNT(*) FROM videos WHERE views_count > 5::bigint",
+    "SELECT COUNT(*) FROM videos WHERE creator_id = 'abc'::text",
+    "SELECT COUNT(*) FROM videos WHERE creator_id = 'a''b' ::text",
+    # dates and intervals
+    "SELECT COUNT(*) FROM videos WHERE video_created_at >= NOW() - INTERVAL '5 days'",
+    "SELECT COUNT(*) FROM video_snapshots WHERE created_at >= '2025-11-01'::date",
+    "SELECT COUNT(*) FROM video_snapshots WHERE created_at >= TIMESTAMPTZ '2025-11-01 00:00:00+03'",
+    # outside int4, and not an integer
+    f"SELECT COUNT(*) FROM videos WHERE views_count > {MAX_INT + 1}",
+    f"SELECT COUNT(*) FROM videos WHERE views_count > -{MAX_INT + 1}",
+    "SELECT COUNT(*) FROM videos WHERE views_count > 5.5",
+    # other columns, and literals inside strings
+    "SELECT COUNT(*) FROM videos WHERE total_views_count > 5 AND title = 'x'",
+    "SELECT COUNT(*) FROM videos WHERE note = 'creator_id = ''abc'' AND views_count > 5'",
+])
+def test_other_literals_stay_inline(sql):
+    assert parameterize(sql) == (sql, {})
+
+
+def test_largest_int4_is_lifted():
+    assert parameterize(f"SELECT COUNT(*) FROM videos WHERE views_count <= {MAX_INT}")[1] == {"views_count": MAX_INT}
+
+
+def test_existing_params_are_not_shadowed():
+    template, params = parameterize(
+        "SELECT COUNT(*) FROM videos WHERE creator_id = :creator_id AND id IN ('a', 'b') AND id <> 'c'",
+        {"creator_id": "abc", "id": "z"},
+    )
+
+    assert template == (
+        "SELECT COUNT(*) FROM videos WHERE creator_id = :creator_id AND id IN (:id_2, :id_3) AND id <> :id_4"
+    )
+    assert params == {"creator_id": "abc", "id": "z", "id_2": "a", "id_3": "b", "id_4": "c"}
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT COUNT(*) FROM videos WHERE views_count > 5::bigint AND creator_id = 'a' AND id IN ('b', 'c')",
+    "SELECT SUM(s.delta_views_count) FROM video_snapshots s JOIN videos v ON v.id = s.video_id "
+    "WHERE v.creator_id = 'x' AND s.delta_likes_count >= 3 AND s.created_at >= NOW() - INTERVAL '1 day'",
+])
+def test_every_parameter_is_a_bind_parameter(sql):
+    template, params = parameterize(sql)
+
+    assert set(text(template).compile().params) == set(params)
@@ -0,0 +1,9 @@
+def test_warm_up_questions_do_not_count_in_intent_coverage():
+    from src.utils.intents import intent_matcher
+    from src.utils.startup import WARMUP_QUESTIONS, _intent_queries
+
+    before = intent_matcher.stats()
+    queries = _intent_queries()
+
+    assert len(queries) == len(WARMUP_QUESTIONS)
+    assert intent_matcher.stats() == before
@@ -0,0 +1,150 @@
+import gc
+import os
+import csv
+import asyncio
+
+import pytest
+
+from src.utils.tables import MAX_CELL_CHARS, TableCollector, TableResult, render_table
+
+ROWS = [(i, f"creator-{i}", None if i % 3 else i * 10) for i in range(10)]
+
+
+def collect(rows, inline_rows=5, max_rows=100, max_bytes=1 << 20) -> TableResult:
+    table = TableCollector(["n", "creator", "views"], inline_rows, max_rows, max_bytes)
+    # in chunks, as they come from the cursor
+    for start in range(0, len(rows), 3):
+        table.add(rows[start:start + 3])
+    return table.finish()
+
+
+def read_csv(path: str) -> list[list[str]]:
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        return list(csv.reader(f))
+
+
+def test_small_tables_stay_in_memory():
+    table = collect(ROWS[:5])
+
+    assert (table.rows, table.row_count, table.path, table.truncated) == (ROWS[:5], 5, None, False)
+
+
+def test_large_tables_are_written_to_a_csv_file():
+    table = collect(ROWS)
+    path = table.path
+
+    with open(path, "rb") as f:
+        assert f.read(3) == b"\xef\xbb\xbf"
+    assert read_csv(path) == [["n", "creator", "views"]] + [
+        [str(n), creator, "" if views is None else str(views)] for n, creator, views in ROWS
+    ]
+    assert (table.rows, table.row_count, table.truncated) == ([], 10, False)
+
+    del table
+    gc.collect()
+    assert not os.path.exists(path)
+
+
+@pytest.mark.parametrize("limits, row_count", [
+    ({"max_rows": 4}, 4),
+    ({"max_rows": 7}, 7),
+    # the BOM, the header and rows of 18 bytes; the first five rows are spilled at once
+    ({"max_bytes": 3 + 17 + 7 * 18}, 7),
+    ({"max_bytes": 3 + 17 + 4 * 18}, 4),
+])
+def test_results_are_cut_at_the_limits(limits, row_count):
+    rows = [(i, f"creator-{i}", i) for i in range(10, 20)]
+
+    table = collect(rows, **limits)
+
+    assert table.truncated
+    assert table.row_count == row_count
+    if table.path is None:
+        assert table.rows == rows[:row_count]
+    else:
+        assert len(read_csv(table.path)) == row_count + 1
+
+
+def test_scalars_are_plain_values():
+    from src.utils.query_executor import to_value
+
+    single = TableCollector(["count"], 5, 100, 1 << 20)
+    single.add([(5,)])
+    empty = TableCollector(["count"], 5, 100, 1 << 20)
+
+    assert to_value(single.finish()) == 5
+    assert to_value(empty.finish()) == 0
+    assert isinstance(to_value(collect(ROWS[:2])), TableResult)
+
+
+def test_tables_are_rendered_aligned():
+    table = TableResult(columns=["creator", "views"], rows=[("a<b>", 5), ("creator-10", None)], row_count=2)
+
+    assert render_table(table) == [
+        "<pre>creator     views\n"
+        "----------  -----\n"
+        "a&lt;b&gt;        5\n"
+        "creator-10</pre>"
+    ]
+
+
+def test_long_tables_are_split_over_messages():
+    rows = [(f"creator-{i}", "x" * (MAX_CELL_CHARS + 10)) for i in range(200)]
+    table = TableResult(columns=["creator", "title"], rows=rows, row_count=len(rows))
+
+    messages = render_table(table, max_chars=1000)
+    lines = [line for message in messages for line in message[len("<pre>"):-len("</pre>")].split("\n")]
+
+    assert len(messages) > 1
+    assert all(len(message) <= 1000 and message.startswith("<pre>") for message in messages)
+    assert len(lines) == len(rows) + 2
+    # long cells are shortened
+    assert lines[2] == "creator-0    " + "x" * (MAX_CELL_CHARS - 1) + "…"
+
+
+def test_rows_are_read_in_chunks_into_a_file(loaded_db, run, monkeypatch):
+    from src.config import settings
+    from src.database.db import get_async_db_session
+    from src.utils.sql_governor import Limits, fetch_governed
+
+    monkeypatch.setattr(settings, "result_chunk_rows", 7)
+    monkeypatch.setattr(settings, "result_inline_rows", 5)
+    monkeypatch.setattr(settings, "result_max_rows", 50)
+
+    async def main():
+        async with get_async_db_session() as db:
+            return await fetch_governed(
+                db, "SELECT n, n * n AS square FROM generate_series(1, 100) AS n ORDER BY n",
+                limits=Limits(max_cost=0, timeout_ms=10_000),
+            )
+
+    table = run(main())
+
+    assert (table.row_count, table.truncated) == (50, True)
+    assert read_csv(table.path) == [["n", "square"]] + [[str(n), str(n * n)] for n in range(1, 51)]
+
+
+def test_tables_are_sent_as_messages_or_a_file(monkeypatch):
+    import main
+
+    sent = []
+
+    async def send_message(chat_id, text, **kwargs):
+        sent.append(("message", text))
+
+    async def send_document(chat_id, document, caption=None, **kwargs):
+        sent.append(("document", document.filename, caption))
+
+    monkeypatch.setattr(main.bot, "send_message", send_message)
+    monkeypatch.setattr(main.bot, "send_document", send_document)
+    small = TableResult(columns=["n"], rows=[(1,), (2,)], row_count=2, truncated=True)
+    large = collect(ROWS)
+
+    asyncio.run(main.send_table(1, small))
+    asyncio.run(main.send_table(1, large))
+
+    assert sent == [
+        ("message", "<pre>n\n-\n1\n2</pre>"),
+        ("message", "Показаны первые 2 строк (обрезано по лимиту)."),
+        ("document", "answer.csv", "Строк: 10"),
+    ]
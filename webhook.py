@@ -0,0 +1,152 @@
+import time
+
+# before the imports: their time is the first startup phase
+STARTED = time.perf_counter()
+
+import os
+import sys
+import signal
+import socket
+import asyncio
+import logging
+import argparse
+import multiprocessing
+
+from aiohttp import web
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+
+from main import bot, dp, update_tracker, deliver_job
+from src.config import settings
+from src.database.db import close_db
+from src.database.partitions import partition_maintenance_loop
+from src.utils.llm_gateway import llm_gateway
+from src.utils.jobs import job_queue
+from src.utils.metrics import start_metrics_server
+from src.utils.startup import startup, warm_up
+
+logger = logging.getLogger(__name__)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Serve Telegram updates over a webhook")
+    parser.add_argument("--workers", type=int, default=settings.webhook_workers)
+    parser.add_argument("--host", default=settings.webhook_host)
+    parser.add_argument("--port", type=int, default=settings.webhook_port)
+    return parser.parse_args()
+
+
+def create_app(worker: int) -> web.Application:
+    app = web.Application()
+
+    async def on_startup(app: web.Application) -> None:
+        with startup.phase("init"):
+            if settings.metrics_enabled:
+                # one endpoint per worker: METRICS_PORT, METRICS_PORT + 1, ...
+                app["metrics_runner"] = await start_metrics_server(settings.metrics_port + worker, startup.is_ready)
+            if settings.partition_maintenance_interval:
+                # every worker runs it, an advisory lock lets only one of them work at a time
+                app["maintenance"] = asyncio.create_task(
+                    partition_maintenance_loop(settings.partition_maintenance_interval)
+                )
+            if settings.columnar_cache:
+                from src.utils.columnar import columnar_store
+
+                columnar_store.schedule_refresh()
+            if settings.job_workers:
+                job_queue.start(deliver_job)
+        if settings.startup_warmup:
+            # aiohttp handles requests only after the startup hooks; the ones that
+            # arrive meanwhile wait in the listen backlog
+            with startup.phase("warm_up"):
+                await warm_up(bot)
+        startup.set_ready()
+
+    async def drain(app: web.Application) -> None:
+        # aiohttp has stopped accepting requests by now
+        logger.info(f"Worker {worker}: draining {update_tracker.in_flight} updates")
+        if not await update_tracker.drain(settings.webhook_drain_timeout):
+            logger.warning(f"Worker {worker}: {update_tracker.in_flight} updates still running after drain timeout")
+        # jobs answer through the bot session, which closes after this
+        await job_queue.stop(settings.job_drain_timeout)
+
+    async def on_cleanup(app: web.Application) -> None:
+        if "maintenance" in app:
+            app["maintenance"].cancel()
+        if "metrics_runner" in app:
+            await app["metrics_runner"].cleanup()
+        await llm_gateway.close()
+        await close_db()
+
+    app.on_startup.append(on_startup)
+    # must run before the request handler closes the bot session
+    app.on_shutdown.append(drain)
+    SimpleRequestHandler(dispatcher=dp, bot=bot, secret_token=settings.webhook_secret).register(
+        app, path=settings.webhook_path
+    )
+    setup_application(app, dp, bot=bot)
+    app.on_cleanup.append(on_cleanup)
+    return app
+
+
+def run_worker(sock: socket.socket, worker: int) -> None:
+    logger.info(f"Worker {worker} (pid {os.getpid()}) serving updates")
+    web.run_app(
+        create_app(worker),
+        sock=sock,
+        shutdown_timeout=settings.webhook_drain_timeout,
+        print=None,
+        access_log=None,
+        handle_signals=True,
+    )
+
+
+async def register_webhook() -> None:
+    url = settings.webhook_url.rstrip("/") + settings.webhook_path
+    try:
+        await bot.set_webhook(url, secret_token=settings.webhook_secret)
+        logger.info(f"Webhook set to {url}")
+    finally:
+        await bot.session.close()
+
+
+def main() -> None:
+    # forked workers inherit the start time
+    startup.begin(STARTED)
+    args = parse_args()
+    if args.workers > 1 and settings.shared_state_backend == "memory":
+        logger.warning("Workers do not share caches and rate limits with SHARED_STATE_BACKEND=memory")
+    if settings.webhook_url:
+        asyncio.run(register_webhook())
+
+    # workers inherit one listening socket; the kernel spreads connections over them
+    sock = socket.create_server((args.host, args.port), backlog=1024)
+    logger.info(f"Listening on {args.host}:{args.port}{settings.webhook_path} with {args.workers} workers")
+    if args.workers == 1:
+        run_worker(sock, 0)
+        return
+
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=run_worker, args=(sock, i)) for i in range(args.workers)]
+    for process in workers:
+        process.start()
+    sock.close()
+
+    def stop(signum, frame) -> None:
+        for process in workers:
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGTERM)
+
+    # Ctrl+C already reaches the workers through the process group,
+    # a second signal would cut their drain short
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    for process in workers:
+        process.join()
+    failed = [p.exitcode for p in workers if p.exitcode]
+    if failed:
+        logger.error(f"Workers exited with codes {failed}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()